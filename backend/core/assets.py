@@ -0,0 +1,296 @@
+"""
+Content-addressed store for XR assets.
+
+Objects are stored once per SHA-256 under ``upload_directory/objects/`` and
+never modified, so identical scenes uploaded twice (or under several content
+paths) take the space of one. A SQLite index in WAL mode, shared by all
+workers, keeps each object's size, type and creation time and maps logical
+content paths such as ``/content/scene.usd`` to digests.
+
+Objects are read through one shared read-only mmap each. Range responses
+hand the server memoryview slices of that mapping, which uvicorn's httptools
+protocol writes to the socket without copying them in Python; servers that
+offer the ``http.response.zerocopysend`` extension get a sendfile with
+offset and count instead, except for whole objects of compressible types,
+which are left to the compression middleware.
+"""
+
+import logging
+import mimetypes
+import mmap
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from .compression import is_compressible
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+SHA256 = re.compile(r"^[0-9a-f]{64}$")
+CHUNK_SIZE = 1024 * 1024
+MAX_RANGES = 16
+
+for _type, _extension in (("model/gltf-binary", ".glb"), ("model/gltf+json", ".gltf"),
+                          ("model/vnd.usdz+zip", ".usdz"), ("model/vnd.usd", ".usd"),
+                          ("model/vnd.usd", ".usdc"), ("model/vnd.usd", ".usda")):
+    mimetypes.add_type(_type, _extension)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    content_type TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS paths (
+    path TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL REFERENCES objects(sha256),
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS paths_by_object ON paths(sha256);
+"""
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+@dataclass
+class Asset:
+    sha256: str
+    size: int
+    content_type: str
+    created_at: float
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.sha256}"'
+
+    def to_dict(self) -> Dict:
+        return {**asdict(self), "url": f"/api/assets/{self.sha256}"}
+
+
+class AssetStore:
+    def __init__(self, directory: str, max_mappings: int = 64):
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, "objects")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(directory, "assets.db"), check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._mappings: "OrderedDict[str, mmap.mmap]" = OrderedDict()
+        self.max_mappings = max_mappings
+
+    def object_path(self, sha256: str) -> str:
+        return os.path.join(self.objects_dir, sha256[:2], sha256)
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def ingest(self, source: str, sha256: str, content_type: str = "",
+               path: Optional[str] = None) -> Tuple[Asset, bool]:
+        """Move ``source`` into the store, or drop it if the content is already there"""
+        target = self.object_path(sha256)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.chmod(source, 0o444)
+            os.link(source, target)
+            created = True
+        except FileExistsError:
+            created = False
+        os.remove(source)
+
+        content_type = content_type or "application/octet-stream"
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR IGNORE INTO objects VALUES (?, ?, ?, ?)",
+                             (sha256, os.path.getsize(target), content_type, now))
+            if path:
+                self._db.execute("INSERT OR REPLACE INTO paths VALUES (?, ?, ?)", (path, sha256, now))
+        asset = self.get(sha256)
+        logger.info(f"Asset {sha256[:12]} {'stored' if created else 'deduplicated'}"
+                    f"{f' as {path}' if path else ''} ({asset.size} bytes)")
+        return asset, created
+
+    def get(self, sha256: str) -> Optional[Asset]:
+        rows = self._query("SELECT sha256, size, content_type, created_at FROM objects WHERE sha256 = ?", (sha256,))
+        return Asset(*rows[0]) if rows else None
+
+    def resolve(self, reference: str) -> Optional[Asset]:
+        """Look up an asset by content path or by digest"""
+        if SHA256.match(reference):
+            return self.get(reference)
+        rows = self._query("SELECT sha256 FROM paths WHERE path = ?", (reference,))
+        return self.get(rows[0][0]) if rows else None
+
+    def paths(self, prefix: str = "", limit: int = 100) -> List[Dict]:
+        rows = self._query(
+            "SELECT p.path, o.sha256, o.size, o.content_type, p.updated_at FROM paths p "
+            "JOIN objects o USING (sha256) WHERE p.path >= ? AND p.path < ? ORDER BY p.path LIMIT ?",
+            (prefix, prefix + "\U0010ffff", limit))
+        return [dict(zip(("path", "sha256", "size", "content_type", "updated_at"), row)) for row in rows]
+
+    def mapping(self, asset: Asset) -> mmap.mmap:
+        """Shared read-only mapping of an object, kept for the most recently read objects"""
+        with self._lock:
+            mapped = self._mappings.get(asset.sha256)
+            if mapped is not None:
+                self._mappings.move_to_end(asset.sha256)
+                return mapped
+        with open(self.object_path(asset.sha256), "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mapped.madvise(mmap.MADV_SEQUENTIAL)
+        with self._lock:
+            self._mappings[asset.sha256] = mapped
+            while len(self._mappings) > self.max_mappings:
+                # Not closed explicitly: responses still streaming hold memoryviews of it
+                self._mappings.popitem(last=False)
+        return mapped
+
+
+def parse_range(header: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """Inclusive (start, end) byte ranges of a ``Range`` header, or None to send the whole object"""
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec:
+        return None
+    ranges = []
+    for part in spec.split(","):
+        first, sep, last = part.strip().partition("-")
+        if not sep:
+            return None
+        try:
+            if first:
+                start = int(first)
+                end = min(int(last), size - 1) if last else size - 1
+            else:
+                suffix = int(last)
+                if suffix == 0:
+                    continue
+                start, end = max(size - suffix, 0), size - 1
+        except ValueError:
+            return None
+        if start > end or start >= size:
+            continue
+        ranges.append((start, end))
+    if not ranges:
+        raise RangeNotSatisfiable()
+    return ranges if len(ranges) <= MAX_RANGES else None
+
+
+class AssetResponse(Response):
+    """Whole-object or byte-range response streamed from an asset's mapping"""
+
+    def __init__(self, store: AssetStore, asset: Asset, request_headers: Headers, method: str = "GET"):
+        super().__init__(status_code=200, media_type=None)
+        self.store = store
+        self.asset = asset
+        self.send_body = method != "HEAD"
+        self.ranges: List[Tuple[int, int]] = [(0, asset.size - 1)] if asset.size else []
+        self.boundary = ""
+        self.parts: List[bytes] = []
+
+        self.headers["etag"] = asset.etag
+        self.headers["accept-ranges"] = "bytes"
+        self.headers["cache-control"] = "public, max-age=31536000, immutable"
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match and asset.etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+            self.status_code = 304
+            self.ranges = []
+            del self.headers["content-length"]
+            return
+
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if range_header and (not if_range or if_range.strip() == asset.etag):
+            try:
+                ranges = parse_range(range_header, asset.size)
+            except RangeNotSatisfiable:
+                self.status_code = 416
+                self.ranges = []
+                self.headers["content-range"] = f"bytes */{asset.size}"
+                self.headers["content-length"] = "0"
+                return
+            if ranges:
+                self.status_code = 206
+                self.ranges = ranges
+
+        if self.status_code == 206 and len(self.ranges) > 1:
+            self.boundary = os.urandom(12).hex()
+            for start, end in self.ranges:
+                self.parts.append(
+                    f"--{self.boundary}\r\nContent-Type: {asset.content_type}\r\n"
+                    f"Content-Range: bytes {start}-{end}/{asset.size}\r\n\r\n".encode())
+            closing = f"\r\n--{self.boundary}--\r\n".encode()
+            length = sum(len(p) for p in self.parts) + sum(e - s + 1 for s, e in self.ranges) \
+                + 2 * (len(self.ranges) - 1) + len(closing)
+            self.parts.append(closing)
+            self.headers["content-type"] = f"multipart/byteranges; boundary={self.boundary}"
+        else:
+            if self.status_code == 206:
+                start, end = self.ranges[0]
+                self.headers["content-range"] = f"bytes {start}-{end}/{asset.size}"
+            self.headers["content-type"] = asset.content_type
+            length = sum(e - s + 1 for s, e in self.ranges)
+        self.headers["content-length"] = str(length)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if not self.send_body or not self.ranges:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        # Whole objects of compressible types stay body messages so the compression middleware can encode them
+        zero_copy = "http.response.zerocopysend" in (scope.get("extensions") or {}) and \
+            (self.status_code == 206 or not is_compressible(self.asset.content_type))
+        if zero_copy:
+            f = open(self.store.object_path(self.asset.sha256), "rb")
+        else:
+            view = memoryview(self.store.mapping(self.asset))
+        try:
+            for index, (start, end) in enumerate(self.ranges):
+                if self.boundary:
+                    prefix = b"\r\n" if index else b""
+                    await send({"type": "http.response.body", "body": prefix + self.parts[index], "more_body": True})
+                last = index == len(self.ranges) - 1 and not self.boundary
+                if zero_copy:
+                    await send({"type": "http.response.zerocopysend", "file": f.fileno(), "offset": start,
+                                "count": end - start + 1, "more_body": not last})
+                    continue
+                for offset in range(start, end + 1, CHUNK_SIZE):
+                    stop = min(offset + CHUNK_SIZE, end + 1)
+                    await send({"type": "http.response.body", "body": view[offset:stop],
+                                "more_body": not (last and stop == end + 1)})
+            if self.boundary:
+                await send({"type": "http.response.body", "body": self.parts[-1]})
+        finally:
+            if zero_copy:
+                f.close()
+
+
+def content_type_for(metadata: Dict[str, str]) -> str:
+    """Type from tus metadata (``filetype``/``type``), else guessed from the file name"""
+    explicit = metadata.get("filetype") or metadata.get("type")
+    if explicit:
+        return explicit
+    name = metadata.get("path") or metadata.get("filename") or ""
+    return mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+@lru_cache(maxsize=None)
+def get_asset_store() -> AssetStore:
+    return AssetStore(get_settings().upload_directory)
@@ -0,0 +1,212 @@
+"""
+JWT authentication with a verified-claims cache.
+
+Checking an HMAC signature and the standard claims costs tens of
+microseconds per request, and the same token arrives over and over on hot
+endpoints. ``TokenVerifier`` verifies a token once, then serves its claims
+from a bounded LRU keyed by the token's SHA-256 digest (the raw token is
+never kept) until the token's ``exp``. Tokens without ``exp`` are cached for
+``max_ttl`` only.
+
+Several keys can be active at once for rotation: the token's ``kid`` header
+selects one, and tokens without a ``kid`` are tried against each key.
+``reload_keys`` re-reads ``JWT_KEYS``/``JWT_SECRET`` from ``.env`` and
+replaces the key set, clearing the cache so a retired key stops working
+immediately. The admin API reloads the worker that serves the call; SIGHUP
+reloads the master before its rolling restart, so every replacement worker
+starts with the new keys.
+"""
+
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import jwt
+from dotenv import dotenv_values, find_dotenv
+from fastapi import Header, HTTPException, Request
+
+from .config import PROCESS_ENVIRONMENT, get_settings
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_SECRET = "your-jwt-secret-here"
+VERIFY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01)
+
+auth_cache_total = registry.counter(
+    "omniai_auth_cache_total", "JWT lookups by verified-claims cache result", ["result"])
+auth_verify_seconds = registry.histogram(
+    "omniai_auth_verify_seconds", "Time spent verifying JWT signatures and claims on cache misses",
+    buckets=VERIFY_BUCKETS)
+auth_failures_total = registry.counter("omniai_auth_failures_total", "Rejected JWTs", ["reason"])
+
+
+class AuthError(HTTPException):
+    def __init__(self, detail: str):
+        super().__init__(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+
+def parse_keys(spec: str) -> Dict[str, str]:
+    """``kid:secret`` pairs separated by commas"""
+    keys = {}
+    for pair in spec.split(","):
+        kid, sep, secret = pair.strip().partition(":")
+        if sep and kid and secret:
+            keys[kid] = secret
+    return keys
+
+
+class TokenVerifier:
+    def __init__(self, keys: Dict[str, str], algorithms: List[str], audience: Optional[str] = None,
+                 issuer: Optional[str] = None, cache_size: int = 10000, max_ttl: float = 300.0,
+                 leeway: float = 0.0):
+        self.algorithms = algorithms
+        self.audience = audience or None
+        self.issuer = issuer or None
+        self.cache_size = cache_size
+        self.max_ttl = max_ttl
+        self.leeway = leeway
+        self._cache: "OrderedDict[bytes, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.verify_seconds = 0.0
+        self.set_keys(keys)
+
+    def set_keys(self, keys: Dict[str, str]):
+        """Replace the active keys; claims verified with the old set are dropped"""
+        self.keys = dict(keys)
+        self._cache.clear()
+
+    def _candidate_keys(self, token: str) -> List[str]:
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.InvalidTokenError:
+            raise self._fail("malformed", "Malformed token")
+        kid = header.get("kid")
+        if kid is None:
+            return list(self.keys.values())
+        if kid not in self.keys:
+            raise self._fail("unknown_kid", "Unknown signing key")
+        return [self.keys[kid]]
+
+    def _fail(self, reason: str, detail: str) -> AuthError:
+        auth_failures_total.inc(reason)
+        return AuthError(detail)
+
+    def _decode(self, token: str) -> Dict[str, Any]:
+        candidates = self._candidate_keys(token)
+        if not candidates:
+            raise self._fail("no_keys", "Token verification is not configured")
+        for key in candidates:
+            try:
+                return jwt.decode(token, key, algorithms=self.algorithms, audience=self.audience,
+                                  issuer=self.issuer, leeway=self.leeway,
+                                  options={"verify_aud": self.audience is not None})
+            except jwt.InvalidSignatureError:
+                continue  # a kid-less token may belong to another active key
+            except jwt.ExpiredSignatureError:
+                raise self._fail("expired", "Token expired")
+            except jwt.InvalidTokenError as e:
+                raise self._fail("invalid", f"Invalid token: {e}")
+        raise self._fail("signature", "Invalid token signature")
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        digest = hashlib.sha256(token.encode()).digest()
+        now = time.time()
+        cached = self._cache.get(digest)
+        if cached is not None:
+            claims, expires_at = cached
+            if now < expires_at:
+                self._cache.move_to_end(digest)
+                self.hits += 1
+                auth_cache_total.inc("hit")
+                return claims
+            del self._cache[digest]  # past its expiry: verify again, which reports why
+
+        self.misses += 1
+        auth_cache_total.inc("miss")
+        started = time.perf_counter()
+        try:
+            claims = self._decode(token)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.verify_seconds += elapsed
+            auth_verify_seconds.observe(value=elapsed)
+
+        expires_at = now + self.max_ttl
+        if isinstance(claims.get("exp"), (int, float)):
+            expires_at = claims["exp"] + self.leeway
+        self._cache[digest] = (claims, expires_at)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return claims
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "keys": sorted(self.keys),
+            "algorithms": self.algorithms,
+            "cached_tokens": len(self._cache),
+            "cache_size": self.cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "avg_verify_us": self.verify_seconds / self.misses * 1e6 if self.misses else 0.0,
+        }
+
+
+def configured_keys(reload: bool = False) -> Dict[str, str]:
+    """``JWT_KEYS`` plus ``JWT_SECRET`` as kid "default"; ``reload`` re-reads them from ``.env``"""
+    settings = get_settings()
+    jwt_keys, jwt_secret = settings.jwt_keys, settings.jwt_secret
+    if reload:
+        # Same precedence as at startup: the process environment, then .env,
+        # where a removed or empty entry now means no key
+        values = {**dotenv_values(find_dotenv()), **PROCESS_ENVIRONMENT}
+        jwt_keys = values.get("JWT_KEYS") or ""
+        jwt_secret = values.get("JWT_SECRET") or ""
+    keys = parse_keys(jwt_keys)
+    if jwt_secret and jwt_secret != PLACEHOLDER_SECRET:
+        keys.setdefault("default", jwt_secret)
+    return keys
+
+
+def reload_keys() -> List[str]:
+    """Swap in the keys currently configured in ``.env``; returns the active key ids"""
+    keys = configured_keys(reload=True)
+    verifier = get_verifier()
+    if keys != verifier.keys:
+        verifier.set_keys(keys)
+        logger.info(f"JWT keys reloaded, active kids: {', '.join(sorted(keys)) or 'none'}")
+    return sorted(keys)
+
+
+@lru_cache(maxsize=None)
+def get_verifier() -> TokenVerifier:
+    settings = get_settings()
+    keys = configured_keys()
+    if settings.auth_required and not keys:
+        logger.warning("AUTH_REQUIRED is set but no JWT keys are configured; every request will be rejected")
+    return TokenVerifier(keys, [a.strip() for a in settings.jwt_algorithms.split(",") if a.strip()],
+                         audience=settings.jwt_audience, issuer=settings.jwt_issuer,
+                         cache_size=settings.jwt_cache_size)
+
+
+async def authenticate(request: Request, authorization: Optional[str] = Header(default=None)) -> Optional[Dict]:
+    """Verify the bearer token, if any, and expose its claims as ``request.state.claims``
+
+    Without a token the request passes anonymously unless ``AUTH_REQUIRED`` is
+    set; a token that is present but invalid is always rejected.
+    """
+    scheme, _, token = (authorization or "").partition(" ")
+    if not token or scheme.lower() != "bearer":
+        if get_settings().auth_required:
+            raise AuthError("Bearer token required")
+        request.state.claims = None
+        return None
+    claims = get_verifier().verify(token.strip())
+    request.state.claims = claims
+    return claims
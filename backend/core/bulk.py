@@ -0,0 +1,171 @@
+"""
+Bounded-concurrency batch execution against rate-limited upstream APIs.
+
+``run_bulk`` drains a priority queue (higher priority first, then
+submission order) with a fixed number of workers and yields one event per
+finished item as soon as it finishes, so callers can stream progress.
+Items that fail with a ``RetryableError`` or an ``httpx.TransportError``
+(connection failures, timeouts) are requeued with backoff; others are
+reported as failures and the batch carries on.
+
+``RateLimitPacer`` watches the ``X-RateLimit-*`` headers of every upstream
+response. When the remaining budget drops under ``reserve`` it spreads the
+rest of the budget over the time left in the window, and when the upstream
+says the budget is gone (403/429 with ``Retry-After`` or zero remaining) all
+workers pause until it resets. Pauses longer than ``max_pause`` are not
+waited out: the affected items fail with a rate-limit error instead.
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from .responses import dumps
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_STATUSES = (403, 429)
+
+
+class RetryableError(Exception):
+    """Item failure worth another attempt, optionally after ``delay`` seconds"""
+
+    def __init__(self, message: str, delay: Optional[float] = None):
+        super().__init__(message)
+        self.delay = delay
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class RateLimitPacer:
+    def __init__(self, reserve: int = 10, max_pause: float = 60.0):
+        self.reserve = reserve
+        self.max_pause = max_pause
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0  # epoch seconds
+        self.paused_until = 0.0  # monotonic
+        self._next_slot = 0.0
+        self.pauses = 0
+
+    def update(self, response: httpx.Response) -> Optional[float]:
+        """Record the upstream's budget; returns the pause if this response was a rate-limit rejection"""
+        headers = response.headers
+        if "x-ratelimit-remaining" in headers:
+            try:
+                self.remaining = int(headers["x-ratelimit-remaining"])
+                self.reset_at = float(headers.get("x-ratelimit-reset", self.reset_at))
+            except ValueError:
+                pass
+        if response.status_code not in RATE_LIMIT_STATUSES:
+            return None
+        if "retry-after" not in headers and self.remaining != 0:
+            return None  # a 403 that is about permissions, not budget
+        try:
+            delay = float(headers["retry-after"])
+        except (KeyError, ValueError):
+            delay = max(0.0, self.reset_at - time.time())
+        if time.monotonic() + delay > self.paused_until:
+            self.paused_until = time.monotonic() + delay
+            self.pauses += 1
+            logger.warning(f"Upstream rate limit reached, pausing {delay:.1f}s")
+        return delay
+
+    def delay(self) -> float:
+        """Seconds the next request should wait, reserving its slot if within ``max_pause``"""
+        now = time.monotonic()
+        delay = self.paused_until - now
+        if self.remaining is not None and self.remaining < self.reserve:
+            interval = max(0.0, self.reset_at - time.time()) / max(self.remaining, 1)
+            slot = max(self._next_slot, now)
+            delay = max(delay, slot - now)
+            if delay <= self.max_pause:
+                self._next_slot = slot + interval
+        return max(0.0, delay)
+
+    async def wait(self):
+        delay = self.delay()
+        if delay > self.max_pause:
+            raise RateLimitExceeded(f"Upstream rate limit budget would need a {delay:.0f}s wait")
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"remaining": self.remaining, "reset_at": self.reset_at or None, "pauses": self.pauses}
+
+
+@dataclass(order=True)
+class _Entry:
+    priority: int
+    sequence: int
+    index: int = field(compare=False)
+    item: Any = field(compare=False)
+    attempt: int = field(default=1, compare=False)
+    started: float = field(default=0.0, compare=False)
+
+
+async def run_bulk(
+    items: List[Any],
+    handler: Callable[[Any, int], Awaitable[Dict[str, Any]]],
+    concurrency: int = 4,
+    priority: Callable[[Any], int] = lambda item: 0,
+    max_attempts: int = 3,
+    backoff: float = 0.5,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Run ``handler(item, attempt)`` over ``items``; yields a result event per item as it finishes"""
+    queue: "asyncio.PriorityQueue[_Entry]" = asyncio.PriorityQueue()
+    results: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+    sequence = itertools.count()
+    for index, item in enumerate(items):
+        queue.put_nowait(_Entry(-priority(item), next(sequence), index, item, started=time.perf_counter()))
+
+    async def requeue(entry: _Entry, delay: float):
+        await asyncio.sleep(delay)
+        entry.sequence = next(sequence)
+        queue.put_nowait(entry)
+
+    async def worker():
+        while True:
+            entry = await queue.get()
+            try:
+                result = await handler(entry.item, entry.attempt)
+                event = {"status": "succeeded", **result}
+            except (RetryableError, httpx.TransportError) as e:
+                if entry.attempt < max_attempts:
+                    entry.attempt += 1
+                    delay = getattr(e, "delay", None)
+                    if delay is None:
+                        delay = backoff * 2 ** (entry.attempt - 2)
+                    requeues.append(asyncio.create_task(requeue(entry, delay)))
+                    continue
+                event = {"status": "failed", "error": str(e)}
+            except RateLimitExceeded as e:
+                event = {"status": "failed", "error": str(e)}
+            except Exception as e:
+                logger.error(f"Bulk item {entry.index} failed: {e}")
+                event = {"status": "failed", "error": str(e) or type(e).__name__}
+            finally:
+                queue.task_done()
+            await results.put({"event": "result", "index": entry.index, "attempts": entry.attempt,
+                               "elapsed": time.perf_counter() - entry.started, **event})
+
+    requeues: List[asyncio.Task] = []
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, len(items))))]
+    try:
+        for _ in range(len(items)):
+            yield await results.get()
+    finally:
+        for task in workers + requeues:
+            task.cancel()
+
+
+async def ndjson(events: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """Encode events as newline-delimited JSON for a StreamingResponse"""
+    async for event in events:
+        yield dumps(event) + b"\n"
@@ -0,0 +1,300 @@
+"""
+Negotiated response compression for the OmniAI backend.
+
+Picks zstd, brotli or gzip from the client's Accept-Encoding (zstd and
+brotli only when their libraries are installed). Buffered bodies below
+``minimum_size`` are passed through untouched; streamed bodies are
+compressed incrementally and flushed per chunk so progress streams keep
+flowing. Responses that already carry a Content-Encoding, are partial, or
+have an already-compressed media type are skipped. Strong ETags on
+compressed responses are downgraded to weak ones.
+
+Every compressed response is accounted per route (bytes in/out and CPU
+time spent compressing) in ``compression_stats``.
+"""
+
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+INCOMPRESSIBLE_TYPES = (
+    "image/", "video/", "audio/", "font/woff",
+    "application/zip", "application/gzip", "application/x-gzip",
+    "application/x-bzip2", "application/x-7z-compressed", "application/zstd",
+    "application/x-xz", "application/octet-stream", "application/pdf",
+    "model/gltf-binary", "model/vnd.usd",
+)
+COMPRESSIBLE_IMAGES = ("image/svg+xml",)
+
+
+def is_compressible(content_type: str) -> bool:
+    """Whether a body of this type is worth encoding on the fly"""
+    content_type = content_type.lower()
+    return content_type.startswith(COMPRESSIBLE_IMAGES) or not content_type.startswith(INCOMPRESSIBLE_TYPES)
+
+
+def route_label(scope: Scope) -> str:
+    """Templated route path, or a single bucket for unrouted requests to bound cardinality"""
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or "unmatched"
+
+
+class _GzipCompressor:
+    encoding = "gzip"
+
+    def __init__(self, level: int):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush(zlib.Z_FINISH)
+
+
+class _BrotliCompressor:
+    encoding = "br"
+
+    def __init__(self, quality: int):
+        self._obj = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+    def finish(self) -> bytes:
+        return self._obj.finish()
+
+
+class _ZstdCompressor:
+    encoding = "zstd"
+
+    def __init__(self, level: int):
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+def available_encodings() -> List[str]:
+    """Encodings this process can produce, in server preference order"""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def negotiate_encoding(accept_encoding: str, supported: List[str]) -> Optional[str]:
+    """Choose the best supported encoding by client q-value, then server preference"""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+
+    wildcard = weights.get("*", 0.0)
+    best: Optional[Tuple[float, int, str]] = None
+    for rank, encoding in enumerate(supported):
+        q = weights.get(encoding, wildcard)
+        if q <= 0:
+            continue
+        candidate = (q, -rank, encoding)
+        if best is None or candidate > best:
+            best = candidate
+    return best[2] if best else None
+
+
+class CompressionStats:
+    """Per-route compression ratio and CPU cost"""
+
+    def __init__(self):
+        self.routes: Dict[str, Dict[str, Dict[str, float]]] = {}
+
+    def record(self, route: str, encoding: str, bytes_in: int, bytes_out: int, cpu_seconds: float):
+        per_route = self.routes.setdefault(route, {})
+        stats = per_route.get(encoding)
+        if stats is None:
+            stats = per_route[encoding] = {"responses": 0, "bytes_in": 0, "bytes_out": 0, "cpu_seconds": 0.0}
+        stats["responses"] += 1
+        stats["bytes_in"] += bytes_in
+        stats["bytes_out"] += bytes_out
+        stats["cpu_seconds"] += cpu_seconds
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        report = {}
+        for route, encodings in self.routes.items():
+            report[route] = {}
+            for encoding, stats in encodings.items():
+                report[route][encoding] = {
+                    **stats,
+                    "ratio": stats["bytes_in"] / stats["bytes_out"] if stats["bytes_out"] else 0.0,
+                    "cpu_us_per_response": stats["cpu_seconds"] / stats["responses"] * 1e6,
+                }
+        return report
+
+
+compression_stats = CompressionStats()
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6,
+                 brotli_quality: int = 4, zstd_level: int = 3, stats: CompressionStats = compression_stats):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.zstd_level = zstd_level
+        self.stats = stats
+        self.supported = available_encodings()
+
+    def _compressor(self, encoding: str):
+        if encoding == "zstd":
+            return _ZstdCompressor(self.zstd_level)
+        if encoding == "br":
+            return _BrotliCompressor(self.brotli_quality)
+        return _GzipCompressor(self.gzip_level)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""), self.supported)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, scope, send, encoding)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, scope: Scope, send: Send, encoding: str):
+        self.middleware = middleware
+        self.scope = scope
+        self._send = send
+        self.encoding = encoding
+        self.start_message: Optional[Message] = None
+        self.compressor = None
+        self.passthrough = False
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+
+    def _should_skip(self, message: Message) -> bool:
+        if message["status"] in (204, 206, 304):
+            return True
+        headers = Headers(raw=message["headers"])
+        if "content-encoding" in headers or "content-range" in headers:
+            return True
+        return not is_compressible(headers.get("content-type", ""))
+
+    def _start_compressed(self, content_length: Optional[int] = None):
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"  # the encoded bytes differ from what a strong tag promised
+        if content_length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(content_length)
+
+    def _run(self, func, data: bytes = None) -> bytes:
+        started = time.thread_time()
+        output = func(data) if data is not None else func()
+        self.cpu_seconds += time.thread_time() - started
+        self.bytes_out += len(output)
+        return output
+
+    def _record(self):
+        self.middleware.stats.record(route_label(self.scope), self.encoding,
+                                     self.bytes_in, self.bytes_out, self.cpu_seconds)
+
+    async def send(self, message: Message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            self.start_message = message
+            self.passthrough = self._should_skip(message)
+            if self.passthrough:
+                await self._send(message)
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            if not self.passthrough and self.compressor is None:
+                # e.g. a zero-copy send: the body never passes through here, so send it as is
+                self.passthrough = True
+                await self._send(self.start_message)
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            if not more_body:
+                # Whole body in one message: compress in one shot if it is worth it
+                if len(body) < self.middleware.minimum_size:
+                    self.passthrough = True
+                    await self._send(self.start_message)
+                    await self._send(message)
+                    return
+                self.compressor = self.middleware._compressor(self.encoding)
+                self.bytes_in = len(body)
+                compressed = self._run(self.compressor.compress, body) + self._run(self.compressor.finish)
+                self._start_compressed(len(compressed))
+                await self._send(self.start_message)
+                await self._send({"type": "http.response.body", "body": compressed})
+                self._record()
+                return
+
+            self.compressor = self.middleware._compressor(self.encoding)
+            self._start_compressed()
+            await self._send(self.start_message)
+
+        self.bytes_in += len(body)
+        chunk = self._run(self.compressor.compress, body)
+        if more_body:
+            chunk += self._run(self.compressor.flush)
+            await self._send({"type": "http.response.body", "body": chunk, "more_body": True})
+        else:
+            chunk += self._run(self.compressor.finish)
+            await self._send({"type": "http.response.body", "body": chunk})
+            self._record()
@@ -4,17 +4,51 @@ from dataclasses import dataclass
 from typing import Optional
 from dotenv import load_dotenv
 
+# The real process environment, before .env fills in what it lacks; values
+# reloaded from .env later must not be shadowed by .env's own earlier copy
+PROCESS_ENVIRONMENT = dict(os.environ)
 load_dotenv()
 
 @dataclass
 class Settings:
+    # Server
+    host: str = os.getenv("HOST", "0.0.0.0")
+    port: int = int(os.getenv("PORT", "5000"))
+    web_concurrency: int = int(os.getenv("WEB_CONCURRENCY", "0"))  # 0 = one worker per CPU
+    graceful_shutdown_timeout: int = int(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", "30"))
+    compression_minimum_size: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+    metrics_multiproc_dir: str = os.getenv("METRICS_MULTIPROC_DIR", "")
+    frontend_dist_dir: str = os.getenv("FRONTEND_DIST_DIR", "")  # empty = frontend served by Vite
+
+    # Tracing
+    trace_sample_rate: float = float(os.getenv("TRACE_SAMPLE_RATE", "0.0"))
+    trace_export_file: str = os.getenv("TRACE_EXPORT_FILE", "")
+    trace_otlp_endpoint: str = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "")
+
+    # Diagnostics
+    loop_lag_threshold_ms: float = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "100"))
+
+    # Upstream mocks for offline load runs (any GITHUB_TOKEN/VERCEL_TOKEN value is accepted)
+    mock_upstreams: bool = os.getenv("MOCK_UPSTREAMS", "false").lower() == "true"
+    mock_latency_ms: float = float(os.getenv("MOCK_LATENCY_MS", "50"))
+    mock_latency_sigma: float = float(os.getenv("MOCK_LATENCY_SIGMA", "0.5"))
+    mock_error_rate: float = float(os.getenv("MOCK_ERROR_RATE", "0.0"))
+    mock_rate_limit: int = int(os.getenv("MOCK_RATE_LIMIT", "5000"))
+
     # Database
     redis_url: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
     postgres_url: str = os.getenv("POSTGRES_URL", "")
     
     # Security
     jwt_secret: str = os.getenv("JWT_SECRET", "your-jwt-secret-here")
+    jwt_keys: str = os.getenv("JWT_KEYS", "")  # kid:secret,kid:secret; JWT_SECRET is kid "default"
+    jwt_algorithms: str = os.getenv("JWT_ALGORITHMS", "HS256")
+    jwt_audience: str = os.getenv("JWT_AUDIENCE", "")
+    jwt_issuer: str = os.getenv("JWT_ISSUER", "")
+    jwt_cache_size: int = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+    auth_required: bool = os.getenv("AUTH_REQUIRED", "false").lower() == "true"
     encryption_key: str = os.getenv("ENCRYPTION_KEY", "your-encryption-key-here")
+    admin_token: str = os.getenv("ADMIN_TOKEN", "")
     
     # NVIDIA
     nvidia_developer_api_key: Optional[str] = os.getenv("NVIDIA_DEVELOPER_API_KEY")
@@ -31,6 +65,12 @@ class Settings:
     vercel_token: Optional[str] = os.getenv("VERCEL_TOKEN")
     vercel_org_id: Optional[str] = os.getenv("VERCEL_ORG_ID")
     vercel_project_id: Optional[str] = os.getenv("VERCEL_PROJECT_ID")
+
+    # Tenants (per-tenant tokens fall back to GITHUB_TOKEN/VERCEL_TOKEN)
+    credential_vault_path: str = os.getenv("CREDENTIAL_VAULT_PATH", "data/credentials.db")
+    tenant_claim: str = os.getenv("TENANT_CLAIM", "tenant")
+    tenant_max_concurrency: int = int(os.getenv("TENANT_MAX_CONCURRENCY", "8"))
+    tenant_max_connections: int = int(os.getenv("TENANT_MAX_CONNECTIONS", "16"))
     
     # File Storage
     upload_directory: str = os.getenv("UPLOAD_DIRECTORY", "/tmp/uploads")
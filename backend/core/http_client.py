@@ -0,0 +1,75 @@
+"""
+Instrumented httpx clients for calls to upstream APIs (GitHub, Vercel, ...).
+
+Every request made through ``create_client`` is timed per upstream host,
+counted by status in the backend metrics registry and recorded as a client
+span of the current trace. With ``MOCK_UPSTREAMS`` enabled the GitHub and
+Vercel origins are served by the in-process mocks in ``backend.mocks``.
+
+All clients share one SSL context: building a fresh one (loading the CA
+bundle) costs tens of milliseconds, which used to dominate short-lived
+per-request clients.
+"""
+
+import ssl
+import time
+from functools import lru_cache
+from typing import Callable, Optional
+
+import httpx
+
+from .config import get_settings
+from .metrics import upstream_request_duration, upstream_requests_total
+from .tracing import span
+
+SPAN_KIND_CLIENT = 3
+DEFAULT_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)  # httpx's own default
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        method = request.method
+        with span(f"{method} {host}", kind=SPAN_KIND_CLIENT, **{"http.url": str(request.url)}) as client_span:
+            start = time.perf_counter()
+            try:
+                response = await self.transport.handle_async_request(request)
+            except Exception:
+                upstream_request_duration.observe(host, method, value=time.perf_counter() - start)
+                upstream_requests_total.inc(host, method, "error")
+                raise
+            upstream_request_duration.observe(host, method, value=time.perf_counter() - start)
+            upstream_requests_total.inc(host, method, str(response.status_code))
+            if client_span is not None:
+                client_span.attributes["http.status_code"] = response.status_code
+            return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+@lru_cache(maxsize=None)
+def ssl_context() -> ssl.SSLContext:
+    return httpx.create_ssl_context()
+
+
+def create_client(limits: Optional[httpx.Limits] = None,
+                  wrap: Optional[Callable[[httpx.AsyncBaseTransport], httpx.AsyncBaseTransport]] = None,
+                  **kwargs) -> httpx.AsyncClient:
+    """``httpx.AsyncClient`` whose requests are recorded in the upstream metrics
+
+    ``limits`` sizes the connection pool; ``wrap`` decorates every transport
+    (including mocks), e.g. to apply a concurrency quota.
+    """
+    wrap = wrap or (lambda transport: transport)
+    pool = httpx.AsyncHTTPTransport(verify=ssl_context(), limits=limits or DEFAULT_LIMITS)
+    transport = wrap(InstrumentedTransport(pool))
+    if get_settings().mock_upstreams:
+        from ..mocks import mock_mounts
+
+        mounts = {origin: wrap(InstrumentedTransport(mock)) for origin, mock in mock_mounts().items()}
+        kwargs["mounts"] = {**mounts, **kwargs.get("mounts", {})}
+    return httpx.AsyncClient(transport=transport, **kwargs)
@@ -0,0 +1,149 @@
+"""
+Event-loop lag watchdog for the OmniAI backend.
+
+A heartbeat task sleeps for ``interval`` and records how late it wakes up,
+which is exactly how long every other request on the worker was kept
+waiting. A watchdog thread checks the heartbeat; when it has not beaten for
+longer than ``threshold`` the loop is blocked right now, so the thread grabs
+the loop thread's current stack, i.e. the offending callback. Recent
+offenders are kept for the admin API and stalls are counted in /metrics.
+
+Steady-state cost is one timer callback per ``interval`` on the loop and a
+timestamp comparison per watchdog wake-up.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+event_loop_lag = registry.histogram(
+    "omniai_event_loop_lag_seconds", "Delay of the event loop heartbeat beyond its schedule", buckets=LAG_BUCKETS)
+event_loop_stalls_total = registry.counter(
+    "omniai_event_loop_stalls_total", "Times the event loop was blocked past the lag threshold")
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.1, threshold: float = 0.1, max_offenders: int = 50):
+        self.interval = interval
+        self.threshold = threshold
+        self.offenders: Deque[Dict] = deque(maxlen=max_offenders)
+        self.max_lag = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._current_stall: Optional[Dict] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="omniai-loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _heartbeat(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - scheduled)
+            self._last_beat = time.monotonic()
+            event_loop_lag.observe(value=lag)
+            self.max_lag = max(self.max_lag, lag)
+
+            stall = self._current_stall
+            if stall is not None:
+                # The watchdog caught this stall while it was happening
+                stall["lag_seconds"] = round(lag, 6)
+                self._current_stall = None
+            elif lag > self.threshold:
+                # Blocked for less than a watchdog period: no stack, but still counted
+                event_loop_stalls_total.inc()
+                self.offenders.append({
+                    "timestamp": time.time(),
+                    "lag_seconds": round(lag, 6),
+                    "task": None,
+                    "stack": [],
+                })
+
+    def _watch(self):
+        period = max(self.threshold / 2, 0.01)
+        while not self._stopped.wait(period):
+            blocked_for = time.monotonic() - self._last_beat - self.interval
+            if blocked_for > self.threshold and self._current_stall is None:
+                self._capture(blocked_for)
+
+    def _capture(self, blocked_for: float):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        stack = [
+            f"{entry.filename}:{entry.lineno} in {entry.name}"
+            for entry in traceback.extract_stack(frame)
+        ]
+        task = None
+        try:
+            current = asyncio.current_task(self._loop)
+            if current is not None:
+                task = f"{current.get_name()} {current.get_coro()!r}"
+        except RuntimeError:
+            pass
+
+        stall = {
+            "timestamp": time.time(),
+            "lag_seconds": round(blocked_for, 6),  # updated once the loop recovers
+            "task": task,
+            "stack": stack,
+        }
+        self._current_stall = stall
+        self.offenders.append(stall)
+        event_loop_stalls_total.inc()
+        logger.warning(f"Event loop blocked for {blocked_for * 1000:.0f}ms in {stack[-1] if stack else '?'}")
+
+    def report(self) -> Dict:
+        return {
+            "pid": os.getpid(),
+            "interval_seconds": self.interval,
+            "threshold_seconds": self.threshold,
+            "max_lag_seconds": self.max_lag,
+            "stalls": list(self.offenders)[::-1],
+        }
+
+
+loop_monitor: Optional[LoopLagMonitor] = None
+
+
+def get_loop_monitor() -> Optional[LoopLagMonitor]:
+    return loop_monitor
+
+
+def start_loop_monitor(threshold: float) -> LoopLagMonitor:
+    global loop_monitor
+    loop_monitor = LoopLagMonitor(threshold=threshold)
+    loop_monitor.start()
+    return loop_monitor
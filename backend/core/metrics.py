@@ -0,0 +1,318 @@
+"""
+In-process metrics for the OmniAI backend, exported in Prometheus text format.
+
+Each worker records into plain Python counters and bucket arrays owned by its
+event loop thread, so recording needs no locks. When the backend runs with
+several workers (see ``backend.core.server``) every worker periodically
+writes a snapshot to ``multiprocess_dir``; whichever worker answers
+``/metrics`` merges all snapshots so the scrape covers the whole process
+group. Gauges of workers that have exited are dropped during the merge,
+counters and histograms are kept so totals never go backwards.
+"""
+
+import asyncio
+import glob
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .compression import compression_stats, route_label
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricFamily:
+    def __init__(self, name: str, kind: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.kind = kind
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.values: Dict[LabelValues, object] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.values[labels] = self.values.get(labels, 0.0) - amount
+
+    def set(self, *labels: str, value: float):
+        self.values[labels] = value
+
+    def observe(self, *labels: str, value: float):
+        histogram = self.values.get(labels)
+        if histogram is None:
+            histogram = self.values[labels] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def snapshot(self) -> dict:
+        if self.kind == "histogram":
+            samples = [[list(labels), h.counts, h.sum, h.count] for labels, h in self.values.items()]
+        else:
+            samples = [[list(labels), value] for labels, value in self.values.items()]
+        return {
+            "kind": self.kind,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "buckets": list(self.buckets),
+            "samples": samples,
+        }
+
+
+class MetricsRegistry:
+    def __init__(self, multiprocess_dir: Optional[str] = None):
+        self.families: Dict[str, MetricFamily] = {}
+        self.collectors: List[Callable[[], Dict[str, dict]]] = []
+        self.multiprocess_dir = multiprocess_dir
+
+    def _family(self, name: str, kind: str, documentation: str, labelnames: Sequence[str],
+                buckets: Sequence[float] = LATENCY_BUCKETS) -> MetricFamily:
+        family = self.families.get(name)
+        if family is None:
+            family = self.families[name] = MetricFamily(name, kind, documentation, labelnames, buckets)
+        return family
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> MetricFamily:
+        return self._family(name, "counter", documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> MetricFamily:
+        return self._family(name, "gauge", documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> MetricFamily:
+        return self._family(name, "histogram", documentation, labelnames, buckets)
+
+    def register_collector(self, collector: Callable[[], Dict[str, dict]]):
+        """Add a callable returning extra snapshot families, evaluated at snapshot time"""
+        self.collectors.append(collector)
+
+    def snapshot(self) -> Dict[str, dict]:
+        families = {name: family.snapshot() for name, family in self.families.items()}
+        for collector in self.collectors:
+            families.update(collector())
+        return families
+
+    # Multi-worker aggregation
+
+    def _snapshot_path(self, pid: int) -> str:
+        return os.path.join(self.multiprocess_dir, f"metrics-{pid}.json")
+
+    def write_snapshot(self):
+        if not self.multiprocess_dir:
+            return
+        path = self._snapshot_path(os.getpid())
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def collect(self) -> Dict[str, dict]:
+        """Snapshot of this worker, merged with every other worker when running multi-process"""
+        if not self.multiprocess_dir:
+            return self.snapshot()
+
+        self.write_snapshot()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.multiprocess_dir, "metrics-*.json")):
+            pid = int(os.path.basename(path)[len("metrics-"):-len(".json")])
+            try:
+                with open(path) as f:
+                    snapshots.append((_pid_alive(pid), json.load(f)))
+            except (OSError, ValueError):
+                continue
+        return merge_snapshots(snapshots)
+
+    async def flush_periodically(self, interval: float = 5.0):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.write_snapshot()
+            except OSError as e:
+                logger.warning(f"Failed to write metrics snapshot: {e}")
+
+    def render(self) -> str:
+        return render_prometheus(self.collect())
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def clear_multiprocess_dir(directory: str):
+    """Remove snapshots left behind by a previous process group"""
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "metrics-*.json*")):
+        os.remove(path)
+
+
+def merge_snapshots(snapshots: Iterable[Tuple[bool, Dict[str, dict]]]) -> Dict[str, dict]:
+    merged: Dict[str, dict] = {}
+    for alive, families in snapshots:
+        for name, family in families.items():
+            if family["kind"] == "gauge" and not alive:
+                continue
+            target = merged.get(name)
+            if target is None:
+                target = merged[name] = {**family, "samples": {}}
+            samples = target["samples"]
+            for sample in family["samples"]:
+                key = tuple(sample[0])
+                existing = samples.get(key)
+                if family["kind"] == "histogram":
+                    if existing is None:
+                        samples[key] = [list(sample[1]), sample[2], sample[3]]
+                    else:
+                        existing[0] = [a + b for a, b in zip(existing[0], sample[1])]
+                        existing[1] += sample[2]
+                        existing[2] += sample[3]
+                else:
+                    samples[key] = (existing or 0.0) + sample[1]
+
+    for family in merged.values():
+        if family["kind"] == "histogram":
+            family["samples"] = [[list(k), *v] for k, v in family["samples"].items()]
+        else:
+            family["samples"] = [[list(k), v] for k, v in family["samples"].items()]
+    return merged
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_float(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def render_prometheus(families: Dict[str, dict]) -> str:
+    lines = []
+    for name in sorted(families):
+        family = families[name]
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['kind']}")
+        names = family["labelnames"]
+        if family["kind"] == "histogram":
+            bounds = list(family["buckets"]) + [float("inf")]
+            for labels, counts, total, count in family["samples"]:
+                cumulative = 0
+                for bound, bucket_count in zip(bounds, counts):
+                    cumulative += bucket_count
+                    le = f'le="{_format_float(bound)}"'
+                    lines.append(f"{name}_bucket{_labels(names, labels, le)} {cumulative}")
+                lines.append(f"{name}_sum{_labels(names, labels)} {_format_float(total)}")
+                lines.append(f"{name}_count{_labels(names, labels)} {count}")
+        else:
+            for labels, value in family["samples"]:
+                lines.append(f"{name}{_labels(names, labels)} {_format_float(value)}")
+    return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests_total = registry.counter(
+    "omniai_http_requests_total", "HTTP requests handled", ("method", "route", "status"))
+http_request_duration = registry.histogram(
+    "omniai_http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+http_requests_in_flight = registry.gauge(
+    "omniai_http_requests_in_flight", "HTTP requests currently being handled")
+upstream_requests_total = registry.counter(
+    "omniai_upstream_requests_total", "Requests made to upstream APIs", ("host", "method", "status"))
+upstream_request_duration = registry.histogram(
+    "omniai_upstream_request_duration_seconds", "Upstream API latency until response headers", ("host", "method"))
+
+
+def _compression_families() -> Dict[str, dict]:
+    labelnames = ["route", "encoding"]
+    families = {
+        "omniai_compression_input_bytes_total": ("Response bytes before compression", "bytes_in"),
+        "omniai_compression_output_bytes_total": ("Response bytes after compression", "bytes_out"),
+        "omniai_compression_cpu_seconds_total": ("CPU time spent compressing responses", "cpu_seconds"),
+        "omniai_compression_responses_total": ("Compressed responses", "responses"),
+    }
+    return {
+        name: {
+            "kind": "counter",
+            "help": documentation,
+            "labelnames": labelnames,
+            "buckets": [],
+            "samples": [
+                [[route, encoding], stats[field]]
+                for route, encodings in compression_stats.routes.items()
+                for encoding, stats in encodings.items()
+            ],
+        }
+        for name, (documentation, field) in families.items()
+    }
+
+
+registry.register_collector(_compression_families)
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_requests_in_flight.dec()
+            method = scope["method"]
+            route = route_label(scope)
+            http_request_duration.observe(method, route, value=elapsed)
+            http_requests_total.inc(method, route, str(status_code))
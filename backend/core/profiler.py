@@ -0,0 +1,107 @@
+"""
+On-demand statistical profiler for the OmniAI backend.
+
+Nothing runs until a profile is requested. ``SamplingProfiler.run`` then
+wakes up ``rate`` times per second on its own thread, snapshots the stack
+of every other thread via ``sys._current_frames`` and, if an event loop is
+given, the await chain of every pending asyncio task. Stacks are folded
+into the collapsed format (``frame;frame;frame count``) understood by
+flamegraph.pl, speedscope and inferno.
+
+The cost per sample is proportional to the number of threads and tasks,
+and sampling stops when ``seconds`` have elapsed, so overhead is bounded.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import List, Optional
+
+MAX_DEPTH = 128
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _thread_stack(frame) -> List[str]:
+    stack = []
+    while frame is not None and len(stack) < MAX_DEPTH:
+        stack.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _task_stack(task: asyncio.Task) -> List[str]:
+    """Await chain of a suspended task, outermost coroutine first"""
+    stack = []
+    coro = task.get_coro()
+    while coro is not None and len(stack) < MAX_DEPTH:
+        code = getattr(coro, "cr_code", None) or getattr(coro, "gi_code", None)
+        if code is None:
+            break
+        stack.append(_frame_label(code))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return stack
+
+
+class SamplingProfiler:
+    def __init__(self, rate: float = 100.0, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.rate = rate
+        self.loop = loop
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.elapsed = 0.0
+
+    def _sample_threads(self, own_ident: int):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            stack = _thread_stack(frame)
+            if stack:
+                thread = names.get(ident, str(ident)).replace(" ", "_")
+                self.samples[";".join([f"thread:{thread}"] + stack)] += 1
+
+    def _sample_tasks(self):
+        try:
+            tasks = list(asyncio.all_tasks(self.loop))
+        except RuntimeError:
+            return  # task set changed while copying it; skip this tick
+        for task in tasks:
+            if task.done():
+                continue
+            stack = _task_stack(task)
+            if stack:
+                self.samples[";".join([f"task:{task.get_name()}"] + stack)] += 1
+
+    def run(self, seconds: float) -> "SamplingProfiler":
+        """Sample for ``seconds`` on the calling thread (run it off the event loop)"""
+        own_ident = threading.get_ident()
+        interval = 1.0 / self.rate
+        start = time.perf_counter()
+        deadline = start + seconds
+        next_tick = start
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            if now < next_tick:
+                time.sleep(next_tick - now)
+            self._sample_threads(own_ident)
+            if self.loop is not None:
+                self._sample_tasks()
+            self.sample_count += 1
+            # Fixed rate: skip ticks we were too slow for instead of bursting
+            next_tick += interval
+            if next_tick < time.perf_counter():
+                next_tick = time.perf_counter() + interval
+        self.elapsed = time.perf_counter() - start
+        return self
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
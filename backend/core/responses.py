@@ -0,0 +1,53 @@
+"""
+Response helpers for the OmniAI backend.
+
+``FastJSONResponse`` is the app-wide default response class and renders with
+orjson when it is installed, falling back to the stdlib encoder otherwise.
+``PreEncodedPayload`` keeps the encoded bytes of a payload that rarely
+changes and only re-encodes when the inputs it depends on change.
+"""
+
+import json
+from typing import Any, Callable, Hashable, Optional
+
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """Encode ``content`` as compact UTF-8 JSON"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class PreEncodedPayload:
+    """JSON payload encoded once and reused until its inputs change"""
+
+    media_type = "application/json"
+
+    def __init__(self, build: Callable[[], Any], inputs: Optional[Callable[[], Hashable]] = None):
+        self.build = build
+        self.inputs = inputs
+        self._key: Hashable = object()
+        self._body: bytes = b""
+
+    @property
+    def body(self) -> bytes:
+        key = self.inputs() if self.inputs else None
+        if key != self._key:
+            self._body = dumps(self.build())
+            self._key = key
+        return self._body
+
+    def response(self) -> Response:
+        return Response(content=self.body, media_type=self.media_type)
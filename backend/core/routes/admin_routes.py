@@ -0,0 +1,94 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+from typing import Optional
+import asyncio
+import os
+import secrets
+from ..auth import get_verifier, reload_keys
+from ..config import get_settings
+from ..loop_monitor import get_loop_monitor
+from ..profiler import SamplingProfiler
+from ..tenants import PROVIDERS, get_tenant_pools, get_vault
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    """Allow the request only with the configured admin token"""
+    admin_token = get_settings().admin_token
+    if not admin_token:
+        raise HTTPException(status_code=403, detail="Admin API disabled")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+router = APIRouter(prefix="/api/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+# One profile per worker at a time
+profile_lock = asyncio.Lock()
+
+@router.get("/event-loop")
+async def get_event_loop_report():
+    """Event-loop lag and recent blocking callbacks for this worker"""
+    monitor = get_loop_monitor()
+    if monitor is None:
+        raise HTTPException(status_code=503, detail="Event loop monitor not running")
+    return monitor.report()
+
+@router.get("/auth-cache")
+async def get_auth_cache_report():
+    """Verified-claims cache hit ratio and signature verification cost for this worker"""
+    return get_verifier().stats()
+
+@router.post("/auth-keys/reload")
+async def reload_auth_keys():
+    """Re-read JWT_KEYS/JWT_SECRET from .env on this worker; SIGHUP the server to reload every worker"""
+    return {"keys": reload_keys(), "worker": os.getpid()}
+
+class CredentialUpdate(BaseModel):
+    token: str = Field(min_length=1)
+
+class QuotaUpdate(BaseModel):
+    max_concurrency: int = Field(gt=0, le=1000)
+
+def _check_provider(provider: str):
+    if provider not in PROVIDERS:
+        raise HTTPException(status_code=404, detail=f"Unknown provider, expected one of {', '.join(PROVIDERS)}")
+
+@router.get("/tenants")
+async def list_tenants():
+    """Tenants with stored credentials or quotas, and live pool usage on this worker (tokens are never shown)"""
+    return {"tenants": get_vault().tenants(), "pools": get_tenant_pools().stats()}
+
+@router.put("/tenants/{tenant}/credentials/{provider}", status_code=204)
+async def set_tenant_credential(tenant: str, provider: str, update: CredentialUpdate):
+    """Store a tenant's upstream token, encrypted with ENCRYPTION_KEY"""
+    _check_provider(provider)
+    get_vault().set(tenant, provider, update.token)
+
+@router.delete("/tenants/{tenant}/credentials/{provider}", status_code=204)
+async def delete_tenant_credential(tenant: str, provider: str):
+    """Remove a tenant's token; the tenant falls back to the global token"""
+    _check_provider(provider)
+    if not get_vault().delete(tenant, provider):
+        raise HTTPException(status_code=404, detail="No stored credential")
+
+@router.put("/tenants/{tenant}/quota", status_code=204)
+async def set_tenant_quota(tenant: str, update: QuotaUpdate):
+    """Set how many upstream requests the tenant may have in flight per worker"""
+    get_vault().set_quota(tenant, update.max_concurrency)
+    get_tenant_pools().reset(tenant)
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(10.0, gt=0, le=60),
+    rate: float = Query(100.0, gt=0, le=1000),
+    tasks: bool = Query(True, description="Also sample pending asyncio tasks"),
+):
+    """Sample all threads (and tasks) of this worker; returns collapsed stacks for flamegraph tools"""
+    if profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running on this worker")
+    async with profile_lock:
+        profiler = SamplingProfiler(rate=rate, loop=asyncio.get_running_loop() if tasks else None)
+        await asyncio.to_thread(profiler.run, seconds)
+    return PlainTextResponse(profiler.collapsed(), headers={
+        "X-Profile-Samples": str(profiler.sample_count),
+        "X-Profile-Seconds": f"{profiler.elapsed:.3f}",
+    })
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from typing import Optional
+import asyncio
+from ..assets import SHA256, AssetResponse, AssetStore, get_asset_store
+
+router = APIRouter(prefix="/api/assets", tags=["assets"])
+
+@router.get("")
+async def list_assets(
+    path: Optional[str] = Query(None, description="Resolve one content path or digest"),
+    prefix: str = Query("", description="List content paths starting with this prefix"),
+    limit: int = Query(100, gt=0, le=1000),
+    store: AssetStore = Depends(get_asset_store),
+):
+    """Asset metadata by content path, or the content paths under a prefix"""
+    if path is not None:
+        asset = await asyncio.to_thread(store.resolve, path)
+        if asset is None:
+            raise HTTPException(status_code=404, detail=f"No asset for {path}")
+        return asset.to_dict()
+    return {"paths": await asyncio.to_thread(store.paths, prefix, limit)}
+
+@router.api_route("/{sha256}", methods=["GET", "HEAD"])
+async def get_asset(sha256: str, request: Request, store: AssetStore = Depends(get_asset_store)):
+    """Asset content; honours Range (including multiple ranges), If-Range and If-None-Match"""
+    asset = await asyncio.to_thread(store.get, sha256) if SHA256.match(sha256) else None
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    return AssetResponse(store, asset, request.headers, request.method)
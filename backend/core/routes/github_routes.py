@@ -1,20 +1,34 @@
 
 from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
-from typing import List, Optional
-import os
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+import asyncio
 import httpx
 import logging
+import time
+from ..bulk import RateLimitPacer, RetryableError, ndjson, run_bulk
+from ..tenants import Tenant, get_tenant
+from ..tracing import span
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/github", tags=["github"])
 
+FILE_ATTEMPTS = 3  # per file, on 5xx
+
 class RepositoryCreate(BaseModel):
     name: str
     description: Optional[str] = ""
     private: bool = False
     framework: str = "nextjs"
 
+class BulkRepositorySpec(RepositoryCreate):
+    priority: int = 0  # higher is provisioned first
+
+class BulkRepositoryCreate(BaseModel):
+    repositories: List[BulkRepositorySpec] = Field(min_length=1, max_length=500)
+    concurrency: int = Field(4, ge=1, le=16)
+
 class RepositoryResponse(BaseModel):
     id: int
     name: str
@@ -25,14 +39,14 @@ class RepositoryResponse(BaseModel):
     stargazers_count: int
 
 @router.get("/status")
-async def get_github_status():
+async def get_github_status(tenant: Tenant = Depends(get_tenant)):
     """Check GitHub connection status"""
-    github_token = os.getenv("GITHUB_TOKEN")
+    github_token = tenant.token("github")
     if not github_token:
         return {"connected": False, "error": "GitHub token not configured"}
     
     try:
-        async with httpx.AsyncClient() as client:
+        async with tenant.client() as client:
             response = await client.get(
                 "https://api.github.com/user",
                 headers={"Authorization": f"Bearer {github_token}"}
@@ -54,14 +68,14 @@ async def get_github_status():
         return {"connected": False, "error": str(e)}
 
 @router.get("/repositories")
-async def get_repositories():
+async def get_repositories(tenant: Tenant = Depends(get_tenant)):
     """Get user repositories"""
-    github_token = os.getenv("GITHUB_TOKEN")
+    github_token = tenant.token("github")
     if not github_token:
         raise HTTPException(status_code=401, detail="GitHub token not configured")
     
     try:
-        async with httpx.AsyncClient() as client:
+        async with tenant.client() as client:
             response = await client.get(
                 "https://api.github.com/user/repos",
                 headers={"Authorization": f"Bearer {github_token}"},
@@ -90,15 +104,15 @@ async def get_repositories():
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/repositories")
-async def create_repository(repo_data: RepositoryCreate):
+async def create_repository(repo_data: RepositoryCreate, tenant: Tenant = Depends(get_tenant)):
     """Create a new repository"""
-    github_token = os.getenv("GITHUB_TOKEN")
+    github_token = tenant.token("github")
     if not github_token:
         raise HTTPException(status_code=401, detail="GitHub token not configured")
     
     try:
         # Create repository
-        async with httpx.AsyncClient() as client:
+        async with tenant.client() as client:
             repo_payload = {
                 "name": repo_data.name,
                 "description": repo_data.description,
@@ -106,17 +120,19 @@ async def create_repository(repo_data: RepositoryCreate):
                 "auto_init": True
             }
             
-            response = await client.post(
-                "https://api.github.com/user/repos",
-                headers={"Authorization": f"Bearer {github_token}"},
-                json=repo_payload
-            )
+            with span("github.create_repo"):
+                response = await client.post(
+                    "https://api.github.com/user/repos",
+                    headers={"Authorization": f"Bearer {github_token}"},
+                    json=repo_payload
+                )
             
             if response.status_code == 201:
                 repo = response.json()
                 
                 # Add framework-specific files
-                await add_framework_files(client, github_token, repo["owner"]["login"], repo["name"], repo_data.framework)
+                with span("github.add_framework_files", framework=repo_data.framework):
+                    await add_framework_files(client, github_token, repo["owner"]["login"], repo["name"], repo_data.framework)
                 
                 return {
                     "repository": RepositoryResponse(
@@ -135,22 +151,129 @@ async def create_repository(repo_data: RepositoryCreate):
         logger.error(f"Failed to create repository: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def add_framework_files(client: httpx.AsyncClient, token: str, owner: str, repo: str, framework: str):
-    """Add framework-specific files to repository"""
+async def get_own_repository(client: httpx.AsyncClient, headers: dict, name: str) -> httpx.Response:
+    """The authenticated user's repository ``name``"""
+    try:
+        user = await client.get("https://api.github.com/user", headers=headers)
+        if user.status_code != 200:
+            raise RetryableError(f"GitHub returned HTTP {user.status_code}")
+        response = await client.get(f"https://api.github.com/repos/{user.json()['login']}/{name}", headers=headers)
+    except httpx.TransportError as e:
+        raise RetryableError(f"GitHub request failed: {e!r}")
+    if response.status_code != 200:
+        raise RetryableError(f"GitHub returned HTTP {response.status_code}")
+    return response
+
+@router.post("/repositories/bulk")
+async def create_repositories_bulk(batch: BulkRepositoryCreate, tenant: Tenant = Depends(get_tenant)):
+    """Provision many repositories; streams one NDJSON line per repository as it finishes, then a summary"""
+    github_token = tenant.token("github")
+    if not github_token:
+        raise HTTPException(status_code=401, detail="GitHub token not configured")
+    names = [spec.name for spec in batch.repositories]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise HTTPException(status_code=422, detail=f"Duplicate repository names: {', '.join(duplicates)}")
+
+    pacer = RateLimitPacer()
+    specs = batch.repositories
+
+    async def provision(spec: BulkRepositorySpec, attempt: int) -> dict:
+        async with tenant.client() as client:
+            return await provision_repository(client, github_token, spec, pacer, attempt)
+
+    async def events():
+        started = time.perf_counter()
+        counts = {"succeeded": 0, "partial": 0, "failed": 0}
+        yield {"event": "accepted", "total": len(specs), "concurrency": batch.concurrency}
+        async for event in run_bulk(specs, provision, concurrency=batch.concurrency,
+                                    priority=lambda spec: spec.priority):
+            counts[event["status"]] += 1
+            yield {**event, "name": specs[event["index"]].name}
+        yield {"event": "summary", **counts, "elapsed": time.perf_counter() - started,
+               "rate_limit": pacer.snapshot()}
+
+    return StreamingResponse(ndjson(events()), media_type="application/x-ndjson")
+
+async def add_framework_files(client: httpx.AsyncClient, token: str, owner: str, repo: str, framework: str,
+                              pacer: Optional[RateLimitPacer] = None) -> Dict[str, str]:
+    """Add framework-specific files to repository; returns the outcome per file"""
     files = get_framework_files(framework)
+    results = {}
     
+    # Sequential on purpose: each PUT is a commit on the same branch
     for file_path, content in files.items():
-        try:
-            await client.put(
-                f"https://api.github.com/repos/{owner}/{repo}/contents/{file_path}",
-                headers={"Authorization": f"Bearer {token}"},
-                json={
-                    "message": f"Add {file_path}",
-                    "content": content.encode().hex()
-                }
+        for attempt in range(FILE_ATTEMPTS):
+            try:
+                if pacer:
+                    await pacer.wait()
+                with span("github.put_file", path=file_path):
+                    response = await client.put(
+                        f"https://api.github.com/repos/{owner}/{repo}/contents/{file_path}",
+                        headers={"Authorization": f"Bearer {token}"},
+                        json={
+                            "message": f"Add {file_path}",
+                            "content": content.encode().hex()
+                        }
+                    )
+                if pacer:
+                    pacer.update(response)
+                if response.status_code in (200, 201):
+                    results[file_path] = "added"
+                    break
+                results[file_path] = f"failed: HTTP {response.status_code}"
+                if response.status_code < 500:
+                    break
+            except Exception as e:
+                logger.warning(f"Failed to add {file_path}: {e}")
+                results[file_path] = f"failed: {e}"
+                break
+            if attempt < FILE_ATTEMPTS - 1:
+                await asyncio.sleep(0.25 * 2 ** attempt)
+    return results
+
+async def provision_repository(client: httpx.AsyncClient, token: str, spec: RepositoryCreate,
+                               pacer: RateLimitPacer, attempt: int = 1) -> dict:
+    """Create one repository with its framework files, raising RetryableError for transient failures"""
+    headers = {"Authorization": f"Bearer {token}"}
+    await pacer.wait()
+    try:
+        with span("github.create_repo"):
+            response = await client.post(
+                "https://api.github.com/user/repos",
+                headers=headers,
+                json={"name": spec.name, "description": spec.description, "private": spec.private, "auto_init": True}
             )
-        except Exception as e:
-            logger.warning(f"Failed to add {file_path}: {e}")
+    except httpx.TransportError as e:
+        raise RetryableError(f"GitHub request failed: {e!r}")
+    pause = pacer.update(response)
+    if pause is not None:
+        raise RetryableError("GitHub rate limit reached", delay=min(pause, pacer.max_pause))
+    if response.status_code >= 500:
+        raise RetryableError(f"GitHub returned HTTP {response.status_code}")
+    message = response.json().get("message", "") if response.status_code != 201 else ""
+    if response.status_code == 422 and attempt > 1 and "already exists" in message:
+        # An earlier attempt that timed out or failed upstream may have created it after all
+        response = await get_own_repository(client, headers, spec.name)
+    elif response.status_code != 201:
+        raise ValueError(f"GitHub returned HTTP {response.status_code}: {message}")
+
+    repo = response.json()
+    with span("github.add_framework_files", framework=spec.framework):
+        files = await add_framework_files(client, token, repo["owner"]["login"], repo["name"], spec.framework, pacer)
+    return {
+        "status": "succeeded" if all(v == "added" for v in files.values()) else "partial",
+        "repository": RepositoryResponse(
+            id=repo["id"],
+            name=repo["name"],
+            description=repo.get("description"),
+            html_url=repo["html_url"],
+            private=repo["private"],
+            default_branch=repo.get("default_branch", "main"),
+            stargazers_count=repo["stargazers_count"]
+        ).model_dump(),
+        "files": files,
+    }
 
 def get_framework_files(framework: str) -> dict:
     """Get template files for framework"""
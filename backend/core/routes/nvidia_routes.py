@@ -2,8 +2,10 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import JSONResponse
 from typing import Dict, Any
+import asyncio
 from ..nvidia_integration import NVIDIAIntegration
 from ..config import get_settings
+from ..assets import AssetStore, get_asset_store
 
 router = APIRouter(prefix="/nvidia", tags=["NVIDIA"])
 
@@ -49,14 +51,16 @@ async def start_cloudxr_stream(
     client_ip: str = "127.0.0.1",
     resolution: str = "2160x2160",
     bitrate: int = 100000,
-    nvidia: NVIDIAIntegration = Depends(get_nvidia_integration)
+    nvidia: NVIDIAIntegration = Depends(get_nvidia_integration),
+    assets: AssetStore = Depends(get_asset_store)
 ):
-    """Start CloudXR streaming session (mock implementation)"""
+    """Start CloudXR streaming session (mock implementation) for a content path or digest in the asset store"""
     if not nvidia.cloudxr_license:
         raise HTTPException(status_code=400, detail="CloudXR license key not configured")
     
+    asset = await asyncio.to_thread(assets.resolve, content_path)
     # Mock response
-    session_id = f"cloudxr_session_{hash(content_path)}"
+    session_id = f"cloudxr_session_{asset.sha256[:16] if asset else hash(content_path)}"
     return {
         "success": True,
         "session_id": session_id,
@@ -64,7 +68,8 @@ async def start_cloudxr_stream(
         "status": "streaming",
         "resolution": resolution,
         "bitrate": bitrate,
-        "client_ip": client_ip
+        "client_ip": client_ip,
+        "asset": asset.to_dict() if asset else None
     }
 
 @router.post("/dlss/configure")
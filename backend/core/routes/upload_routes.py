@@ -0,0 +1,113 @@
+from fastapi import APIRouter, Depends, Header, Request, Response
+from typing import Optional
+import asyncio
+import base64
+from ..assets import AssetStore, content_type_for, get_asset_store
+from ..uploads import (
+    TUS_EXTENSIONS, TUS_VERSION, UploadError, UploadStore, get_upload_store, parse_checksum, parse_metadata,
+)
+
+router = APIRouter(prefix="/api/uploads", tags=["uploads"])
+
+OFFSET_CONTENT_TYPE = "application/offset+octet-stream"
+# Headers browser tus clients must be able to read across origins
+EXPOSED_HEADERS = ["Location", "Tus-Resumable", "Tus-Version", "Tus-Extension", "Tus-Max-Size",
+                   "Upload-Offset", "Upload-Length", "Upload-Metadata", "Upload-Concat"]
+
+def _upload_headers(upload, **extra) -> dict:
+    headers = {"Tus-Resumable": TUS_VERSION, "Upload-Offset": str(upload.offset),
+               "Upload-Length": str(upload.length), "Cache-Control": "no-store"}
+    headers.update(extra)
+    return headers
+
+async def _store_if_complete(upload, uploads: UploadStore, assets: AssetStore):
+    """Move a finished upload into the asset store; partial uploads wait for their final upload"""
+    if upload.complete and upload.concat != "partial":
+        # Off the event loop: the index write may wait on another worker's SQLite lock
+        await asyncio.to_thread(assets.ingest, uploads.data_path(upload.id), upload.sha256,
+                                content_type_for(upload.metadata), upload.metadata.get("path"))
+
+def _check_content_type(request: Request):
+    if request.headers.get("content-type", "").split(";")[0].strip() != OFFSET_CONTENT_TYPE:
+        raise UploadError(415, f"Content-Type must be {OFFSET_CONTENT_TYPE}")
+
+@router.options("")
+async def upload_capabilities(store: UploadStore = Depends(get_upload_store)):
+    """tus discovery: supported version, extensions and size limit"""
+    return Response(status_code=204, headers={
+        "Tus-Resumable": TUS_VERSION, "Tus-Version": TUS_VERSION,
+        "Tus-Extension": TUS_EXTENSIONS, "Tus-Max-Size": str(store.max_size),
+        "Tus-Checksum-Algorithm": "sha1,sha256,md5",
+    })
+
+@router.post("", status_code=201)
+async def create_upload(
+    request: Request,
+    upload_length: Optional[int] = Header(default=None),
+    upload_metadata: Optional[str] = Header(default=None),
+    upload_concat: Optional[str] = Header(default=None),
+    upload_checksum: Optional[str] = Header(default=None),
+    store: UploadStore = Depends(get_upload_store),
+    assets: AssetStore = Depends(get_asset_store),
+):
+    """Create an upload; a body sent with the request becomes its first chunk"""
+    metadata = parse_metadata(upload_metadata)
+    if upload_concat and upload_concat.startswith("final;"):
+        prefix = request.url.path.rstrip("/") + "/"
+        part_ids = [url.split(prefix, 1)[-1].rstrip("/") for url in upload_concat[len("final;"):].split()]
+        upload = await store.concatenate(part_ids, metadata)
+    else:
+        if upload_concat not in (None, "partial"):
+            raise UploadError(400, "Upload-Concat must be 'partial' or 'final;<urls>'")
+        if upload_length is None:
+            raise UploadError(400, "Upload-Length header is required")
+        upload = store.create(upload_length, metadata, concat=upload_concat or "")
+        if int(request.headers.get("content-length") or 0) > 0:
+            _check_content_type(request)
+            upload = await store.append(upload, 0, request.stream(), parse_checksum(upload_checksum))
+    await _store_if_complete(upload, store, assets)
+
+    location = f"{request.url.path.rstrip('/')}/{upload.id}"
+    return Response(status_code=201, headers=_upload_headers(upload, Location=location))
+
+@router.head("/{upload_id}")
+async def get_upload_offset(upload_id: str, store: UploadStore = Depends(get_upload_store)):
+    """Current offset, for resuming an interrupted upload"""
+    upload = store.get(upload_id)
+    extra = {"Upload-Concat": upload.concat} if upload.concat == "partial" else {}
+    if upload.metadata:
+        extra["Upload-Metadata"] = ",".join(
+            f"{key} {base64.b64encode(value.encode()).decode()}" for key, value in upload.metadata.items())
+    return Response(status_code=200, headers=_upload_headers(upload, **extra))
+
+@router.patch("/{upload_id}", status_code=204)
+async def append_to_upload(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(...),
+    upload_checksum: Optional[str] = Header(default=None),
+    store: UploadStore = Depends(get_upload_store),
+    assets: AssetStore = Depends(get_asset_store),
+):
+    """Stream the request body to disk at Upload-Offset"""
+    _check_content_type(request)
+    upload = store.get(upload_id)
+    content_length = request.headers.get("content-length")
+    if content_length and upload_offset + int(content_length) > upload.length:
+        raise UploadError(413, f"Request body runs past Upload-Length ({upload.length} bytes)")
+    already_complete = upload.complete
+    upload = await store.append(upload, upload_offset, request.stream(), parse_checksum(upload_checksum))
+    if not already_complete:
+        await _store_if_complete(upload, store, assets)
+    return Response(status_code=204, headers=_upload_headers(upload))
+
+@router.get("/{upload_id}")
+async def get_upload(upload_id: str, store: UploadStore = Depends(get_upload_store)):
+    """Upload progress, and its SHA-256 (the asset's id) once complete"""
+    return store.get(upload_id).to_dict()
+
+@router.delete("/{upload_id}", status_code=204)
+async def delete_upload(upload_id: str, store: UploadStore = Depends(get_upload_store)):
+    """Abort an upload and free its disk space"""
+    store.delete(upload_id)
+    return Response(status_code=204, headers={"Tus-Resumable": TUS_VERSION})
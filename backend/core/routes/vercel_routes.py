@@ -1,37 +1,49 @@
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
-import os
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+from typing import List, Optional, Dict, Any, Union
+import asyncio
 import httpx
 import logging
+import time
+from ..bulk import RateLimitPacer, RetryableError, run_bulk
+from ..tenants import Tenant, get_tenant
+from ..tracing import span
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/vercel", tags=["vercel"])
 
+SETTLED_STATES = {"READY", "ERROR", "CANCELED"}
+
 class ProjectCreate(BaseModel):
     name: str
     framework: str = "nextjs"
     gitRepo: Optional[str] = None
     environmentVars: List[Dict[str, str]] = []
 
+class BulkDeploy(BaseModel):
+    projectIds: List[str] = Field(min_length=1, max_length=100)
+    concurrency: int = Field(8, ge=1, le=32)  # deployments being created at once
+    timeout: float = Field(300.0, gt=0, le=1800)  # seconds to wait for every deployment to settle
+    pollInterval: float = Field(2.0, ge=0.1, le=30)
+
 class ProjectResponse(BaseModel):
     id: str
     name: str
     framework: Optional[str]
     url: Optional[str]
     status: Optional[str]
-    updatedAt: Optional[str]
+    updatedAt: Optional[Union[int, str]]  # Vercel returns epoch milliseconds
 
 @router.get("/status")
-async def get_vercel_status():
+async def get_vercel_status(tenant: Tenant = Depends(get_tenant)):
     """Check Vercel connection status"""
-    vercel_token = os.getenv("VERCEL_TOKEN")
+    vercel_token = tenant.token("vercel")
     if not vercel_token:
         return {"connected": False, "error": "Vercel token not configured"}
     
     try:
-        async with httpx.AsyncClient() as client:
+        async with tenant.client() as client:
             response = await client.get(
                 "https://api.vercel.com/v2/user",
                 headers={"Authorization": f"Bearer {vercel_token}"}
@@ -54,14 +66,14 @@ async def get_vercel_status():
         return {"connected": False, "error": str(e)}
 
 @router.get("/projects")
-async def get_projects():
+async def get_projects(tenant: Tenant = Depends(get_tenant)):
     """Get user projects"""
-    vercel_token = os.getenv("VERCEL_TOKEN")
+    vercel_token = tenant.token("vercel")
     if not vercel_token:
         raise HTTPException(status_code=401, detail="Vercel token not configured")
     
     try:
-        async with httpx.AsyncClient() as client:
+        async with tenant.client() as client:
             response = await client.get(
                 "https://api.vercel.com/v9/projects",
                 headers={"Authorization": f"Bearer {vercel_token}"}
@@ -88,14 +100,14 @@ async def get_projects():
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/projects")
-async def create_project(project_data: ProjectCreate):
+async def create_project(project_data: ProjectCreate, tenant: Tenant = Depends(get_tenant)):
     """Create a new Vercel project"""
-    vercel_token = os.getenv("VERCEL_TOKEN")
+    vercel_token = tenant.token("vercel")
     if not vercel_token:
         raise HTTPException(status_code=401, detail="Vercel token not configured")
     
     try:
-        async with httpx.AsyncClient() as client:
+        async with tenant.client() as client:
             # Create project
             project_payload = {
                 "name": project_data.name,
@@ -119,9 +131,10 @@ async def create_project(project_data: ProjectCreate):
                 
                 # Set environment variables if provided
                 if project_data.environmentVars:
-                    await set_environment_variables(
-                        client, vercel_token, project["id"], project_data.environmentVars
-                    )
+                    with span("vercel.set_environment_variables", count=len(project_data.environmentVars)):
+                        await set_environment_variables(
+                            client, vercel_token, project["id"], project_data.environmentVars
+                        )
                 
                 return {
                     "project": ProjectResponse(
@@ -140,14 +153,14 @@ async def create_project(project_data: ProjectCreate):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/projects/{project_id}/deploy")
-async def deploy_project(project_id: str):
+async def deploy_project(project_id: str, tenant: Tenant = Depends(get_tenant)):
     """Deploy a project"""
-    vercel_token = os.getenv("VERCEL_TOKEN")
+    vercel_token = tenant.token("vercel")
     if not vercel_token:
         raise HTTPException(status_code=401, detail="Vercel token not configured")
     
     try:
-        async with httpx.AsyncClient() as client:
+        async with tenant.client() as client:
             response = await client.post(
                 f"https://api.vercel.com/v13/deployments",
                 headers={"Authorization": f"Bearer {vercel_token}"},
@@ -169,6 +182,141 @@ async def deploy_project(project_id: str):
         logger.error(f"Failed to deploy project: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/deployments/bulk")
+async def deploy_projects_bulk(batch: BulkDeploy, tenant: Tenant = Depends(get_tenant)):
+    """Deploy many projects concurrently and wait for them; returns one rolled-up status"""
+    vercel_token = tenant.token("vercel")
+    if not vercel_token:
+        raise HTTPException(status_code=401, detail="Vercel token not configured")
+
+    project_ids = list(dict.fromkeys(batch.projectIds))
+    entries = {project_id: {"projectId": project_id, "state": "PENDING"} for project_id in project_ids}
+    unsettled: Dict[str, dict] = {}  # deployment id -> entry
+    pacer = RateLimitPacer()
+    started = time.perf_counter()
+
+    async with tenant.client() as client:
+        async def dispatch(project_id: str, attempt: int) -> dict:
+            await pacer.wait()
+            with span("vercel.create_deployment", project=project_id):
+                response = await client.post(
+                    "https://api.vercel.com/v13/deployments",
+                    headers={"Authorization": f"Bearer {vercel_token}"},
+                    json={"projectId": project_id}
+                )
+            pause = pacer.update(response)
+            if pause is not None:
+                raise RetryableError("Vercel rate limit reached", delay=min(pause, pacer.max_pause))
+            if response.status_code >= 500:
+                raise RetryableError(f"Vercel returned HTTP {response.status_code}")
+            if response.status_code not in (200, 201):
+                raise ValueError(f"Vercel returned HTTP {response.status_code}: {vercel_error(response)}")
+            return response.json()
+
+        async def dispatch_all():
+            async for event in run_bulk(project_ids, dispatch, concurrency=batch.concurrency):
+                entry = entries[project_ids[event["index"]]]
+                entry["dispatchSeconds"] = round(time.perf_counter() - started, 3)
+                if event["status"] == "failed":
+                    entry.update(state="ERROR", error=event["error"])
+                    continue
+                if not event.get("id"):
+                    entry.update(state="ERROR", error="Vercel response had no deployment id")
+                    continue
+                entry.update(id=event["id"], url=event.get("url"), state=event.get("readyState") or "QUEUED")
+                unsettled[event["id"]] = entry
+
+        dispatcher = asyncio.create_task(dispatch_all())
+        deadline = started + batch.timeout
+        try:
+            with span("vercel.track_deployments", count=len(project_ids)):
+                while not dispatcher.done() or unsettled:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    await asyncio.wait([dispatcher], timeout=min(batch.pollInterval, remaining))
+                    if unsettled:
+                        await poll_deployments(client, vercel_token, unsettled, started, pacer)
+        finally:
+            dispatcher.cancel()
+
+    error = None
+    if dispatcher.done() and not dispatcher.cancelled() and dispatcher.exception() is not None:
+        # Projects it had not dispatched yet would otherwise look like a timeout
+        error = f"Dispatch aborted: {dispatcher.exception()!r}"
+        logger.error(f"Bulk deploy {error}")
+        for entry in entries.values():
+            if entry["state"] == "PENDING":
+                entry.update(state="ERROR", error=error)
+
+    deployments = [entries[project_id] for project_id in project_ids]
+    counts: Dict[str, int] = {}
+    for entry in deployments:
+        counts[entry["state"]] = counts.get(entry["state"], 0) + 1
+    ready = counts.get("READY", 0)
+    pending = sum(n for state, n in counts.items() if state not in SETTLED_STATES)
+    if pending:
+        status = "timeout"
+    elif ready == len(deployments):
+        status = "ready"
+    else:
+        status = "partial" if ready else "failed"
+    ready_times = sorted(e["readySeconds"] for e in deployments if "readySeconds" in e)
+    return {
+        "status": status,
+        "total": len(deployments),
+        "ready": ready,
+        "failed": len(deployments) - ready - pending,
+        "pending": pending,
+        "states": counts,
+        "elapsed": round(time.perf_counter() - started, 3),
+        "slowestReadySeconds": ready_times[-1] if ready_times else None,
+        "error": error,
+        "deployments": deployments,
+    }
+
+async def poll_deployments(client: httpx.AsyncClient, token: str, unsettled: Dict[str, dict],
+                           started: float, pacer: RateLimitPacer):
+    """One aggregated poll of every deployment that has not settled yet"""
+    if pacer.delay() > 0:
+        return  # rate limited: skip this tick rather than spend the remaining budget
+
+    async def poll(deployment_id: str, entry: dict):
+        try:
+            response = await client.get(
+                f"https://api.vercel.com/v13/deployments/{deployment_id}",
+                headers={"Authorization": f"Bearer {token}"}
+            )
+        except httpx.HTTPError as e:
+            logger.warning(f"Failed to poll deployment {deployment_id}: {e}")
+            return
+        pacer.update(response)
+        if response.status_code != 200:
+            return  # transient; the next tick asks again
+        deployment = response.json()
+        entry["state"] = deployment.get("readyState", entry["state"])
+        if entry["state"] not in SETTLED_STATES:
+            return
+        unsettled.pop(deployment_id, None)
+        if entry["state"] == "READY":
+            entry["readySeconds"] = round(time.perf_counter() - started, 3)
+            if deployment.get("ready") and deployment.get("createdAt"):
+                entry["buildSeconds"] = (deployment["ready"] - deployment["createdAt"]) / 1000
+        else:
+            entry["error"] = deployment.get("errorMessage") or f"Deployment {entry['state'].lower()}"
+
+    with span("vercel.poll_deployments", count=len(unsettled)):
+        await asyncio.gather(*(poll(deployment_id, entry) for deployment_id, entry in list(unsettled.items())))
+
+def vercel_error(response: httpx.Response) -> str:
+    """Message of a Vercel error response"""
+    try:
+        body = response.json()
+    except ValueError:
+        return response.text
+    error = body.get("error")
+    return error.get("message", "") if isinstance(error, dict) else body.get("message", "")
+
 async def set_environment_variables(client: httpx.AsyncClient, token: str, project_id: str, env_vars: List[Dict[str, str]]):
     """Set environment variables for a project"""
     for env_var in env_vars:
@@ -0,0 +1,246 @@
+"""
+Production launcher for the OmniAI backend.
+
+Binds the listening socket once, imports the app in the master process and
+then forks uvicorn workers that inherit both, so the loaded application is
+shared copy-on-write. The master supervises the workers:
+
+- SIGTERM / SIGINT: workers stop accepting and drain in-flight requests
+  (bounded by ``graceful_shutdown_timeout``) before the master exits.
+- SIGHUP: rolling restart, one worker at a time. JWT keys are re-read from
+  ``.env`` first so replacements start with them. A replacement is forked
+  and must report ready before the old worker is asked to drain.
+- A worker that dies unexpectedly is respawned.
+"""
+
+import gc
+import logging
+import os
+import select
+import shutil
+import signal
+import socket
+import tempfile
+import time
+from importlib.util import find_spec
+from typing import Dict, Optional, Set
+
+import uvicorn
+
+from .auth import reload_keys
+from .metrics import clear_multiprocess_dir, registry as metrics_registry
+
+logger = logging.getLogger(__name__)
+
+READY_TIMEOUT = 30.0
+
+
+def default_worker_count() -> int:
+    return os.cpu_count() or 1
+
+
+def best_loop() -> str:
+    return "uvloop" if find_spec("uvloop") else "asyncio"
+
+
+def best_http() -> str:
+    return "httptools" if find_spec("httptools") else "h11"
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """Create the listening socket shared by every worker"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class _WorkerServer(uvicorn.Server):
+    """uvicorn server that tells the master once it is accepting connections"""
+
+    def __init__(self, config: uvicorn.Config, ready_fd: int):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets=sockets)
+        if not self.should_exit:
+            os.write(self.ready_fd, b"1")
+        os.close(self.ready_fd)
+
+
+class WorkerSupervisor:
+    def __init__(self, app, host: str = "0.0.0.0", port: int = 5000,
+                 workers: Optional[int] = None, graceful_shutdown_timeout: int = 30,
+                 log_level: str = "info"):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.worker_count = workers or default_worker_count()
+        self.graceful_shutdown_timeout = graceful_shutdown_timeout
+        self.log_level = log_level
+        self.loop = best_loop()
+        self.http = best_http()
+        self.socket: Optional[socket.socket] = None
+        self.workers: Dict[int, int] = {}  # pid -> ready pipe read fd
+        self.retiring: Set[int] = set()
+        self.should_exit = False
+        self.should_reload = False
+
+    def _uvicorn_config(self) -> uvicorn.Config:
+        config = uvicorn.Config(
+            self.app,
+            loop=self.loop,
+            http=self.http,
+            log_level=self.log_level,
+            timeout_graceful_shutdown=self.graceful_shutdown_timeout,
+        )
+        # Load in the master so the imported app and protocol classes are
+        # inherited by every fork instead of being rebuilt per worker.
+        config.load()
+        return config
+
+    def spawn_worker(self) -> int:
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+                signal.signal(sig, signal.SIG_DFL)
+            try:
+                _WorkerServer(self.config, write_fd).run(sockets=[self.socket])
+            finally:
+                os._exit(0)
+        os.close(write_fd)
+        self.workers[pid] = read_fd
+        return pid
+
+    def wait_ready(self, pid: int, timeout: float = READY_TIMEOUT) -> bool:
+        fd = self.workers.get(pid)
+        if fd is None:
+            return False
+        readable, _, _ = select.select([fd], [], [], timeout)
+        return bool(readable) and os.read(fd, 1) == b"1"
+
+    def stop_worker(self, pid: int):
+        """Ask a worker to drain and wait until it has exited"""
+        self.retiring.add(pid)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        deadline = time.monotonic() + self.graceful_shutdown_timeout + 5
+        while time.monotonic() < deadline:
+            try:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if done:
+                break
+            time.sleep(0.05)
+        else:
+            logger.warning(f"Worker {pid} did not drain in time, killing it")
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self._forget(pid)
+
+    def _forget(self, pid: int):
+        fd = self.workers.pop(pid, None)
+        if fd is not None:
+            os.close(fd)
+        self.retiring.discard(pid)
+
+    def rolling_restart(self):
+        logger.info(f"🔄 Rolling restart of {len(self.workers)} workers")
+        try:
+            logger.info(f"   JWT keys: {', '.join(reload_keys()) or 'none'}")
+        except Exception as e:
+            logger.error(f"Failed to reload JWT keys, workers keep the current ones: {e}")
+        for old_pid in list(self.workers):
+            new_pid = self.spawn_worker()
+            if not self.wait_ready(new_pid):
+                logger.error(f"Replacement worker {new_pid} failed to start, keeping {old_pid}")
+                self.stop_worker(new_pid)
+                continue
+            self.stop_worker(old_pid)
+            logger.info(f"   Replaced worker {old_pid} with {new_pid}")
+
+    def reap_workers(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid in self.workers and pid not in self.retiring:
+                logger.warning(f"Worker {pid} exited unexpectedly (status {status}), respawning")
+                self._forget(pid)
+                if not self.should_exit:
+                    self.spawn_worker()
+
+    def handle_exit(self, sig, frame):
+        self.should_exit = True
+
+    def handle_reload(self, sig, frame):
+        self.should_reload = True
+
+    def run(self):
+        self.socket = bind_socket(self.host, self.port)
+        owned_metrics_dir = None
+        if self.worker_count > 1 and not metrics_registry.multiprocess_dir:
+            owned_metrics_dir = tempfile.mkdtemp(prefix="omniai-metrics-")
+            metrics_registry.multiprocess_dir = owned_metrics_dir
+        if metrics_registry.multiprocess_dir:
+            clear_multiprocess_dir(metrics_registry.multiprocess_dir)
+        self.config = self._uvicorn_config()
+        logger.info(f"🚀 Starting {self.worker_count} workers on {self.host}:{self.port} "
+                    f"(loop={self.loop}, http={self.http})")
+
+        # Move everything allocated so far out of the collector's reach so that
+        # GC passes in the workers don't dirty the shared pages.
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, self.handle_exit)
+        signal.signal(signal.SIGINT, self.handle_exit)
+        signal.signal(signal.SIGHUP, self.handle_reload)
+
+        for _ in range(self.worker_count):
+            self.spawn_worker()
+
+        try:
+            while not self.should_exit:
+                if self.should_reload:
+                    self.should_reload = False
+                    self.rolling_restart()
+                self.reap_workers()
+                time.sleep(0.2)
+        finally:
+            logger.info("🛑 Draining workers")
+            for pid in list(self.workers):
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+            for pid in list(self.workers):
+                self.stop_worker(pid)
+            self.socket.close()
+            if owned_metrics_dir:
+                shutil.rmtree(owned_metrics_dir, ignore_errors=True)
+
+
+def serve(app, host: str, port: int, workers: Optional[int] = None,
+          graceful_shutdown_timeout: int = 30, log_level: str = "info"):
+    """Run ``app`` under the pre-forking supervisor"""
+    WorkerSupervisor(
+        app,
+        host=host,
+        port=port,
+        workers=workers,
+        graceful_shutdown_timeout=graceful_shutdown_timeout,
+        log_level=log_level,
+    ).run()
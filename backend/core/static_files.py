@@ -0,0 +1,325 @@
+"""
+Production serving of the built frontend (``frontend/dist``).
+
+Serves the Vite build straight from the backend so no separate static server
+is needed:
+
+- ``.zst``/``.br``/``.gz`` siblings written at build time (see ``precompress``)
+  are negotiated from Accept-Encoding instead of compressing per request
+- content-hashed assets (``assets/index-B3x9Kq2a.js``) are cached for a year
+  as immutable; everything else is revalidated on every use
+- every representation has a strong ETag derived from its bytes, so
+  If-None-Match answers 304 without touching the file
+- ``index.html`` and its variants are kept in memory and reloaded when the
+  file on disk changes
+- other files go out through the server's zero-copy extension when it offers
+  one, otherwise in large chunks read off the event loop
+- unknown extension-less paths fall back to ``index.html`` for client-side
+  routing
+
+Build the variants after ``vite build`` with:
+
+    python -m backend.core.static_files frontend/dist
+"""
+
+import asyncio
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+from dataclasses import dataclass, field
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.types import Receive, Scope, Send
+
+from .compression import brotli, is_compressible, negotiate_encoding, zstandard
+
+logger = logging.getLogger(__name__)
+
+# Encodings in server preference order and the suffix of their precompressed file
+VARIANT_SUFFIXES = {"zstd": ".zst", "br": ".br", "gzip": ".gz"}
+PRECOMPRESS_EXTENSIONS = {".html", ".js", ".mjs", ".css", ".json", ".map", ".svg", ".txt", ".xml",
+                          ".wasm", ".webmanifest", ".ico"}
+# Vite emits content-hashed files only under assets/, with an 8 character
+# hash before the extension: assets/index-B3x9Kq2a.js. Public files such as
+# apple-touch-icon.png keep their names and must stay revalidated.
+HASHED_ASSET = re.compile(r"^assets/(?:.+/)?[^/]+-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+CHUNK_SIZE = 256 * 1024
+
+
+@dataclass
+class _Representation:
+    path: str
+    size: int
+    etag: str
+    encoding: Optional[str] = None
+    body: Optional[bytes] = None  # set for hot files
+
+
+@dataclass
+class _Resource:
+    version: Tuple[int, int]  # (mtime_ns, size) of the uncompressed file
+    content_type: str
+    cache_control: str
+    last_modified: str
+    mtime: float
+    representations: Dict[Optional[str], _Representation] = field(default_factory=dict)
+
+    @property
+    def encodings(self) -> List[str]:
+        return [encoding for encoding in VARIANT_SUFFIXES if encoding in self.representations]
+
+
+def _digest(path: str) -> Tuple[str, bytes]:
+    sha = hashlib.sha256()
+    chunks = []
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            sha.update(chunk)
+            chunks.append(chunk)
+    return sha.hexdigest()[:32], b"".join(chunks)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison, as RFC 9110 requires for If-None-Match"""
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == bare for tag in if_none_match.split(","))
+
+
+class StaticFrontend:
+    """ASGI app serving a built frontend directory; mount it last, at ``/``"""
+
+    def __init__(self, directory: str, index: str = "index.html", hot_files: Iterable[str] = ("index.html",),
+                 spa_fallback: bool = True):
+        self.directory = os.path.realpath(directory)
+        self.index = index
+        self.hot_files = set(hot_files)
+        self.spa_fallback = spa_fallback
+        self._resources: Dict[str, _Resource] = {}
+
+    def _load(self, relative: str, stat: os.stat_result) -> _Resource:
+        """Hash every representation of a file (runs in a worker thread)"""
+        path = os.path.join(self.directory, relative)
+        name = posixpath.basename(relative)
+        content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type in ("application/javascript", "image/svg+xml"):
+            content_type += "; charset=utf-8"
+        resource = _Resource(
+            version=(stat.st_mtime_ns, stat.st_size),
+            content_type=content_type,
+            cache_control=IMMUTABLE if HASHED_ASSET.match(relative.replace(os.sep, "/")) else REVALIDATE,
+            last_modified=formatdate(stat.st_mtime, usegmt=True),
+            mtime=stat.st_mtime,
+        )
+        hot = relative in self.hot_files
+
+        digest, body = _digest(path)
+        resource.representations[None] = _Representation(path, stat.st_size, f'"{digest}"',
+                                                          body=body if hot else None)
+        for encoding, suffix in VARIANT_SUFFIXES.items():
+            variant = path + suffix
+            try:
+                variant_stat = os.stat(variant)
+            except OSError:
+                continue
+            if variant_stat.st_mtime_ns < stat.st_mtime_ns:
+                continue  # left over from an older build of the file
+            digest, body = _digest(variant)
+            resource.representations[encoding] = _Representation(
+                variant, variant_stat.st_size, f'"{digest}-{suffix[1:]}"', encoding, body if hot else None)
+        return resource
+
+    def _resolve(self, path: str) -> Optional[Tuple[str, os.stat_result]]:
+        relative = posixpath.normpath(path.lstrip("/"))
+        if relative in ("", "."):
+            relative = self.index
+        if relative.startswith("..") or posixpath.basename(relative).startswith("."):
+            return None
+        full = os.path.join(self.directory, relative)
+        try:
+            stat = os.stat(full)
+            if os.path.isdir(full):
+                relative = posixpath.join(relative, self.index)
+                full = os.path.join(full, self.index)
+                stat = os.stat(full)
+        except OSError:
+            return None
+        if os.path.commonpath([self.directory, os.path.realpath(full)]) != self.directory:
+            return None  # symlink pointing outside the build
+        return relative, stat
+
+    async def get_resource(self, path: str, accept: str = "") -> Optional[_Resource]:
+        found = self._resolve(path)
+        if found is None:
+            last = path.rstrip("/").rsplit("/", 1)[-1]
+            if not (self.spa_fallback and "." not in last and "text/html" in accept):
+                return None
+            found = self._resolve(self.index)
+            if found is None:
+                return None
+        relative, stat = found
+        resource = self._resources.get(relative)
+        if resource is None or resource.version != (stat.st_mtime_ns, stat.st_size):
+            resource = await asyncio.to_thread(self._load, relative, stat)
+            self._resources[relative] = resource
+        return resource
+
+    def _not_modified(self, headers: Headers, resource: _Resource, representation: _Representation) -> bool:
+        if_none_match = headers.get("if-none-match")
+        if if_none_match is not None:
+            return _etag_matches(if_none_match, representation.etag)
+        if_modified_since = headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return int(resource.mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return
+        method = scope["method"]
+        if method not in ("GET", "HEAD"):
+            await _send_empty(send, 405, [(b"allow", b"GET, HEAD")])
+            return
+
+        headers = Headers(scope=scope)
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        resource = await self.get_resource(path, headers.get("accept", ""))
+        if resource is None:
+            await _send_empty(send, 404)
+            return
+
+        encoding = negotiate_encoding(headers.get("accept-encoding", ""), resource.encodings)
+        representation = resource.representations[encoding]
+        response_headers = [
+            (b"etag", representation.etag.encode()),
+            (b"cache-control", resource.cache_control.encode()),
+            (b"last-modified", resource.last_modified.encode()),
+        ]
+        if resource.encodings:
+            response_headers.append((b"vary", b"Accept-Encoding"))
+
+        if self._not_modified(headers, resource, representation):
+            await _send_empty(send, 304, response_headers)
+            return
+
+        response_headers += [
+            (b"content-type", resource.content_type.encode()),
+            (b"content-length", str(representation.size).encode()),
+        ]
+        if encoding:
+            response_headers.append((b"content-encoding", encoding.encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": response_headers})
+
+        if method == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+        elif representation.body is not None:
+            await send({"type": "http.response.body", "body": representation.body})
+        else:
+            # Identity bodies of compressible files stay as body messages so the
+            # compression middleware can still encode them on the fly
+            await _send_file(scope, send, representation,
+                             zero_copy=bool(encoding) or not is_compressible(resource.content_type))
+
+
+async def _send_empty(send: Send, status: int, headers: Optional[List[Tuple[bytes, bytes]]] = None):
+    headers = list(headers or [])
+    if status != 304:
+        headers.append((b"content-length", b"0"))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _send_file(scope: Scope, send: Send, representation: _Representation, zero_copy: bool):
+    extensions = scope.get("extensions") or {}
+    if zero_copy and "http.response.pathsend" in extensions:
+        await send({"type": "http.response.pathsend", "path": representation.path})
+        return
+    with open(representation.path, "rb") as f:
+        if zero_copy and "http.response.zerocopysend" in extensions:
+            await send({"type": "http.response.zerocopysend", "file": f.fileno(), "count": representation.size})
+            return
+        remaining = representation.size
+        while remaining > 0:
+            chunk = await asyncio.to_thread(f.read, min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            await send({"type": "http.response.body", "body": b""})  # file shrank under us
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=19).compress(data)
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def precompress(directory: str, min_size: int = 256, force: bool = False) -> Dict[str, int]:
+    """Write maximum-effort ``.zst``/``.br``/``.gz`` siblings for compressible build output"""
+    encodings = [e for e in VARIANT_SUFFIXES if e == "gzip" or (e == "br" and brotli) or (e == "zstd" and zstandard)]
+    counts = {"files": 0, "written": 0, "skipped": 0, "bytes_in": 0, "bytes_out": 0}
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if os.path.splitext(name)[1].lower() not in PRECOMPRESS_EXTENSIONS:
+                continue
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            if stat.st_size < min_size:
+                continue
+            counts["files"] += 1
+            data = None
+            for encoding in encodings:
+                variant = path + VARIANT_SUFFIXES[encoding]
+                if not force and os.path.exists(variant) and os.stat(variant).st_mtime_ns >= stat.st_mtime_ns:
+                    counts["skipped"] += 1
+                    continue
+                if data is None:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                compressed = _compress(data, encoding)
+                if len(compressed) >= len(data):
+                    if os.path.exists(variant):
+                        os.remove(variant)
+                    continue
+                tmp = f"{variant}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(compressed)
+                os.replace(tmp, variant)
+                counts["written"] += 1
+                counts["bytes_in"] += len(data)
+                counts["bytes_out"] += len(compressed)
+    return counts
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Precompress a frontend build for StaticFrontend")
+    parser.add_argument("directory", nargs="?", default="frontend/dist")
+    parser.add_argument("--min-size", type=int, default=256, help="Leave smaller files uncompressed")
+    parser.add_argument("--force", action="store_true", help="Rebuild variants that look up to date")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    result = precompress(args.directory, args.min_size, args.force)
+    ratio = result["bytes_in"] / result["bytes_out"] if result["bytes_out"] else 0.0
+    logger.info(f"Precompressed {result['files']} files: {result['written']} variants written "
+                f"({ratio:.1f}x), {result['skipped']} up to date")
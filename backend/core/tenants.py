@@ -0,0 +1,296 @@
+"""
+Per-tenant upstream credentials, connection pools and concurrency quotas.
+
+GitHub and Vercel tokens are stored per tenant in a SQLite vault, encrypted
+with Fernet under a key derived from ``ENCRYPTION_KEY``, and kept decrypted
+in memory for ``cache_ttl`` seconds so a request never pays for a database
+read or decryption. A tenant without its own token for a provider falls back
+to the global ``GITHUB_TOKEN``/``VERCEL_TOKEN``.
+
+Every tenant gets its own long-lived httpx client (a separate connection
+pool) and a semaphore that bounds its in-flight upstream requests. One busy
+tenant therefore queues behind its own quota and cannot starve the others.
+Anonymous requests, and tokens without a tenant claim, use the ``default``
+tenant.
+"""
+
+import asyncio
+import base64
+import contextlib
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+import httpx
+from cryptography.fernet import Fernet, InvalidToken
+from fastapi import Depends, HTTPException
+
+from .auth import authenticate
+from .config import get_settings
+from .http_client import create_client
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_KEY = "your-encryption-key-here"
+DEFAULT_TENANT = "default"
+# Provider -> global token used when the tenant has none of its own
+PROVIDERS = {"github": "GITHUB_TOKEN", "vercel": "VERCEL_TOKEN"}
+QUOTA_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+tenant_quota_wait_seconds = registry.histogram(
+    "omniai_tenant_quota_wait_seconds", "Time upstream requests waited for their tenant's concurrency quota",
+    buckets=QUOTA_BUCKETS)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS credentials (
+    tenant TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    token BLOB NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (tenant, provider)
+);
+CREATE TABLE IF NOT EXISTS quotas (
+    tenant TEXT PRIMARY KEY,
+    max_concurrency INTEGER NOT NULL
+);
+"""
+
+
+def derive_fernet_key(secret: str) -> bytes:
+    """Use ``secret`` as a Fernet key when it is one, otherwise derive one from it"""
+    try:
+        if len(base64.urlsafe_b64decode(secret.encode())) == 32:
+            return secret.encode()
+    except (ValueError, TypeError):
+        pass
+    return base64.urlsafe_b64encode(hashlib.sha256(b"omniai-credential-vault:" + secret.encode()).digest())
+
+
+class CredentialVault:
+    def __init__(self, path: str, encryption_key: str, cache_ttl: float = 60.0):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._fernet = Fernet(derive_fernet_key(encryption_key)) \
+            if encryption_key and encryption_key != PLACEHOLDER_KEY else None
+        self.cache_ttl = cache_ttl
+        # (tenant, provider) -> (token or None, loaded at)
+        self._cache: Dict[Tuple[str, str], Tuple[Optional[str], float]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self._fernet is not None
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def get(self, tenant: str, provider: str) -> Optional[str]:
+        """The tenant's own token for ``provider``, or None"""
+        if self._fernet is None:
+            return None
+        key = (tenant, provider)
+        cached = self._cache.get(key)
+        if cached is not None and time.monotonic() - cached[1] < self.cache_ttl:
+            return cached[0]
+        rows = self._query("SELECT token FROM credentials WHERE tenant = ? AND provider = ?", key)
+        token = None
+        if rows:
+            try:
+                token = self._fernet.decrypt(rows[0][0]).decode()
+            except InvalidToken:
+                logger.error(f"Stored {provider} credential of tenant {tenant} cannot be decrypted "
+                             f"with the current ENCRYPTION_KEY")
+        self._cache[key] = (token, time.monotonic())
+        return token
+
+    def set(self, tenant: str, provider: str, token: str):
+        if self._fernet is None:
+            raise HTTPException(status_code=503, detail="ENCRYPTION_KEY is not configured")
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO credentials VALUES (?, ?, ?, ?)",
+                             (tenant, provider, self._fernet.encrypt(token.encode()), time.time()))
+        self._cache[(tenant, provider)] = (token, time.monotonic())
+
+    def delete(self, tenant: str, provider: str) -> bool:
+        with self._lock:
+            deleted = self._db.execute("DELETE FROM credentials WHERE tenant = ? AND provider = ?",
+                                       (tenant, provider)).rowcount
+        self._cache.pop((tenant, provider), None)
+        return bool(deleted)
+
+    def quota(self, tenant: str) -> Optional[int]:
+        rows = self._query("SELECT max_concurrency FROM quotas WHERE tenant = ?", (tenant,))
+        return rows[0][0] if rows else None
+
+    def set_quota(self, tenant: str, max_concurrency: int):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO quotas VALUES (?, ?)", (tenant, max_concurrency))
+
+    def tenants(self) -> Dict[str, Dict]:
+        """Configured providers and quota per tenant; tokens are never returned"""
+        report: Dict[str, Dict] = {}
+        for tenant, provider, updated_at in self._query(
+                "SELECT tenant, provider, updated_at FROM credentials ORDER BY tenant, provider"):
+            report.setdefault(tenant, {"providers": {}, "max_concurrency": None})["providers"][provider] = updated_at
+        for tenant, max_concurrency in self._query("SELECT tenant, max_concurrency FROM quotas"):
+            report.setdefault(tenant, {"providers": {}, "max_concurrency": None})["max_concurrency"] = max_concurrency
+        return report
+
+
+class QuotaTransport(httpx.AsyncBaseTransport):
+    """Admits at most the tenant's quota of requests to the wrapped transport at once"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, pool: "TenantPool"):
+        self.transport = transport
+        self.pool = pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        pool = self.pool
+        start = time.perf_counter()
+        pool.queued += 1
+        try:
+            await pool.semaphore.acquire()
+        finally:
+            pool.queued -= 1
+        pool.in_flight += 1
+        try:
+            waited = time.perf_counter() - start
+            tenant_quota_wait_seconds.observe(value=waited)
+            pool.requests += 1
+            pool.wait_seconds += waited
+            return await self.transport.handle_async_request(request)
+        finally:
+            pool.in_flight -= 1
+            pool.semaphore.release()
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class TenantPool:
+    """One tenant's upstream client and concurrency quota"""
+
+    def __init__(self, tenant: str, max_concurrency: int, max_connections: int):
+        self.tenant = tenant
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.requests = 0
+        self.in_flight = 0
+        self.queued = 0
+        self.wait_seconds = 0.0
+        self.checked_at = time.monotonic()  # when max_concurrency was last compared with the vault
+        self.client = create_client(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            wrap=lambda transport: QuotaTransport(transport, self),
+            timeout=httpx.Timeout(30.0),
+        )
+
+    def stats(self) -> Dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "requests": self.requests,
+            "avg_wait_ms": self.wait_seconds / self.requests * 1000 if self.requests else 0.0,
+        }
+
+
+class TenantPools:
+    def __init__(self, vault: CredentialVault, max_concurrency: int, max_connections: int):
+        self.vault = vault
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self._pools: Dict[str, TenantPool] = {}
+        self._closing: Set[asyncio.Task] = set()  # the loop only holds tasks weakly
+
+    def _concurrency(self, tenant: str) -> int:
+        return self.vault.quota(tenant) or self.max_concurrency
+
+    def get(self, tenant: str) -> TenantPool:
+        pool = self._pools.get(tenant)
+        if pool is not None and time.monotonic() - pool.checked_at >= self.vault.cache_ttl:
+            # Quotas may be changed through another worker; pick them up like cached tokens
+            pool.checked_at = time.monotonic()
+            concurrency = self._concurrency(tenant)
+            if concurrency != pool.max_concurrency:
+                logger.info(f"Quota of tenant {tenant} changed to {concurrency}, rebuilding its pool")
+                self.reset(tenant)
+                pool = None
+        if pool is None:
+            concurrency = self._concurrency(tenant)
+            pool = self._pools[tenant] = TenantPool(tenant, concurrency, max(self.max_connections, concurrency))
+        return pool
+
+    def reset(self, tenant: str):
+        """Rebuild the tenant's pool on next use, e.g. after its quota changed"""
+        pool = self._pools.pop(tenant, None)
+        if pool is not None:
+            task = asyncio.get_running_loop().create_task(self._close_when_idle(pool))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+    async def _close_when_idle(self, pool: TenantPool):
+        try:
+            while pool.in_flight:
+                await asyncio.sleep(1)
+        finally:
+            await pool.client.aclose()
+
+    async def aclose(self):
+        # Shutting down: retired pools close now instead of waiting until idle
+        for task in list(self._closing):
+            task.cancel()
+        await asyncio.gather(*self._closing, return_exceptions=True)
+        for pool in self._pools.values():
+            await pool.client.aclose()
+        self._pools.clear()
+
+    def stats(self) -> Dict[str, Dict]:
+        return {tenant: pool.stats() for tenant, pool in self._pools.items()}
+
+
+@dataclass
+class Tenant:
+    id: str
+    vault: CredentialVault
+    pool: TenantPool
+
+    def token(self, provider: str) -> Optional[str]:
+        return self.vault.get(self.id, provider) or os.getenv(PROVIDERS[provider])
+
+    @contextlib.asynccontextmanager
+    async def client(self) -> AsyncIterator[httpx.AsyncClient]:
+        """The tenant's shared client; stays open after the block"""
+        yield self.pool.client
+
+
+@lru_cache(maxsize=None)
+def get_vault() -> CredentialVault:
+    settings = get_settings()
+    vault = CredentialVault(settings.credential_vault_path, settings.encryption_key)
+    if not vault.enabled:
+        logger.warning("ENCRYPTION_KEY not configured: per-tenant credentials disabled, using global tokens")
+    return vault
+
+
+@lru_cache(maxsize=None)
+def get_tenant_pools() -> TenantPools:
+    settings = get_settings()
+    return TenantPools(get_vault(), settings.tenant_max_concurrency, settings.tenant_max_connections)
+
+
+async def get_tenant(claims: Optional[Dict] = Depends(authenticate)) -> Tenant:
+    """Tenant of the request, from the verified JWT's tenant claim"""
+    tenant = str((claims or {}).get(get_settings().tenant_claim) or DEFAULT_TENANT)
+    return Tenant(tenant, get_vault(), get_tenant_pools().get(tenant))
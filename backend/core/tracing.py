@@ -0,0 +1,258 @@
+"""
+Lightweight request tracing for the OmniAI backend.
+
+``TracingMiddleware`` opens a root span per request, continuing the W3C
+``traceparent`` sent by the Rust middleware when present and echoing the
+backend's own ``traceparent`` back. Code inside the request opens child
+spans with ``span("name")``; upstream httpx calls get one automatically
+(see ``backend.core.http_client``).
+
+Span timings of every request are summarised in a ``Server-Timing``
+header. Sampled traces are additionally handed to an exporter, which
+writes OTLP/JSON lines to a file and/or posts them to an OTLP/HTTP
+collector from a background thread so the event loop never blocks on it.
+"""
+
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .compression import route_label
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "omni-ai-backend"
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_NON_TOKEN = re.compile(r"[^A-Za-z0-9!#$%&'*+.^_`|~-]")
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+@dataclass
+class Span:
+    name: str
+    trace: "Trace"
+    span_id: str = field(default_factory=lambda: _new_id(8))
+    parent_id: Optional[str] = None
+    kind: int = 1  # OTLP SPAN_KIND_INTERNAL
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def end(self):
+        self.end_ns = time.time_ns()
+        self.trace.spans.append(self)
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+@dataclass
+class Trace:
+    trace_id: str
+    sampled: bool
+    spans: List[Span] = field(default_factory=list)
+
+
+def _otlp_attribute(key: str, value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("omniai_current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, kind: int = 1, **attributes):
+    """Time a block as a child of the current span; a no-op outside a traced request"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name=name, trace=parent.trace, parent_id=parent.span_id, kind=kind, attributes=attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = repr(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+
+def parse_traceparent(value: Optional[str]):
+    """Return (trace_id, parent_span_id, sampled) from a W3C traceparent header"""
+    if not value:
+        return None
+    match = _TRACEPARENT.match(value.strip().lower())
+    if not match or match.group(1) == "0" * 32:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+
+def format_traceparent(span: Span) -> str:
+    return f"00-{span.trace.trace_id}-{span.span_id}-{'01' if span.trace.sampled else '00'}"
+
+
+def server_timing(trace: Trace, root: Span) -> str:
+    """Summarise finished spans by name, plus the root span's elapsed time"""
+    totals: Dict[str, float] = {}
+    counts: Dict[str, int] = {}
+    for finished in trace.spans:
+        totals[finished.name] = totals.get(finished.name, 0.0) + finished.duration_ms
+        counts[finished.name] = counts.get(finished.name, 0) + 1
+
+    entries = [f"total;dur={root.duration_ms:.2f}"]
+    for name, duration in totals.items():
+        token = _NON_TOKEN.sub("_", name)
+        desc = f"{name} x{counts[name]}" if counts[name] > 1 else name
+        entries.append(f'{token};desc="{desc}";dur={duration:.2f}')
+    return ", ".join(entries)
+
+
+class SpanExporter:
+    """Ships sampled traces as OTLP/JSON from a background thread"""
+
+    def __init__(self, file_path: str = "", otlp_endpoint: str = "", max_queue: int = 10000):
+        self.file_path = file_path
+        self.otlp_endpoint = otlp_endpoint.rstrip("/")
+        self.queue: "queue.Queue[Trace]" = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.file_path or self.otlp_endpoint)
+
+    def export(self, trace: Trace):
+        if not self.enabled:
+            return
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="omniai-span-exporter", daemon=True)
+            self._thread.start()
+        try:
+            self.queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _payload(self, traces: List[Trace]) -> dict:
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    _otlp_attribute("service.name", SERVICE_NAME),
+                    _otlp_attribute("process.pid", os.getpid()),
+                ]},
+                "scopeSpans": [{
+                    "scope": {"name": "backend.core.tracing"},
+                    "spans": [s.to_otlp() for t in traces for s in t.spans],
+                }],
+            }]
+        }
+
+    def _run(self):
+        import httpx
+
+        client = httpx.Client(timeout=5.0) if self.otlp_endpoint else None
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < 512:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            payload = self._payload(batch)
+            try:
+                if self.file_path:
+                    with open(self.file_path, "a") as f:
+                        f.write(json.dumps(payload) + "\n")
+                if client is not None:
+                    client.post(f"{self.otlp_endpoint}/v1/traces", json=payload)
+            except Exception as e:
+                logger.warning(f"Failed to export {len(batch)} traces: {e}")
+
+
+class TracingMiddleware:
+    def __init__(self, app: ASGIApp, sample_rate: float = 0.0, exporter: Optional[SpanExporter] = None):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.exporter = exporter or SpanExporter()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = parse_traceparent(Headers(scope=scope).get("traceparent"))
+        if incoming:
+            trace_id, parent_id, sampled = incoming
+        else:
+            trace_id, parent_id = _new_id(16), None
+            sampled = random.random() < self.sample_rate
+
+        trace = Trace(trace_id=trace_id, sampled=sampled)
+        root = Span(name=f"{scope['method']} {scope['path']}", trace=trace, parent_id=parent_id, kind=2)
+        token = _current_span.set(root)
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                root.name = f"{scope['method']} {route_label(scope)}"
+                root.attributes["http.status_code"] = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers["traceparent"] = format_traceparent(root)
+                headers.append("Server-Timing", server_timing(trace, root))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            root.error = repr(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            root.attributes.setdefault("http.method", scope["method"])
+            root.attributes.setdefault("http.target", scope["path"])
+            root.end()
+            if trace.sampled:
+                self.exporter.export(trace)
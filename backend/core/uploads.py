@@ -0,0 +1,297 @@
+"""
+Streaming, resumable uploads following the core of the tus 1.0 protocol.
+
+An upload is created with its total length, then filled by PATCH requests
+that each continue at the current offset. Request bodies are written to
+disk as they arrive through a bounded buffer, and a running SHA-256 is
+updated on the same bytes, so memory per request stays flat regardless of
+file size. A client that loses its connection asks for the offset (HEAD)
+and continues from there; bytes already flushed are kept.
+
+Large files can be sent as several ``partial`` uploads in parallel and
+joined with a ``final`` upload (the tus concatenation extension). Uploads
+never grow past their declared length or ``max_file_size``.
+"""
+
+import asyncio
+import base64
+import binascii
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import secrets
+import time
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from starlette.requests import ClientDisconnect
+
+from .config import get_settings
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+TUS_VERSION = "1.0.0"
+TUS_EXTENSIONS = "creation,creation-with-upload,termination,checksum,concatenation"
+CHECKSUM_ALGORITHMS = ("sha1", "sha256", "md5")
+WRITE_BUFFER = 1024 * 1024
+COPY_CHUNK = 4 * 1024 * 1024
+UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+
+upload_bytes_total = registry.counter("omniai_upload_bytes_total", "Bytes written to disk by the upload API")
+uploads_completed_total = registry.counter("omniai_uploads_completed_total", "Uploads received in full")
+
+
+class UploadError(HTTPException):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(status_code=status_code, detail=detail, headers={"Tus-Resumable": TUS_VERSION})
+
+
+@dataclass
+class Upload:
+    id: str
+    length: int
+    metadata: Dict[str, str] = field(default_factory=dict)
+    created_at: float = 0.0
+    concat: str = ""  # "", "partial" or "final"
+    parts: List[str] = field(default_factory=list)
+    sha256: Optional[str] = None
+    offset: int = 0  # not stored: the data file's size is the source of truth
+
+    @property
+    def complete(self) -> bool:
+        return self.offset == self.length
+
+    def to_dict(self) -> Dict:
+        return {**asdict(self), "complete": self.complete}
+
+
+def parse_metadata(header: Optional[str]) -> Dict[str, str]:
+    """Decode ``Upload-Metadata: filename d29ybGQuZ2xi,type bW9kZWwvZ2x0Zg==``"""
+    metadata = {}
+    for pair in (header or "").split(","):
+        key, _, value = pair.strip().partition(" ")
+        if not key:
+            continue
+        try:
+            metadata[key] = base64.b64decode(value, validate=True).decode("utf-8", "replace") if value else ""
+        except binascii.Error:
+            raise UploadError(400, f"Upload-Metadata value for {key!r} is not base64")
+    return metadata
+
+
+def parse_checksum(header: Optional[str]) -> Optional[Tuple[str, bytes]]:
+    """Decode ``Upload-Checksum: sha256 <base64 digest>``"""
+    if not header:
+        return None
+    algorithm, _, digest = header.strip().partition(" ")
+    if algorithm not in CHECKSUM_ALGORITHMS:
+        raise UploadError(400, f"Unsupported checksum algorithm {algorithm!r}")
+    try:
+        return algorithm, base64.b64decode(digest, validate=True)
+    except binascii.Error:
+        raise UploadError(400, "Upload-Checksum digest is not base64")
+
+
+def _write(f, data: bytes, *hashers):
+    f.write(data)
+    for hasher in hashers:
+        hasher.update(data)
+
+
+def _rehash(path: str, length: int):
+    """SHA-256 of the first ``length`` bytes, for uploads resumed on another worker"""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while length > 0:
+            chunk = f.read(min(COPY_CHUNK, length))
+            if not chunk:
+                break
+            hasher.update(chunk)
+            length -= len(chunk)
+    return hasher
+
+
+class UploadStore:
+    def __init__(self, directory: str, max_size: int):
+        self.directory = os.path.join(directory, "incoming")
+        self.max_size = max_size
+        os.makedirs(self.directory, exist_ok=True)
+        # Running digests of in-progress uploads this worker wrote last, keyed by id -> (offset, hasher)
+        self._hashers: Dict[str, Tuple[int, "hashlib._Hash"]] = {}
+
+    def data_path(self, upload_id: str) -> str:
+        return os.path.join(self.directory, f"{upload_id}.bin")
+
+    def _state_path(self, upload_id: str) -> str:
+        return os.path.join(self.directory, f"{upload_id}.json")
+
+    def _save(self, upload: Upload):
+        state = asdict(upload)
+        del state["offset"]
+        tmp = self._state_path(upload.id) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self._state_path(upload.id))
+
+    def create(self, length: int, metadata: Optional[Dict[str, str]] = None, concat: str = "") -> Upload:
+        if length < 0:
+            raise UploadError(400, "Upload-Length must not be negative")
+        if length > self.max_size:
+            raise UploadError(413, f"Upload-Length exceeds the {self.max_size} byte limit")
+        upload = Upload(id=secrets.token_hex(16), length=length, metadata=metadata or {},
+                        created_at=time.time(), concat=concat)
+        open(self.data_path(upload.id), "wb").close()
+        if length == 0:
+            upload.sha256 = hashlib.sha256().hexdigest()
+        self._save(upload)
+        return upload
+
+    def get(self, upload_id: str) -> Upload:
+        if not UPLOAD_ID.match(upload_id):
+            raise UploadError(404, "Upload not found")
+        try:
+            with open(self._state_path(upload_id)) as f:
+                upload = Upload(**json.load(f))
+        except FileNotFoundError:
+            raise UploadError(404, "Upload not found")
+        try:
+            upload.offset = os.path.getsize(self.data_path(upload_id))
+        except FileNotFoundError:
+            if upload.sha256 is None:
+                raise UploadError(404, "Upload not found")
+            upload.offset = upload.length  # complete, and its data moved into the asset store
+        return upload
+
+    def delete(self, upload_id: str):
+        upload = self.get(upload_id)
+        self._hashers.pop(upload.id, None)
+        for path in (self._state_path(upload.id), self.data_path(upload.id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _hasher(self, upload: Upload):
+        cached = self._hashers.get(upload.id)
+        if cached and cached[0] == upload.offset:
+            return cached[1]
+        return _rehash(self.data_path(upload.id), upload.offset)
+
+    async def append(self, upload: Upload, offset: int, chunks: AsyncIterator[bytes],
+                     checksum: Optional[Tuple[str, bytes]] = None) -> Upload:
+        """Write a request body at ``offset``; on any error but a disconnect the upload is left as it was"""
+        if upload.concat == "final":
+            raise UploadError(403, "Final uploads are assembled from their parts and cannot be patched")
+        if offset != upload.offset:
+            raise UploadError(409, f"Upload-Offset mismatch, upload is at {upload.offset}")
+        if upload.complete:
+            # A retried final PATCH whose response was lost; the data may already be in the asset store
+            async for chunk in chunks:
+                if chunk:
+                    raise UploadError(403, "Upload is already complete")
+            return upload
+
+        f = open(self.data_path(upload.id), "r+b")
+        try:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise UploadError(423, "Upload is being written by another request")
+            # Another request may have written since the caller read the offset
+            f.seek(0, os.SEEK_END)
+            if f.tell() != offset:
+                raise UploadError(409, f"Upload-Offset mismatch, upload is at {f.tell()}")
+
+            hasher = await asyncio.to_thread(self._hasher, upload)
+            base = hasher.copy()
+            request_hasher = hashlib.new(checksum[0]) if checksum else None
+            hashers = (hasher, request_hasher) if request_hasher else (hasher,)
+            allowed = upload.length - offset
+            written = 0
+            buffer = bytearray()
+
+            async def flush():
+                nonlocal written, buffer
+                if buffer:
+                    data = bytes(buffer)
+                    buffer = bytearray()
+                    await asyncio.to_thread(_write, f, data, *hashers)
+                    written += len(data)
+
+            try:
+                async for chunk in chunks:
+                    if written + len(buffer) + len(chunk) > allowed:
+                        raise UploadError(413, f"Request body runs past Upload-Length ({upload.length} bytes)")
+                    buffer += chunk
+                    if len(buffer) >= WRITE_BUFFER:
+                        await flush()
+                await flush()
+                if request_hasher and request_hasher.digest() != checksum[1]:
+                    raise UploadError(460, "Checksum mismatch")
+            except ClientDisconnect:
+                # Keep what reached the disk; the client resumes from the new offset
+                await flush()
+                logger.info(f"Upload {upload.id} interrupted at {offset + written}/{upload.length} bytes")
+            except BaseException:
+                f.truncate(offset)
+                self._hashers[upload.id] = (offset, base)
+                raise
+            f.flush()
+        finally:
+            f.close()
+
+        upload_bytes_total.inc(amount=written)
+        upload.offset = offset + written
+        if upload.complete:
+            self._hashers.pop(upload.id, None)
+            self._finish(upload, hasher.hexdigest())
+        else:
+            self._hashers[upload.id] = (upload.offset, hasher)
+        return upload
+
+    async def concatenate(self, part_ids: List[str], metadata: Optional[Dict[str, str]] = None) -> Upload:
+        """Join completed ``partial`` uploads, in order, into a new ``final`` upload"""
+        parts = [self.get(part_id) for part_id in part_ids]
+        if not parts:
+            raise UploadError(400, "Upload-Concat final needs at least one partial upload")
+        for part in parts:
+            if part.concat != "partial":
+                raise UploadError(400, f"Upload {part.id} is not a partial upload")
+            if not part.complete:
+                raise UploadError(400, f"Partial upload {part.id} is not complete")
+        upload = self.create(sum(part.length for part in parts), metadata, concat="final")
+        upload.parts = [part.id for part in parts]
+
+        def join() -> str:
+            hasher = hashlib.sha256()
+            with open(self.data_path(upload.id), "wb") as out:
+                for part in parts:
+                    with open(self.data_path(part.id), "rb") as f:
+                        while chunk := f.read(COPY_CHUNK):
+                            _write(out, chunk, hasher)
+            return hasher.hexdigest()
+
+        digest = await asyncio.to_thread(join)
+        for part in parts:
+            self.delete(part.id)
+        upload.offset = upload.length
+        self._finish(upload, digest)
+        return upload
+
+    def _finish(self, upload: Upload, sha256: str):
+        upload.sha256 = sha256
+        self._save(upload)
+        uploads_completed_total.inc()
+        logger.info(f"Upload {upload.id} complete: {upload.length} bytes, sha256 {sha256[:12]}")
+
+
+@lru_cache(maxsize=None)
+def get_upload_store() -> UploadStore:
+    settings = get_settings()
+    return UploadStore(settings.upload_directory, settings.max_file_size)
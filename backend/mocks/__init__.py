@@ -0,0 +1,5 @@
+# OmniAI Upstream Mocks
+from .faults import FaultProfile
+from .github import create_github_app
+from .vercel import create_vercel_app
+from .transport import mock_mounts
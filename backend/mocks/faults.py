@@ -0,0 +1,126 @@
+"""
+Fault injection shared by the mock upstreams.
+
+``FaultInjectionMiddleware`` sits in front of a mock app and, per request,
+applies rate limiting (with the upstream's own header names), a random
+error according to ``error_rate`` and a latency drawn from a lognormal
+distribution around ``latency_ms``.
+"""
+
+import asyncio
+import json
+import math
+import random
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+ERROR_STATUSES = (500, 502, 503)
+
+
+@dataclass
+class FaultProfile:
+    latency_ms: float = 50.0     # median latency
+    latency_sigma: float = 0.5   # lognormal shape; 0 gives a fixed latency
+    error_rate: float = 0.0      # fraction of requests answered with a 5xx
+    rate_limit: int = 5000       # requests per window; 0 disables limiting
+    rate_limit_window: int = 3600
+    seed: Optional[int] = None
+
+    @classmethod
+    def from_settings(cls, settings) -> "FaultProfile":
+        return cls(
+            latency_ms=settings.mock_latency_ms,
+            latency_sigma=settings.mock_latency_sigma,
+            error_rate=settings.mock_error_rate,
+            rate_limit=settings.mock_rate_limit,
+        )
+
+    def sample_latency(self, rng: random.Random) -> float:
+        """Seconds to delay a response"""
+        if self.latency_ms <= 0:
+            return 0.0
+        if self.latency_sigma <= 0:
+            return self.latency_ms / 1000
+        return rng.lognormvariate(math.log(self.latency_ms / 1000), self.latency_sigma)
+
+
+class RateLimiter:
+    """Fixed-window request budget, like GitHub's and Vercel's primary limits"""
+
+    def __init__(self, limit: int, window: int):
+        self.limit = limit
+        self.window = window
+        self.reset_at = 0
+        self.used = 0
+
+    def acquire(self) -> bool:
+        now = time.time()
+        if now >= self.reset_at:
+            self.reset_at = int(now) + self.window
+            self.used = 0
+        if self.used >= self.limit:
+            return False
+        self.used += 1
+        return True
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.limit - self.used)
+
+
+class FaultInjectionMiddleware:
+    def __init__(self, app: ASGIApp, profile: FaultProfile, limited_status: int = 429):
+        self.app = app
+        self.profile = profile
+        self.limited_status = limited_status
+        self.rng = random.Random(profile.seed)
+        self.limiter = RateLimiter(profile.rate_limit, profile.rate_limit_window) if profile.rate_limit else None
+
+    def _rate_limit_headers(self) -> dict:
+        return {
+            "X-RateLimit-Limit": str(self.limiter.limit),
+            "X-RateLimit-Remaining": str(self.limiter.remaining),
+            "X-RateLimit-Reset": str(self.limiter.reset_at),
+            "X-RateLimit-Used": str(self.limiter.used),
+        }
+
+    async def _reply(self, send: Send, status: int, body: dict, headers: dict):
+        payload = json.dumps(body).encode()
+        raw = [(k.lower().encode(), v.encode()) for k, v in headers.items()]
+        raw += [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())]
+        await send({"type": "http.response.start", "status": status, "headers": raw})
+        await send({"type": "http.response.body", "body": payload})
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        await asyncio.sleep(self.profile.sample_latency(self.rng))
+
+        headers = {}
+        if self.limiter is not None:
+            allowed = self.limiter.acquire()
+            headers = self._rate_limit_headers()
+            if not allowed:
+                headers["Retry-After"] = str(max(1, self.limiter.reset_at - int(time.time())))
+                await self._reply(send, self.limited_status, {"message": "API rate limit exceeded"}, headers)
+                return
+
+        if self.profile.error_rate and self.rng.random() < self.profile.error_rate:
+            status = self.rng.choice(ERROR_STATUSES)
+            await self._reply(send, status, {"message": "Injected upstream failure"}, headers)
+            return
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start" and headers:
+                response_headers = MutableHeaders(scope=message)
+                for name, value in headers.items():
+                    response_headers[name] = value
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
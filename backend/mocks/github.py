@@ -0,0 +1,119 @@
+"""
+Stand-in for the parts of api.github.com used by ``github_routes``:
+``/user``, ``/user/repos`` (list with Link pagination, create),
+``/repos/{owner}/{repo}`` and the contents API. Any bearer token is
+accepted.
+"""
+
+import itertools
+import time
+from typing import Dict, List, Optional
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from .faults import FaultInjectionMiddleware, FaultProfile
+
+BASE_URL = "https://api.github.com"
+LOGIN = "omniai-mock"
+
+
+def require_token(authorization: Optional[str] = Header(default=None)):
+    if not authorization or not authorization.lower().startswith(("bearer ", "token ")):
+        raise HTTPException(status_code=401, detail="Requires authentication")
+
+
+def _iso(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(timestamp))
+
+
+def _repo(repo_id: int, name: str, description: str = "", private: bool = False) -> dict:
+    now = _iso(time.time())
+    return {
+        "id": repo_id,
+        "name": name,
+        "full_name": f"{LOGIN}/{name}",
+        "owner": {"login": LOGIN, "id": 1},
+        "description": description,
+        "html_url": f"https://github.com/{LOGIN}/{name}",
+        "private": private,
+        "default_branch": "main",
+        "stargazers_count": repo_id % 50,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def _link_header(path: str, page: int, per_page: int, total: int) -> Optional[str]:
+    last = max(1, -(-total // per_page))
+    links = []
+    if page < last:
+        links.append(f'<{BASE_URL}{path}?page={page + 1}&per_page={per_page}>; rel="next"')
+        links.append(f'<{BASE_URL}{path}?page={last}&per_page={per_page}>; rel="last"')
+    if page > 1:
+        links.append(f'<{BASE_URL}{path}?page=1&per_page={per_page}>; rel="first"')
+        links.append(f'<{BASE_URL}{path}?page={page - 1}&per_page={per_page}>; rel="prev"')
+    return ", ".join(links) or None
+
+
+def create_github_app(profile: Optional[FaultProfile] = None, repo_count: int = 120):
+    """Mock GitHub REST API seeded with ``repo_count`` repositories"""
+    app = FastAPI(title="Mock GitHub API", dependencies=[Depends(require_token)])
+    ids = itertools.count(1)
+    repos: List[dict] = [_repo(next(ids), f"mock-repo-{i}") for i in range(repo_count)]
+    files: Dict[str, dict] = {}
+
+    @app.exception_handler(HTTPException)
+    async def github_error(request: Request, exc: HTTPException):
+        return JSONResponse({"message": exc.detail}, status_code=exc.status_code)
+
+    @app.get("/user")
+    async def get_user():
+        return {"login": LOGIN, "id": 1, "name": "OmniAI Mock",
+                "avatar_url": "https://avatars.githubusercontent.com/u/1"}
+
+    @app.get("/user/repos")
+    async def list_repos(page: int = 1, per_page: int = 30, sort: str = "full_name"):
+        per_page = max(1, min(per_page, 100))
+        ordered = sorted(repos, key=lambda r: r["updated_at"], reverse=True) if sort == "updated" else repos
+        start = (page - 1) * per_page
+        headers = {}
+        link = _link_header("/user/repos", page, per_page, len(ordered))
+        if link:
+            headers["Link"] = link
+        return JSONResponse(ordered[start:start + per_page], headers=headers)
+
+    @app.post("/user/repos", status_code=201)
+    async def create_repo(request: Request):
+        payload = await request.json()
+        name = payload.get("name")
+        if not name:
+            raise HTTPException(status_code=422, detail="Validation Failed")
+        if any(r["name"] == name for r in repos):
+            raise HTTPException(status_code=422, detail="name already exists on this account")
+        repo = _repo(next(ids), name, payload.get("description") or "", bool(payload.get("private")))
+        repos.append(repo)
+        return repo
+
+    @app.get("/repos/{owner}/{repo}")
+    async def get_repo(owner: str, repo: str):
+        for candidate in repos:
+            if candidate["owner"]["login"] == owner and candidate["name"] == repo:
+                return candidate
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    @app.put("/repos/{owner}/{repo}/contents/{path:path}", status_code=201)
+    async def put_contents(owner: str, repo: str, path: str, request: Request):
+        payload = await request.json()
+        if not any(r["name"] == repo for r in repos):
+            raise HTTPException(status_code=404, detail="Not Found")
+        key = f"{owner}/{repo}/{path}"
+        files[key] = payload
+        return {
+            "content": {"name": path.rsplit("/", 1)[-1], "path": path,
+                        "html_url": f"https://github.com/{owner}/{repo}/blob/main/{path}"},
+            "commit": {"sha": f"{abs(hash(key)):040x}"[:40], "message": payload.get("message", "")},
+        }
+
+    # GitHub answers an exhausted primary rate limit with 403
+    return FaultInjectionMiddleware(app, profile or FaultProfile(), limited_status=403)
@@ -0,0 +1,36 @@
+"""
+Routes the backend's upstream httpx clients to the in-process mocks when
+``MOCK_UPSTREAMS`` is enabled, so load runs never reach the real APIs.
+"""
+
+from typing import Dict, Optional
+
+import httpx
+
+from ..core.config import get_settings
+from .faults import FaultProfile
+from .github import create_github_app
+from .vercel import create_vercel_app
+
+_apps: Optional[Dict[str, object]] = None
+
+
+def mock_apps() -> Dict[str, object]:
+    """One shared app per upstream, so created repos and projects persist across clients"""
+    global _apps
+    if _apps is None:
+        settings = get_settings()
+        profile = FaultProfile.from_settings(settings)
+        _apps = {
+            "https://api.github.com": create_github_app(profile),
+            "https://api.vercel.com": create_vercel_app(profile),
+        }
+    return _apps
+
+
+def mock_mounts() -> Dict[str, httpx.AsyncBaseTransport]:
+    """httpx ``mounts`` mapping each upstream origin to its mock"""
+    return {
+        origin: httpx.ASGITransport(app=app)
+        for origin, app in mock_apps().items()
+    }
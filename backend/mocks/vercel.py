@@ -0,0 +1,146 @@
+"""
+Stand-in for the parts of api.vercel.com used by ``vercel_routes``:
+``/v2/user``, ``/v9/projects`` (list with cursor pagination),
+``/v10/projects`` (create), project env vars and ``/v13/deployments``
+(create, and get, which moves a deployment from QUEUED through BUILDING to
+READY as its simulated build time passes). Any bearer token is accepted.
+"""
+
+import itertools
+import random
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from .faults import FaultInjectionMiddleware, FaultProfile
+
+BUILD_SECONDS = (1.0, 4.0)  # range of simulated build durations
+QUEUED_FRACTION = 0.25      # share of the build spent QUEUED before BUILDING
+
+
+def require_token(authorization: Optional[str] = Header(default=None)):
+    if not authorization or not authorization.lower().startswith("bearer "):
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+
+def _project(name: str, framework: Optional[str], updated_at: int, deployed: bool = False) -> dict:
+    project = {
+        "id": f"prj_{uuid.uuid4().hex[:24]}",
+        "name": name,
+        "framework": framework,
+        "createdAt": updated_at,
+        "updatedAt": updated_at,
+        "latestDeployments": [],
+    }
+    if deployed:
+        project["alias"] = [{"domain": f"{name}.vercel.app"}]
+        project["latestDeployments"] = [{"id": f"dpl_{uuid.uuid4().hex[:24]}", "readyState": "READY"}]
+    return project
+
+
+def create_vercel_app(profile: Optional[FaultProfile] = None, project_count: int = 40):
+    """Mock Vercel REST API seeded with ``project_count`` projects"""
+    profile = profile or FaultProfile()
+    app = FastAPI(title="Mock Vercel API", dependencies=[Depends(require_token)])
+    rng = random.Random(profile.seed)
+    now_ms = int(time.time() * 1000)
+    ticks = itertools.count()
+    # Newest first, like the real API; updatedAt doubles as the page cursor
+    projects: List[dict] = [
+        _project(f"mock-project-{i}", "nextjs", now_ms - i * 60000, deployed=i % 2 == 0)
+        for i in range(project_count)
+    ]
+    env: Dict[str, List[dict]] = {}
+    deployments: Dict[str, dict] = {}
+    build_ms: Dict[str, int] = {}
+
+    def find_project(id_or_name: str) -> dict:
+        for project in projects:
+            if id_or_name in (project["id"], project["name"]):
+                return project
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    @app.exception_handler(HTTPException)
+    async def vercel_error(request: Request, exc: HTTPException):
+        return JSONResponse({"error": {"code": "mock_error", "message": exc.detail}}, status_code=exc.status_code)
+
+    @app.get("/v2/user")
+    async def get_user():
+        return {"user": {"uid": "mock-user"}, "uid": "mock-user", "name": "OmniAI Mock",
+                "username": "omniai-mock", "email": "mock@omniai.dev"}
+
+    @app.get("/v9/projects")
+    async def list_projects(limit: int = 20, until: Optional[int] = None):
+        limit = max(1, min(limit, 100))
+        candidates = [p for p in projects if until is None or p["updatedAt"] < until]
+        page = candidates[:limit]
+        more = len(candidates) > limit
+        return {
+            "projects": page,
+            "pagination": {
+                "count": len(page),
+                "next": page[-1]["updatedAt"] if more and page else None,
+                "prev": page[0]["updatedAt"] if until is not None and page else None,
+            },
+        }
+
+    @app.post("/v10/projects")
+    async def create_project(request: Request):
+        payload = await request.json()
+        name = payload.get("name")
+        if not name:
+            raise HTTPException(status_code=400, detail="Missing project name")
+        if any(p["name"] == name for p in projects):
+            raise HTTPException(status_code=409, detail="Project already exists")
+        project = _project(name, payload.get("framework"), int(time.time() * 1000) + next(ticks))
+        projects.insert(0, project)
+        return project
+
+    @app.post("/v10/projects/{project_id}/env", status_code=201)
+    async def add_env(project_id: str, request: Request):
+        project = find_project(project_id)
+        payload = await request.json()
+        variable = {"id": uuid.uuid4().hex[:16], "key": payload.get("key"), "type": "encrypted",
+                    "target": payload.get("target", [])}
+        env.setdefault(project["id"], []).append(variable)
+        return {"created": variable}
+
+    @app.post("/v13/deployments")
+    async def create_deployment(request: Request):
+        payload = await request.json()
+        project = find_project(payload.get("projectId") or payload.get("name", ""))
+        deployment_id = f"dpl_{uuid.uuid4().hex[:24]}"
+        deployment = {
+            "id": deployment_id,
+            "url": f"{project['name']}-{deployment_id[4:13]}.vercel.app",
+            "projectId": project["id"],
+            "readyState": "QUEUED",
+            "createdAt": int(time.time() * 1000),
+        }
+        deployments[deployment_id] = deployment
+        build_ms[deployment_id] = int(rng.uniform(*BUILD_SECONDS) * 1000)
+        project["latestDeployments"] = [{"id": deployment_id, "readyState": "QUEUED"}]
+        return deployment
+
+    @app.get("/v13/deployments/{deployment_id}")
+    async def get_deployment(deployment_id: str):
+        deployment = deployments.get(deployment_id)
+        if deployment is None:
+            raise HTTPException(status_code=404, detail="Deployment not found")
+        if deployment["readyState"] != "READY":
+            elapsed_ms = int(time.time() * 1000) - deployment["createdAt"]
+            duration_ms = build_ms[deployment_id]
+            if elapsed_ms >= duration_ms:
+                deployment["readyState"] = "READY"
+                deployment["ready"] = deployment["createdAt"] + duration_ms
+            elif elapsed_ms >= duration_ms * QUEUED_FRACTION:
+                deployment["readyState"] = "BUILDING"
+            for latest in find_project(deployment["projectId"])["latestDeployments"]:
+                if latest["id"] == deployment_id:
+                    latest["readyState"] = deployment["readyState"]
+        return deployment
+
+    return FaultInjectionMiddleware(app, profile, limited_status=429)
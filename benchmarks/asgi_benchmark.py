@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+In-process ASGI Benchmark for OmniAI Backend
+Drives every route of the FastAPI app through httpx's ASGI transport with
+GitHub/Vercel served by the bundled mocks, so no sockets or live services are
+involved. Reports ops/sec and latency percentiles per route, stores baselines
+as JSON and exits non-zero when a route regresses past the tolerance.
+
+    python benchmarks/asgi_benchmark.py --save-baseline
+    python benchmarks/asgi_benchmark.py --baseline benchmarks/asgi_baseline.json --tolerance 0.15
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import platform
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Settings are read at import time, so configure the environment before importing the app
+BENCHMARK_ENV = {
+    "MOCK_UPSTREAMS": "true",
+    "MOCK_ERROR_RATE": "0",
+    "MOCK_RATE_LIMIT": "0",
+    "GITHUB_TOKEN": "benchmark",
+    "VERCEL_TOKEN": "benchmark",
+    "NVIDIA_DEVELOPER_API_KEY": "benchmark",
+    "GEFORCE_NOW_API_KEY": "benchmark",
+    "CLOUDXR_LICENSE_KEY": "benchmark",
+    "ADMIN_TOKEN": "benchmark",
+    "TRACE_SAMPLE_RATE": "0",
+}
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger(__name__)
+# Per-request logging from the app and httpx would dominate the measurement
+logging.getLogger("backend").setLevel(logging.WARNING)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "asgi_baseline.json")
+
+# Routes that are deliberately slow or stateful and would only measure themselves
+EXCLUDED_ROUTES = {
+    "GET /api/admin/profile",
+    "POST /api/admin/auth-keys/reload",  # clears the verified-claims cache
+    # Uploads write to disk and need an upload created first
+    "OPTIONS /api/uploads", "POST /api/uploads", "PATCH /api/uploads/{upload_id}",
+    "GET /api/uploads/{upload_id}", "DELETE /api/uploads/{upload_id}",
+    "GET /api/assets/{sha256}",
+    "PUT /api/admin/tenants/{tenant}/credentials/{provider}",
+    "DELETE /api/admin/tenants/{tenant}/credentials/{provider}",
+    "PUT /api/admin/tenants/{tenant}/quota",
+    # Streams a whole batch; one request is many upstream calls
+    "POST /api/github/repositories/bulk",
+    "POST /api/vercel/deployments/bulk",
+}
+
+
+@dataclass
+class Case:
+    name: str
+    method: str
+    path: str
+    json: Optional[Callable[[], dict]] = None
+    params: Dict[str, str] = field(default_factory=dict)
+    headers: Dict[str, str] = field(default_factory=dict)
+    expected_status: int = 200
+
+
+def build_cases() -> List[Case]:
+    counter = itertools.count()
+    admin = {"X-Admin-Token": BENCHMARK_ENV["ADMIN_TOKEN"]}
+    return [
+        Case("GET /", "GET", "/"),
+        Case("GET /health", "GET", "/health"),
+        Case("GET /api/status", "GET", "/api/status"),
+        Case("GET /metrics", "GET", "/metrics"),
+        Case("GET /api/compression/stats", "GET", "/api/compression/stats"),
+        Case("GET /nvidia/status", "GET", "/nvidia/status"),
+        Case("POST /nvidia/gfn/launch", "POST", "/nvidia/gfn/launch", params={"game_id": "cyberpunk"}),
+        Case("POST /nvidia/cloudxr/stream/start", "POST", "/nvidia/cloudxr/stream/start",
+             params={"content_path": "/content/scene.usd"}),
+        Case("POST /nvidia/dlss/configure", "POST", "/nvidia/dlss/configure"),
+        Case("GET /nvidia/dlss/metrics", "GET", "/nvidia/dlss/metrics"),
+        Case("GET /api/github/status", "GET", "/api/github/status"),
+        Case("GET /api/github/repositories", "GET", "/api/github/repositories"),
+        Case("POST /api/github/repositories", "POST", "/api/github/repositories",
+             json=lambda: {"name": f"bench-repo-{next(counter)}", "framework": "nextjs"}),
+        Case("GET /api/vercel/status", "GET", "/api/vercel/status"),
+        Case("GET /api/vercel/projects", "GET", "/api/vercel/projects"),
+        Case("POST /api/vercel/projects", "POST", "/api/vercel/projects",
+             json=lambda: {"name": f"bench-project-{next(counter)}",
+                           "environmentVars": [{"key": "API_URL", "value": "https://example.com"}]}),
+        Case("POST /api/vercel/projects/{project_id}/deploy", "POST", "/api/vercel/projects/mock-project-0/deploy"),
+        Case("GET /api/assets", "GET", "/api/assets"),
+        Case("GET /api/admin/event-loop", "GET", "/api/admin/event-loop", headers=admin),
+        Case("GET /api/admin/tenants", "GET", "/api/admin/tenants", headers=admin),
+        Case("GET /api/admin/auth-cache", "GET", "/api/admin/auth-cache", headers=admin),
+    ]
+
+
+def route_keys(app) -> List[str]:
+    from fastapi.routing import APIRoute
+
+    return [
+        f"{method} {route.path}"
+        for route in app.routes if isinstance(route, APIRoute)
+        for method in sorted(route.methods - {"HEAD", "OPTIONS"})
+    ]
+
+
+async def run_case(client, case: Case, iterations: int, warmup: int, concurrency: int):
+    from hdr_histogram import HdrHistogram
+
+    histogram = HdrHistogram()
+    failures = 0
+
+    async def call(record: bool):
+        nonlocal failures
+        start = time.perf_counter()
+        response = await client.request(case.method, case.path, params=case.params, headers=case.headers,
+                                        json=case.json() if case.json else None)
+        elapsed = time.perf_counter() - start
+        if response.status_code != case.expected_status:
+            failures += 1
+        elif record:
+            histogram.record(elapsed)
+
+    for _ in range(warmup):
+        await call(False)
+
+    remaining = iterations
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await call(True)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+
+    return {
+        "iterations": iterations,
+        "failures": failures,
+        "ops_per_sec": iterations / elapsed if elapsed else 0.0,
+        **{k: v * 1000 for k, v in histogram.summary().items() if k != "count"},  # milliseconds
+    }
+
+
+async def run(iterations: int, warmup: int, concurrency: int, only: Optional[str] = None) -> Dict[str, dict]:
+    import httpx
+    import main
+
+    cases = [c for c in build_cases() if not only or only in c.name]
+    covered = {c.name for c in build_cases()} | EXCLUDED_ROUTES
+    missing = [key for key in route_keys(main.app) if key not in covered]
+    if missing and not only:
+        logger.warning(f"⚠️ Routes without a benchmark case: {', '.join(missing)}")
+
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            for case in cases:
+                result = await run_case(client, case, iterations, warmup, concurrency)
+                results[case.name] = result
+                status = "✅" if not result["failures"] else f"⚠️ {result['failures']} failed"
+                logger.info(f"{case.name:48s} {result['ops_per_sec']:9.1f} ops/s  "
+                            f"p50 {result['p50']:7.3f}ms  p99 {result['p99']:7.3f}ms  {status}")
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """Routes whose throughput dropped or median latency rose by more than ``tolerance``"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        ops_change = result["ops_per_sec"] / base["ops_per_sec"] - 1 if base["ops_per_sec"] else 0.0
+        p50_change = result["p50"] / base["p50"] - 1 if base["p50"] else 0.0
+        line = f"{name}: {ops_change:+.1%} ops/s, {p50_change:+.1%} p50"
+        if ops_change < -tolerance or p50_change > tolerance:
+            regressions.append(line)
+            logger.error(f"❌ {line}")
+        else:
+            logger.info(f"   {line}")
+    regressions += [f"{name}: requests failed" for name, result in results.items() if result["failures"]]
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="In-process per-route benchmark with baseline gating")
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--mock-latency-ms", type=float, default=0.0,
+                        help="Simulated upstream latency (0 measures backend overhead only)")
+    parser.add_argument("--route", help="Only run cases whose name contains this string")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression")
+    parser.add_argument("--output", default="asgi_benchmark_report.json")
+    args = parser.parse_args()
+
+    os.environ.update(BENCHMARK_ENV)
+    os.environ["MOCK_LATENCY_MS"] = str(args.mock_latency_ms)
+
+    logger.info(f"🧪 ASGI benchmark: {args.iterations} iterations x {args.concurrency} concurrent, "
+                f"mock upstream latency {args.mock_latency_ms:g}ms")
+    results = asyncio.run(run(args.iterations, args.warmup, args.concurrency, args.route))
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "iterations": args.iterations,
+        "concurrency": args.concurrency,
+        "mock_latency_ms": args.mock_latency_ms,
+        "routes": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"📄 Report saved to: {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"📌 Baseline saved to: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        logger.info("No baseline to compare against; run with --save-baseline first")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if (baseline.get("concurrency"), baseline.get("mock_latency_ms")) != (args.concurrency, args.mock_latency_ms):
+        logger.warning("⚠️ Baseline was recorded with different concurrency or mock latency")
+
+    logger.info(f"📊 Comparing against {args.baseline} (tolerance {args.tolerance:.0%})")
+    regressions = compare(results, baseline["routes"], args.tolerance)
+    if regressions:
+        logger.error(f"❌ {len(regressions)} route(s) regressed")
+        sys.exit(1)
+    logger.info("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main_cli()
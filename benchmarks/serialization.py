@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Serialization Microbenchmark for OmniAI Backend
+Compares per-endpoint JSON encoding cost of the stdlib path, orjson and
+pre-encoded payloads
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import main
+from backend.core.nvidia_integration import NVIDIAIntegration
+from backend.core.responses import FastJSONResponse, orjson
+from backend.core.routes.github_routes import RepositoryResponse
+from backend.core.routes.vercel_routes import ProjectResponse
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def repository_listing():
+    return {"repositories": [
+        RepositoryResponse(
+            id=i, name=f"repo-{i}", description="Benchmark repository " * 4,
+            html_url=f"https://github.com/omni/repo-{i}", private=bool(i % 2),
+            default_branch="main", stargazers_count=i * 3
+        )
+        for i in range(50)
+    ]}
+
+
+def project_listing():
+    return {"projects": [
+        ProjectResponse(
+            id=f"prj_{i:08d}", name=f"project-{i}", framework="nextjs",
+            url=f"https://project-{i}.vercel.app", status="ready",
+            updatedAt="2025-07-04T18:15:17Z"
+        )
+        for i in range(50)
+    ]}
+
+
+def nvidia_status():
+    return NVIDIAIntegration().get_status()
+
+
+ENDPOINTS = {
+    "/": (lambda: {"message": "OmniAI Platform - AI-Powered XR and Cloud Gaming"}, main.root_payload),
+    "/health": (lambda: json.loads(main.health_payload.body), main.health_payload),
+    "/api/status": (lambda: json.loads(main.status_payload.body), main.status_payload),
+    "/nvidia/status": (nvidia_status, None),
+    "/api/github/repositories": (repository_listing, None),
+    "/api/vercel/projects": (project_listing, None),
+}
+
+
+def time_per_call(func, number: int) -> float:
+    """Best-of-five time per call in microseconds"""
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def run(number: int) -> dict:
+    results = {}
+    for endpoint, (build, payload) in ENDPOINTS.items():
+        content = build()
+        row = {
+            "stdlib_us": time_per_call(lambda: JSONResponse(jsonable_encoder(content)), number),
+            "fast_us": time_per_call(lambda: FastJSONResponse(jsonable_encoder(content)), number),
+        }
+        if payload is not None:
+            row["pre_encoded_us"] = time_per_call(payload.response, number)
+        results[endpoint] = row
+
+        summary = " | ".join(f"{k[:-3]}: {v:8.2f}µs" for k, v in row.items())
+        logger.info(f"{endpoint:28s} {summary}")
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Per-endpoint serialization microbenchmark")
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--output", default="serialization_report.json")
+    args = parser.parse_args()
+
+    logger.info(f"🧪 Serialization benchmark (orjson {'enabled' if orjson else 'not installed'})")
+    results = run(args.number)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    logger.info(f"📄 Report saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Worker Scaling Benchmark for OmniAI Backend
+Measures throughput of the production launcher from 1 to N workers
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def wait_until_healthy(url: str, timeout: float = 30.0) -> bool:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(url) as response:
+                    if response.status == 200:
+                        return True
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    return False
+
+
+async def measure_throughput(url: str, concurrency: int, duration: float) -> dict:
+    """Keep ``concurrency`` requests in flight for ``duration`` seconds"""
+    completed = 0
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def client_loop(session: aiohttp.ClientSession):
+        nonlocal completed, errors
+        while time.perf_counter() < deadline:
+            try:
+                async with session.get(url) as response:
+                    await response.read()
+                    if response.status < 400:
+                        completed += 1
+                    else:
+                        errors += 1
+            except aiohttp.ClientError:
+                errors += 1
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    start = time.perf_counter()
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*(client_loop(session) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {"requests": completed, "errors": errors, "rps": completed / elapsed}
+
+
+async def benchmark(max_workers: int, port: int, endpoint: str, concurrency: int, duration: float) -> list:
+    results = []
+    url = f"http://127.0.0.1:{port}{endpoint}"
+
+    for workers in range(1, max_workers + 1):
+        process = subprocess.Popen(
+            [sys.executable, "main.py", "--production", "--workers", str(workers),
+             "--host", "127.0.0.1", "--port", str(port)],
+            cwd=REPO_ROOT,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            if not await wait_until_healthy(f"http://127.0.0.1:{port}/health"):
+                logger.error(f"❌ Backend with {workers} workers did not become healthy")
+                break
+            # Warm up every worker before measuring
+            await measure_throughput(url, concurrency, 1.0)
+            result = await measure_throughput(url, concurrency, duration)
+            result["workers"] = workers
+            results.append(result)
+
+            speedup = result["rps"] / results[0]["rps"] if results[0]["rps"] else 0
+            logger.info(f"⚙️  {workers} workers: {result['rps']:.0f} req/s "
+                        f"({speedup:.2f}x, {result['errors']} errors)")
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait(timeout=60)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backend throughput across worker counts")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--endpoint", default="/health")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--output", default="worker_scaling_report.json")
+    args = parser.parse_args()
+
+    logger.info(f"🧪 Worker scaling benchmark: 1..{args.max_workers} workers on {args.endpoint}")
+    results = asyncio.run(benchmark(args.max_workers, args.port, args.endpoint,
+                                    args.concurrency, args.duration))
+
+    with open(args.output, "w") as f:
+        json.dump({"endpoint": args.endpoint, "concurrency": args.concurrency,
+                   "duration": args.duration, "results": results}, f, indent=2)
+    logger.info(f"📄 Report saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+OmniAI Distributed Load Generator
+A coordinator drives N open-loop load workers (local processes or other hosts)
+over a line-delimited JSON protocol on TCP. Workers start on a shared clock,
+stream mergeable histograms back while they run, and the coordinator merges
+them into one report with per-worker skew diagnostics.
+
+    python distributed_load.py coordinator --workers 4 --spawn --rate 4000 --endpoint /health
+    python distributed_load.py worker --coordinator 10.0.0.5:7700
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import statistics
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from stress_test import ResultAggregator, StressTestRunner, format_percentiles
+
+logger = logging.getLogger(__name__)
+
+START_DELAY = 2.0        # seconds between the start message and the synchronized start
+CLOCK_PINGS = 5          # round trips used to estimate each worker's clock offset
+STREAM_INTERVAL = 5.0    # seconds between histogram deltas sent by a worker
+
+
+async def send_message(writer: asyncio.StreamWriter, message: Dict[str, Any]):
+    writer.write(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+    await writer.drain()
+
+
+async def read_message(reader: asyncio.StreamReader) -> Optional[Dict[str, Any]]:
+    line = await reader.readline()
+    return json.loads(line) if line else None
+
+
+# Worker
+
+async def run_worker(coordinator: str, results_log: str = ""):
+    """Connect to the coordinator, wait for a plan, generate load and stream results back"""
+    host, port = coordinator.rsplit(":", 1)
+    reader, writer = await asyncio.open_connection(host, int(port))
+    await send_message(writer, {"type": "hello", "host": socket.gethostname(), "pid": os.getpid()})
+
+    runner = None
+    streamer = None
+    try:
+        while True:
+            message = await read_message(reader)
+            if message is None:
+                logger.warning("⚠️ Coordinator closed the connection")
+                return
+
+            if message["type"] == "ping":
+                await send_message(writer, {"type": "pong", "id": message["id"], "now": time.time()})
+
+            elif message["type"] == "start":
+                plan = message["plan"]
+                worker_id = message["worker"]
+                log_path = results_log.format(worker=worker_id) if results_log else ""
+                runner = StressTestRunner(base_url=plan["base_url"], results_log=log_path,
+                                          window_seconds=plan["window_seconds"])
+
+                # start_at is already translated to this host's clock by the coordinator
+                delay = message["start_at"] - time.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                started_at = time.time()
+                runner.start_time = started_at
+                logger.info(f"🚀 Worker {worker_id} starting ({started_at - message['start_at']:+.4f}s from schedule)")
+
+                streamer = asyncio.create_task(_stream_deltas(runner, writer))
+                rate = plan["rate"] / len(plan["endpoints"])
+                results = await asyncio.gather(*[
+                    runner.open_loop_test(endpoint, rate, plan["duration"], plan["schedule"],
+                                          max_connections=plan["max_connections"])
+                    for endpoint in plan["endpoints"]
+                ])
+                streamer.cancel()
+
+                await _send_delta(runner, writer)
+                await send_message(writer, {
+                    "type": "done",
+                    "started_at": started_at,
+                    "finished_at": time.time(),
+                    "endpoints": [
+                        {key: r[key] for key in ("endpoint", "target_rate", "achieved_rate", "throughput", "max_send_lag")}
+                        for r in results
+                    ],
+                })
+                if runner.result_log:
+                    runner.result_log.close()
+                return
+    finally:
+        if streamer is not None:
+            streamer.cancel()
+        writer.close()
+
+
+async def _send_delta(runner: StressTestRunner, writer: asyncio.StreamWriter):
+    """Ship the aggregates gathered since the last delta and start a fresh set"""
+    delta, runner.aggregates = runner.aggregates, ResultAggregator(runner.aggregates.window_seconds)
+    if delta.overall.total:
+        await send_message(writer, {"type": "delta", "aggregates": delta.to_dict()})
+
+
+async def _stream_deltas(runner: StressTestRunner, writer: asyncio.StreamWriter):
+    while True:
+        await asyncio.sleep(STREAM_INTERVAL)
+        await _send_delta(runner, writer)
+
+
+# Coordinator
+
+@dataclass
+class WorkerConnection:
+    worker_id: int
+    host: str
+    pid: int
+    reader: asyncio.StreamReader
+    writer: asyncio.StreamWriter
+    clock_offset: float = 0.0      # worker clock minus coordinator clock
+    rtt: float = 0.0
+    aggregates: Optional[ResultAggregator] = None
+    done: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    deltas: int = 0
+
+
+@dataclass
+class LoadPlan:
+    base_url: str
+    endpoints: List[str]
+    rate: float
+    duration: float
+    schedule: str = "poisson"
+    max_connections: int = 100
+    window_seconds: int = 10
+
+    def for_worker(self, workers: int) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "endpoints": self.endpoints,
+            "rate": self.rate / workers,
+            "duration": self.duration,
+            "schedule": self.schedule,
+            "max_connections": self.max_connections,
+            "window_seconds": self.window_seconds,
+        }
+
+
+class Coordinator:
+    def __init__(self, plan: LoadPlan, workers: int, listen: str = "0.0.0.0:7700", connect_timeout: float = 30.0):
+        self.plan = plan
+        self.expected_workers = workers
+        self.listen_host, listen_port = listen.rsplit(":", 1)
+        self.listen_port = int(listen_port)
+        self.connect_timeout = connect_timeout
+        self.workers: List[WorkerConnection] = []
+        self.merged = ResultAggregator(plan.window_seconds)
+        self._all_connected = asyncio.Event()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def _on_connect(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        hello = await read_message(reader)
+        if not hello or hello.get("type") != "hello" or self._all_connected.is_set():
+            writer.close()
+            return
+        worker = WorkerConnection(worker_id=len(self.workers), host=hello["host"], pid=hello["pid"],
+                                  reader=reader, writer=writer,
+                                  aggregates=ResultAggregator(self.plan.window_seconds))
+        self.workers.append(worker)
+        logger.info(f"🔌 Worker {worker.worker_id} connected from {worker.host} (pid {worker.pid}) "
+                    f"[{len(self.workers)}/{self.expected_workers}]")
+        if len(self.workers) >= self.expected_workers:
+            self._all_connected.set()
+
+    async def start_server(self):
+        self._server = await asyncio.start_server(self._on_connect, self.listen_host, self.listen_port)
+        self.listen_port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"📡 Coordinator listening on {self.listen_host}:{self.listen_port}, "
+                    f"waiting for {self.expected_workers} workers")
+
+    async def _estimate_clock(self, worker: WorkerConnection):
+        """Offset from the lowest-RTT ping, assuming the reply was stamped halfway through"""
+        best = None
+        for i in range(CLOCK_PINGS):
+            sent = time.time()
+            await send_message(worker.writer, {"type": "ping", "id": i})
+            reply = await read_message(worker.reader)
+            received = time.time()
+            rtt = received - sent
+            if best is None or rtt < best[0]:
+                best = (rtt, reply["now"] - (sent + rtt / 2))
+        worker.rtt, worker.clock_offset = best
+
+    async def _collect(self, worker: WorkerConnection):
+        try:
+            while True:
+                message = await read_message(worker.reader)
+                if message is None:
+                    worker.error = "connection closed before the run finished"
+                    logger.error(f"❌ Worker {worker.worker_id} disconnected")
+                    return
+                if message["type"] == "delta":
+                    delta = ResultAggregator.from_dict(message["aggregates"])
+                    worker.aggregates.merge(delta)
+                    self.merged.merge(delta)
+                    worker.deltas += 1
+                elif message["type"] == "done":
+                    worker.done = message
+                    return
+        except Exception as e:
+            worker.error = str(e)
+            logger.error(f"❌ Worker {worker.worker_id} failed: {e}")
+        finally:
+            worker.writer.close()
+
+    async def _progress(self):
+        while True:
+            await asyncio.sleep(STREAM_INTERVAL)
+            overall = self.merged.overall
+            if overall.total:
+                logger.info(f"📈 {overall.total} requests so far, {overall.failed} failed, "
+                            f"{format_percentiles(overall.histogram)}")
+
+    async def run(self) -> Dict[str, Any]:
+        if self._server is None:
+            await self.start_server()
+        try:
+            await asyncio.wait_for(self._all_connected.wait(), self.connect_timeout)
+        except asyncio.TimeoutError:
+            if not self.workers:
+                raise RuntimeError("No workers connected")
+            logger.warning(f"⚠️ Only {len(self.workers)}/{self.expected_workers} workers connected, starting anyway")
+            self._all_connected.set()
+        self._server.close()
+
+        await asyncio.gather(*[self._estimate_clock(w) for w in self.workers])
+        start_at = time.time() + START_DELAY
+        plan = self.plan.for_worker(len(self.workers))
+        for worker in self.workers:
+            await send_message(worker.writer, {
+                "type": "start",
+                "worker": worker.worker_id,
+                "start_at": start_at + worker.clock_offset,
+                "plan": plan,
+            })
+        logger.info(f"🚀 {len(self.workers)} workers start at {time.strftime('%H:%M:%S', time.localtime(start_at))} "
+                    f"generating {self.plan.rate:g} req/s for {self.plan.duration:g}s")
+
+        progress = asyncio.create_task(self._progress())
+        try:
+            await asyncio.gather(*[self._collect(w) for w in self.workers])
+        finally:
+            progress.cancel()
+        return self.build_report(start_at)
+
+    def build_report(self, start_at: float) -> Dict[str, Any]:
+        runner = StressTestRunner(base_url=self.plan.base_url, results_log="")
+        runner.aggregates = self.merged
+        runner.start_time = start_at
+        report = runner.build_report()
+        report["plan"] = self.plan.__dict__
+        report["workers"] = [self._worker_report(w, start_at) for w in self.workers]
+        report["skew"] = self._skew(report["workers"])
+        return report
+
+    def _worker_report(self, worker: WorkerConnection, start_at: float) -> Dict[str, Any]:
+        stats = worker.aggregates.overall
+        entry = {
+            "worker": worker.worker_id,
+            "host": worker.host,
+            "pid": worker.pid,
+            "clock_offset": worker.clock_offset,
+            "rtt": worker.rtt,
+            "requests": stats.total,
+            "failed": stats.failed,
+            "deltas": worker.deltas,
+            "percentiles": stats.histogram.percentiles(),
+            "error": worker.error,
+        }
+        if worker.done:
+            endpoints = worker.done["endpoints"]
+            entry["start_skew"] = worker.done["started_at"] - worker.clock_offset - start_at
+            entry["elapsed"] = worker.done["finished_at"] - worker.done["started_at"]
+            entry["target_rate"] = sum(e["target_rate"] for e in endpoints)
+            entry["achieved_rate"] = sum(e["achieved_rate"] for e in endpoints)
+            entry["max_send_lag"] = max(e["max_send_lag"] for e in endpoints)
+        return entry
+
+    @staticmethod
+    def _skew(workers: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Spread across workers; an outlier usually means that worker, not the server, was saturated"""
+        finished = [w for w in workers if "start_skew" in w and w["requests"]]
+        if not finished:
+            return {}
+        p99s = [w["percentiles"]["p99"] for w in finished]
+        median_p99 = statistics.median(p99s)
+        warnings = []
+        for w in finished:
+            if w["achieved_rate"] < 0.95 * w["target_rate"] or w["max_send_lag"] > 0.05:
+                warnings.append(f"worker {w['worker']} fell behind its schedule "
+                                f"(max send lag {w['max_send_lag'] * 1000:.0f}ms)")
+            if median_p99 and w["percentiles"]["p99"] > 2 * median_p99:
+                warnings.append(f"worker {w['worker']} p99 is {w['percentiles']['p99'] / median_p99:.1f}x the median")
+        for w in workers:
+            if w["error"]:
+                warnings.append(f"worker {w['worker']} lost: {w['error']}")
+        return {
+            "start_spread": max(w["start_skew"] for w in finished) - min(w["start_skew"] for w in finished),
+            "max_clock_offset": max(abs(w["clock_offset"]) for w in finished),
+            "p99_min": min(p99s),
+            "p99_median": median_p99,
+            "p99_max": max(p99s),
+            "warnings": warnings,
+        }
+
+
+async def spawn_local_workers(count: int, coordinator: str, results_log: str = "") -> List[asyncio.subprocess.Process]:
+    """Start ``count`` worker processes on this host, one core each"""
+    command = [sys.executable, os.path.abspath(__file__), "worker", "--coordinator", coordinator]
+    if results_log:
+        command += ["--results-log", results_log]
+    return [await asyncio.create_subprocess_exec(*command) for _ in range(count)]
+
+
+def log_report(report: Dict[str, Any]):
+    summary = report["summary"]
+    logger.info("📊 DISTRIBUTED LOAD REPORT")
+    logger.info("=" * 50)
+    logger.info(f"Workers: {len(report['workers'])}")
+    logger.info(f"Total Requests: {summary['total_requests']} ({summary['failed_requests']} failed)")
+    logger.info("Latency: " + ", ".join(f"{k}={v * 1000:.1f}ms" for k, v in summary["percentiles"].items()))
+    for w in report["workers"]:
+        logger.info(f"  worker {w['worker']} @ {w['host']}: {w['requests']} requests, "
+                    f"p99={w['percentiles']['p99'] * 1000:.1f}ms, "
+                    f"start skew {w.get('start_skew', 0) * 1000:+.1f}ms, clock offset {w['clock_offset'] * 1000:+.1f}ms")
+    skew = report["skew"]
+    if skew:
+        logger.info(f"Start spread: {skew['start_spread'] * 1000:.1f}ms, "
+                    f"p99 across workers: {skew['p99_min'] * 1000:.1f}-{skew['p99_max'] * 1000:.1f}ms")
+        for warning in skew["warnings"]:
+            logger.warning(f"⚠️ {warning}")
+    logger.info("=" * 50)
+
+
+async def run_coordinator(args):
+    plan = LoadPlan(base_url=args.base_url, endpoints=args.endpoint or ["/health"], rate=args.rate,
+                    duration=args.duration, schedule=args.schedule, max_connections=args.max_connections,
+                    window_seconds=args.window)
+    coordinator = Coordinator(plan, args.workers, listen=args.listen, connect_timeout=args.connect_timeout)
+    await coordinator.start_server()
+
+    processes = []
+    if args.spawn:
+        connect_host = "127.0.0.1" if coordinator.listen_host in ("0.0.0.0", "") else coordinator.listen_host
+        processes = await spawn_local_workers(args.workers, f"{connect_host}:{coordinator.listen_port}",
+                                              args.results_log)
+    try:
+        report = await coordinator.run()
+    finally:
+        for process in processes:
+            if process.returncode is None:
+                try:
+                    await asyncio.wait_for(process.wait(), 10)
+                except asyncio.TimeoutError:
+                    process.kill()
+
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    log_report(report)
+    logger.info(f"📝 Report saved to {args.report}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OmniAI distributed load generator")
+    subparsers = parser.add_subparsers(dest="role", required=True)
+
+    coordinator = subparsers.add_parser("coordinator", help="Plan the run and merge worker results")
+    coordinator.add_argument("--listen", default="0.0.0.0:7700")
+    coordinator.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    coordinator.add_argument("--spawn", action="store_true", help="Start the workers as local processes")
+    coordinator.add_argument("--base-url", default="http://0.0.0.0:8080")
+    coordinator.add_argument("--endpoint", action="append", help="Endpoint to load (repeatable)")
+    coordinator.add_argument("--rate", type=float, default=1000.0, help="Total requests per second across workers")
+    coordinator.add_argument("--duration", type=float, default=30.0)
+    coordinator.add_argument("--schedule", choices=["poisson", "fixed"], default="poisson")
+    coordinator.add_argument("--max-connections", type=int, default=100, help="Connection pool size per worker")
+    coordinator.add_argument("--window", type=int, default=10, help="Seconds per report window")
+    coordinator.add_argument("--connect-timeout", type=float, default=30.0)
+    coordinator.add_argument("--results-log", default="", help="Per-worker log path, may contain {worker}")
+    coordinator.add_argument("--report", default="distributed_load_report.json")
+
+    worker = subparsers.add_parser("worker", help="Generate load for a coordinator")
+    worker.add_argument("--coordinator", required=True, help="host:port of the coordinator")
+    worker.add_argument("--results-log", default="", help="Local log path, may contain {worker}")
+
+    args = parser.parse_args()
+    if args.role == "coordinator":
+        asyncio.run(run_coordinator(args))
+    else:
+        asyncio.run(run_worker(args.coordinator, args.results_log))
+
+
+if __name__ == "__main__":
+    main()
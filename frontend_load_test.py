@@ -1,76 +1,339 @@
-
 #!/usr/bin/env python3
 """
 Frontend Load Testing for OmniAI Platform
 Tests React frontend performance and user interactions
+
+Page loads are simulated at the HTTP level the way a browser performs them:
+the served index.html is parsed, every script, stylesheet, module preload and
+icon it references is fetched (plus module imports and CSS url()s found in
+those), at most six connections per host, with a per-user HTTP cache that
+honors Cache-Control, ETag and Last-Modified so cold and warm loads differ.
 """
 
+import argparse
 import asyncio
 import aiohttp
+import json
+import re
 import time
 import random
 import logging
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import concurrent.futures
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import urljoin, urlparse
+
+from multidict import CIMultiDict
+
+from hdr_histogram import HdrHistogram
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+CONNECTIONS_PER_HOST = 6  # what browsers allow over HTTP/1.1
+
+_JS_IMPORT = re.compile(r"""(?:\bfrom\s*|\bimport\s*\(?\s*)["']([^"']+)["']""")
+_CSS_URL = re.compile(r"""url\(\s*["']?([^"')]+)["']?\s*\)|@import\s+["']([^"']+)["']""")
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+@dataclass
+class Asset:
+    url: str
+    kind: str  # document, script, stylesheet, modulepreload, preload, icon, font, image
+
+
+class AssetParser(HTMLParser):
+    """Collects the subresources a browser would request while loading a document"""
+
+    def __init__(self, base_url: str):
+        super().__init__()
+        self.base_url = base_url
+        self.assets: List[Asset] = []
+
+    def _add(self, href: Optional[str], kind: str):
+        if href and not href.startswith(("data:", "#", "javascript:")):
+            self.assets.append(Asset(urljoin(self.base_url, href), kind))
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "script":
+            self._add(attrs.get("src"), "script")
+        elif tag == "link":
+            rel = (attrs.get("rel") or "").lower().split()
+            if "stylesheet" in rel:
+                self._add(attrs.get("href"), "stylesheet")
+            elif "modulepreload" in rel:
+                self._add(attrs.get("href"), "modulepreload")
+            elif "preload" in rel:
+                self._add(attrs.get("href"), "preload")
+            elif "icon" in rel:
+                self._add(attrs.get("href"), "icon")
+        elif tag == "img":
+            self._add(attrs.get("src"), "image")
+
+
+def discover_subresources(asset: Asset, body: bytes, content_type: str) -> List[Asset]:
+    """Module imports of scripts and url()/@import references of stylesheets"""
+    text = body.decode(errors="ignore")
+    found = []
+    if "javascript" in content_type or asset.kind in ("script", "modulepreload"):
+        for specifier in _JS_IMPORT.findall(text):
+            if specifier.startswith(("/", "./", "../")):  # bare specifiers are resolved by the bundler
+                found.append(Asset(urljoin(asset.url, specifier), "script"))
+    elif "css" in content_type or asset.kind == "stylesheet":
+        for url, imported in _CSS_URL.findall(text):
+            target = imported or url
+            if target and not target.startswith("data:"):
+                kind = "stylesheet" if imported else ("font" if re.search(r"\.(woff2?|ttf|otf)\b", target) else "image")
+                found.append(Asset(urljoin(asset.url, target), kind))
+    return found
+
+
+@dataclass
+class CacheEntry:
+    body: bytes
+    content_type: str
+    stored_at: float
+    max_age: Optional[float]
+    immutable: bool
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+    def is_fresh(self, now: float) -> bool:
+        if self.immutable:
+            return True
+        return self.max_age is not None and now - self.stored_at < self.max_age
+
+
+class BrowserCache:
+    """Private HTTP cache of one simulated browser"""
+
+    def __init__(self):
+        self.entries: Dict[str, CacheEntry] = {}
+
+    def store(self, url: str, headers, body: bytes):
+        cache_control = headers.get("Cache-Control", "").lower()
+        if "no-store" in cache_control:
+            self.entries.pop(url, None)
+            return
+        max_age = None
+        match = _MAX_AGE.search(cache_control)
+        if "no-cache" in cache_control:
+            max_age = 0
+        elif match:
+            max_age = float(match.group(1))
+        elif headers.get("Expires"):
+            try:
+                max_age = max(0.0, parsedate_to_datetime(headers["Expires"]).timestamp() - time.time())
+            except (TypeError, ValueError):
+                max_age = 0
+        elif headers.get("Last-Modified"):
+            # Heuristic freshness, as browsers apply: 10% of the time since last modification
+            try:
+                age = time.time() - parsedate_to_datetime(headers["Last-Modified"]).timestamp()
+                max_age = max(0.0, age * 0.1)
+            except (TypeError, ValueError):
+                max_age = 0
+        self.entries[url] = CacheEntry(body=body, content_type=headers.get("Content-Type", ""),
+                                       stored_at=time.time(), max_age=max_age,
+                                       immutable="immutable" in cache_control,
+                                       etag=headers.get("ETag"), last_modified=headers.get("Last-Modified"))
+
+    def lookup(self, url: str) -> Tuple[Optional[CacheEntry], Dict[str, str]]:
+        """Cached entry and the conditional headers to revalidate it with"""
+        entry = self.entries.get(url)
+        if entry is None:
+            return None, {}
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return entry, headers
+
+
+@dataclass
+class WaterfallEntry:
+    url: str
+    kind: str
+    start: float         # seconds after navigation start
+    duration: float
+    status: int
+    size: int
+    source: str          # network, revalidated (304), cache, skipped, error
+    error: str = ""
+
+    @property
+    def end(self) -> float:
+        return self.start + self.duration
+
+
+@dataclass
+class PageLoad:
+    started_at: float
+    entries: List[WaterfallEntry] = field(default_factory=list)
+
+    @property
+    def load_time(self) -> float:
+        return max((e.end for e in self.entries), default=0.0)
+
+    @property
+    def bytes_transferred(self) -> int:
+        return sum(e.size for e in self.entries if e.source == "network")
+
+    @property
+    def failed(self) -> bool:
+        return any(e.source == "error" or e.status >= 400 for e in self.entries)
+
+
+def _cache_headers(entry: CacheEntry) -> Dict[str, str]:
+    """Validators of a cached entry, for merging with the headers of a 304"""
+    headers = {"Content-Type": entry.content_type}
+    if entry.etag:
+        headers["ETag"] = entry.etag
+    if entry.last_modified:
+        headers["Last-Modified"] = entry.last_modified
+    return headers
+
+
+class SimulatedBrowser:
+    """One user: its own connection pool (6 per host) and HTTP cache"""
+
+    def __init__(self, base_url: str, same_origin_only: bool = True, timeout: float = 30.0):
+        self.base_url = base_url
+        self.origin = urlparse(base_url).netloc
+        self.same_origin_only = same_origin_only
+        self.timeout = timeout
+        self.cache = BrowserCache()
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit_per_host=CONNECTIONS_PER_HOST, limit=0)
+        self.session = aiohttp.ClientSession(connector=connector, auto_decompress=True,
+                                             timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    async def fetch(self, asset: Asset, page: PageLoad) -> Tuple[bytes, str]:
+        start = time.perf_counter() - page.started_at
+        if self.same_origin_only and urlparse(asset.url).netloc != self.origin:
+            page.entries.append(WaterfallEntry(asset.url, asset.kind, start, 0.0, 0, 0, "skipped"))
+            return b"", ""
+
+        entry, conditional = self.cache.lookup(asset.url)
+        if entry is not None and entry.is_fresh(time.time()):
+            page.entries.append(WaterfallEntry(asset.url, asset.kind, start, 0.0, 200, len(entry.body), "cache"))
+            return entry.body, entry.content_type
+
+        try:
+            async with self.session.get(asset.url, headers=conditional) as response:
+                body = await response.read()
+                duration = time.perf_counter() - page.started_at - start
+                if response.status == 304 and entry is not None:
+                    headers = CIMultiDict(_cache_headers(entry))
+                    headers.update(response.headers)
+                    self.cache.store(asset.url, headers, entry.body)
+                    page.entries.append(WaterfallEntry(asset.url, asset.kind, start, duration, 304,
+                                                       len(body), "revalidated"))
+                    return entry.body, entry.content_type
+                if response.status == 200:
+                    self.cache.store(asset.url, response.headers, body)
+                page.entries.append(WaterfallEntry(asset.url, asset.kind, start, duration, response.status,
+                                                   len(body), "network"))
+                return body, response.headers.get("Content-Type", "")
+        except Exception as e:
+            duration = time.perf_counter() - page.started_at - start
+            page.entries.append(WaterfallEntry(asset.url, asset.kind, start, duration, 0, 0, "error", str(e)))
+            return b"", ""
+
+    async def load_page(self, path: str = "/") -> PageLoad:
+        page = PageLoad(started_at=time.perf_counter())
+        document = Asset(urljoin(self.base_url, path), "document")
+        html, _ = await self.fetch(document, page)
+
+        parser = AssetParser(document.url)
+        parser.feed(html.decode(errors="ignore"))
+        seen: Set[str] = {document.url}
+
+        async def load(asset: Asset):
+            body, content_type = await self.fetch(asset, page)
+            children = [a for a in discover_subresources(asset, body, content_type) if a.url not in seen]
+            seen.update(a.url for a in children)
+            await asyncio.gather(*[load(child) for child in children])
+
+        assets = [a for a in parser.assets if a.url not in seen]
+        seen.update(a.url for a in assets)
+        await asyncio.gather(*[load(asset) for asset in assets])
+        return page
+
+
+def print_waterfall(page: PageLoad, label: str, width: int = 40):
+    """ASCII waterfall of one page load"""
+    total = page.load_time or 1e-9
+    logger.info(f"🌊 {label}: {page.load_time * 1000:.1f}ms, {len(page.entries)} requests, "
+                f"{page.bytes_transferred / 1024:.1f} KiB transferred")
+    for e in sorted(page.entries, key=lambda e: e.start):
+        offset = int(e.start / total * width)
+        bar = "·" * offset + ("█" * max(1, int(e.duration / total * width)) if e.duration else "▏")
+        name = urlparse(e.url).path or "/"
+        logger.info(f"   {name[-38:]:38s} {e.kind:13s} {e.source:11s} {e.status:3d} "
+                    f"{e.duration * 1000:7.1f}ms |{bar:{width}s}|")
+
+
 class FrontendLoadTest:
     def __init__(self, base_url: str = "http://0.0.0.0:3000"):
         self.base_url = base_url
         self.results = []
-        
+
     async def test_frontend_endpoints(self):
-        """Test frontend static file serving"""
+        """Load the page once, cold then warm, and show both waterfalls"""
         logger.info("🌐 Testing Frontend Asset Loading")
-        
-        endpoints = [
-            "/",
-            "/assets/index.css",
-            "/assets/index.js",
-            "/favicon.ico"
-        ]
-        
-        async with aiohttp.ClientSession() as session:
-            for endpoint in endpoints:
-                try:
-                    start_time = time.time()
-                    async with session.get(f"{self.base_url}{endpoint}") as response:
-                        content = await response.text()
-                        load_time = time.time() - start_time
-                        
-                        logger.info(f"✅ {endpoint}: {response.status} ({load_time:.3f}s, {len(content)} bytes)")
-                        
-                except Exception as e:
-                    logger.error(f"❌ {endpoint}: {e}")
-    
+
+        async with SimulatedBrowser(self.base_url) as browser:
+            cold = await browser.load_page("/")
+            warm = await browser.load_page("/")
+        print_waterfall(cold, "Cold load")
+        print_waterfall(warm, "Warm load")
+        self.results.append({"cold": cold, "warm": warm})
+        return cold, warm
+
     def simulate_user_interactions(self):
         """Simulate user interactions with Selenium"""
         logger.info("👤 Simulating User Interactions")
-        
+
+        # Selenium and a Chrome binary are only needed for this check
+        try:
+            from selenium import webdriver
+            from selenium.webdriver.chrome.options import Options
+            from selenium.webdriver.common.by import By
+            from selenium.webdriver.support.ui import WebDriverWait
+            from selenium.webdriver.support import expected_conditions as EC
+        except ImportError:
+            logger.warning("⚠️ selenium is not installed, skipping browser simulation")
+            return
+
         # Configure Chrome options for headless mode
         chrome_options = Options()
         chrome_options.add_argument("--headless")
         chrome_options.add_argument("--no-sandbox")
         chrome_options.add_argument("--disable-dev-shm-usage")
-        
+
         try:
             driver = webdriver.Chrome(options=chrome_options)
             driver.get(self.base_url)
-            
+
             # Wait for page to load
             WebDriverWait(driver, 10).until(
                 EC.presence_of_element_located((By.TAG_NAME, "body"))
             )
-            
+
             # Simulate user actions
             logger.info("✅ Frontend loaded successfully")
-            
+
             # Check for React components
             try:
                 # Look for common React elements
@@ -78,16 +341,76 @@ class FrontendLoadTest:
                 logger.info(f"✅ Found {len(elements)} React components")
             except Exception as e:
                 logger.warning(f"⚠️ React components not found: {e}")
-            
+
             driver.quit()
-            
+
         except Exception as e:
             logger.error(f"❌ Browser simulation failed: {e}")
-    
+
+    async def page_load_simulation(self, num_users: int = 100, warm_loads: int = 1, ramp_seconds: float = 5.0,
+                                   same_origin_only: bool = True) -> dict:
+        """Each user loads the page cold, then ``warm_loads`` more times with a primed cache"""
+        logger.info(f"👥 Simulating {num_users} browsers: 1 cold + {warm_loads} warm page loads each")
+
+        cold_times, warm_times = HdrHistogram(), HdrHistogram()
+        per_asset: Dict[str, HdrHistogram] = {}
+        sources: Dict[str, int] = {}
+        failed_loads = 0
+        example: Dict[str, PageLoad] = {}
+
+        def account(page: PageLoad, histogram: HdrHistogram):
+            nonlocal failed_loads
+            histogram.record(page.load_time)
+            failed_loads += page.failed
+            for e in page.entries:
+                sources[e.source] = sources.get(e.source, 0) + 1
+                if e.source in ("network", "revalidated"):
+                    per_asset.setdefault(urlparse(e.url).path or "/", HdrHistogram()).record(e.duration)
+
+        async def simulate_user(user: int):
+            await asyncio.sleep(random.uniform(0, ramp_seconds))
+            async with SimulatedBrowser(self.base_url, same_origin_only) as browser:
+                page = await browser.load_page("/")
+                account(page, cold_times)
+                example.setdefault("cold", page)
+                for _ in range(warm_loads):
+                    await asyncio.sleep(random.uniform(0.5, 2.0))  # think time before navigating back
+                    page = await browser.load_page("/")
+                    account(page, warm_times)
+                    example.setdefault("warm", page)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[simulate_user(i) for i in range(num_users)])
+        elapsed = time.perf_counter() - started
+
+        report = {
+            "users": num_users,
+            "duration": elapsed,
+            "failed_page_loads": failed_loads,
+            "cold_page_load": cold_times.summary(),
+            "warm_page_load": warm_times.summary(),
+            "requests_by_source": sources,
+            "assets": {path: h.summary() for path, h in sorted(per_asset.items())},
+            "example_waterfall": {
+                label: [e.__dict__ for e in sorted(page.entries, key=lambda e: e.start)]
+                for label, page in example.items()
+            },
+        }
+
+        for label, page in example.items():
+            print_waterfall(page, f"Example {label} load")
+        logger.info(f"📊 Cold page load: " + ", ".join(f"{k}={v * 1000:.1f}ms" for k, v in cold_times.percentiles().items()))
+        if warm_loads:
+            logger.info(f"📊 Warm page load: " + ", ".join(f"{k}={v * 1000:.1f}ms" for k, v in warm_times.percentiles().items()))
+        logger.info(f"📊 Requests by source: {sources}")
+        if failed_loads:
+            logger.warning(f"⚠️ {failed_loads} page loads had failed requests")
+        return report
+
     async def concurrent_user_simulation(self, num_users: int = 5):
         """Simulate multiple concurrent users"""
         logger.info(f"👥 Simulating {num_users} concurrent users")
-        
+
         async def simulate_user():
             async with aiohttp.ClientSession() as session:
                 # Simulate user journey
@@ -97,41 +420,56 @@ class FrontendLoadTest:
                     "/api/github/status",
                     "/api/nvidia/status"
                 ]
-                
+
                 for step in journey:
                     try:
-                        start_time = time.time()
-                        url = f"{self.base_url}{step}" if step.startswith("/api") else f"{self.base_url}{step}"
+                        start_time = time.perf_counter()
+                        url = f"{self.base_url}{step}"
                         async with session.get(url) as response:
-                            load_time = time.time() - start_time
+                            load_time = time.perf_counter() - start_time
                             logger.info(f"User journey {step}: {response.status} ({load_time:.3f}s)")
-                        
+
                         # Simulate user think time
                         await asyncio.sleep(random.uniform(0.5, 2.0))
-                        
+
                     except Exception as e:
                         logger.error(f"User journey error at {step}: {e}")
-        
+
         # Run concurrent user simulations
         tasks = [simulate_user() for _ in range(num_users)]
         await asyncio.gather(*tasks)
-    
-    async def run_frontend_load_test(self):
+
+    async def run_frontend_load_test(self, num_users: int = 100, warm_loads: int = 1,
+                                     report_path: str = "frontend_load_report.json"):
         """Run complete frontend load test"""
         logger.info("🚀 Starting Frontend Load Test")
-        
+
         await self.test_frontend_endpoints()
+        report = await self.page_load_simulation(num_users=num_users, warm_loads=warm_loads)
         await self.concurrent_user_simulation(num_users=3)
-        
+
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"📄 Report saved to: {report_path}")
         logger.info("✅ Frontend load test completed!")
 
 async def main():
     """Main frontend load test execution"""
+    parser = argparse.ArgumentParser(description="OmniAI frontend page-load simulator")
+    parser.add_argument("--base-url", default="http://0.0.0.0:3000")
+    parser.add_argument("--users", type=int, default=100, help="Concurrent simulated browsers")
+    parser.add_argument("--warm-loads", type=int, default=1, help="Repeat loads per user with a primed cache")
+    parser.add_argument("--report", default="frontend_load_report.json")
+    parser.add_argument("--browser", action="store_true", help="Also run the Selenium check (needs Chrome)")
+    args = parser.parse_args()
+
     logger.info("🧪 OmniAI Frontend Load Testing")
     logger.info("=" * 50)
-    
-    tester = FrontendLoadTest()
-    await tester.run_frontend_load_test()
+
+    tester = FrontendLoadTest(args.base_url)
+    await tester.run_frontend_load_test(num_users=args.users, warm_loads=args.warm_loads, report_path=args.report)
+    if args.browser:
+        tester.simulate_user_interactions()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+HDR-style latency histogram for OmniAI load and monitoring tools
+Log-linear buckets with a fixed relative precision, stored sparsely so
+histograms are cheap to keep per endpoint and to merge across processes
+"""
+
+import math
+from typing import Dict, Iterable, Optional
+
+DEFAULT_PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+class HdrHistogram:
+    """
+    Values are recorded in seconds and tracked as integer microseconds.
+    Every recorded value is accurate to ``significant_figures`` decimal
+    digits, whatever its magnitude.
+    """
+
+    def __init__(self, significant_figures: int = 3, unit: float = 1e-6):
+        self.significant_figures = significant_figures
+        self.unit = unit
+        self.sub_bucket_count_magnitude = int(math.ceil(math.log2(2 * 10 ** significant_figures)))
+        self.sub_bucket_half_count_magnitude = self.sub_bucket_count_magnitude - 1
+        self.sub_bucket_count = 1 << self.sub_bucket_count_magnitude
+        self.sub_bucket_half_count = self.sub_bucket_count >> 1
+        self.sub_bucket_mask = self.sub_bucket_count - 1
+        self.counts: Dict[int, int] = {}
+        self.total_count = 0
+        self.min_value: Optional[int] = None
+        self.max_value = 0
+        self.sum_value = 0
+
+    # Indexing
+
+    def _index(self, value: int) -> int:
+        bucket = (value | self.sub_bucket_mask).bit_length() - self.sub_bucket_count_magnitude
+        sub_bucket = value >> bucket
+        return ((bucket + 1) << self.sub_bucket_half_count_magnitude) + (sub_bucket - self.sub_bucket_half_count)
+
+    def _range(self, index: int):
+        """Lowest value and width of the equivalence range stored at ``index``"""
+        bucket = (index >> self.sub_bucket_half_count_magnitude) - 1
+        sub_bucket = (index & (self.sub_bucket_half_count - 1)) + self.sub_bucket_half_count
+        if bucket < 0:
+            sub_bucket -= self.sub_bucket_half_count
+            bucket = 0
+        return sub_bucket << bucket, 1 << bucket
+
+    # Recording
+
+    def record(self, seconds: float, count: int = 1):
+        value = max(0, int(round(seconds / self.unit)))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total_count += count
+        self.sum_value += value * count
+        if self.min_value is None or value < self.min_value:
+            self.min_value = value
+        if value > self.max_value:
+            self.max_value = value
+
+    def record_corrected(self, seconds: float, expected_interval: float):
+        """Record ``seconds`` and back-fill the samples a stalled closed-loop client never sent"""
+        self.record(seconds)
+        if expected_interval <= 0:
+            return
+        missing = seconds - expected_interval
+        while missing >= expected_interval:
+            self.record(missing)
+            missing -= expected_interval
+
+    def merge(self, other: "HdrHistogram") -> "HdrHistogram":
+        if other.significant_figures != self.significant_figures or other.unit != self.unit:
+            raise ValueError("Cannot merge histograms with different precision")
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total_count += other.total_count
+        self.sum_value += other.sum_value
+        if other.min_value is not None and (self.min_value is None or other.min_value < self.min_value):
+            self.min_value = other.min_value
+        self.max_value = max(self.max_value, other.max_value)
+        return self
+
+    def reset(self):
+        self.counts.clear()
+        self.total_count = 0
+        self.min_value = None
+        self.max_value = 0
+        self.sum_value = 0
+
+    # Queries
+
+    def percentile(self, percentile: float) -> float:
+        """Value in seconds at or below which ``percentile`` percent of samples fall"""
+        if self.total_count == 0:
+            return 0.0
+        target = max(1, int(math.ceil(percentile / 100.0 * self.total_count)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                low, width = self._range(index)
+                return min(low + width - 1, self.max_value) * self.unit
+        return self.max_value * self.unit
+
+    def percentiles(self, percentiles: Iterable[float] = DEFAULT_PERCENTILES) -> Dict[str, float]:
+        return {f"p{p:g}": self.percentile(p) for p in percentiles}
+
+    @property
+    def mean(self) -> float:
+        return self.sum_value / self.total_count * self.unit if self.total_count else 0.0
+
+    @property
+    def min(self) -> float:
+        return (self.min_value or 0) * self.unit
+
+    @property
+    def max(self) -> float:
+        return self.max_value * self.unit
+
+    def summary(self, percentiles: Iterable[float] = DEFAULT_PERCENTILES) -> Dict[str, float]:
+        return {
+            "count": self.total_count,
+            "min": self.min,
+            "mean": self.mean,
+            "max": self.max,
+            **self.percentiles(percentiles),
+        }
+
+    # Serialization
+
+    def to_dict(self) -> dict:
+        return {
+            "significant_figures": self.significant_figures,
+            "unit": self.unit,
+            "counts": {str(index): count for index, count in self.counts.items()},
+            "total_count": self.total_count,
+            "min_value": self.min_value,
+            "max_value": self.max_value,
+            "sum_value": self.sum_value,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "HdrHistogram":
+        histogram = cls(data["significant_figures"], data["unit"])
+        histogram.counts = {int(index): count for index, count in data["counts"].items()}
+        histogram.total_count = data["total_count"]
+        histogram.min_value = data["min_value"]
+        histogram.max_value = data["max_value"]
+        histogram.sum_value = data["sum_value"]
+        return histogram
@@ -1,20 +1,52 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
+import asyncio
 import os
 from dotenv import load_dotenv
 from backend.core.routes.nvidia_routes import router as nvidia_router
 from backend.core.routes.github_routes import router as github_router
 from backend.core.routes.vercel_routes import router as vercel_router
+from backend.core.routes.admin_routes import router as admin_router
+from backend.core.routes.asset_routes import router as asset_router
+from backend.core.routes.upload_routes import EXPOSED_HEADERS as UPLOAD_HEADERS, router as upload_router
+from backend.core.responses import FastJSONResponse, PreEncodedPayload
+from backend.core.compression import CompressionMiddleware, compression_stats
+from backend.core.auth import authenticate
+from backend.core.config import get_settings
+from backend.core.metrics import MetricsMiddleware, registry as metrics_registry
+from backend.core.tracing import SpanExporter, TracingMiddleware
+from backend.core.loop_monitor import start_loop_monitor
+from backend.core.tenants import get_tenant_pools
+from backend.core.static_files import StaticFrontend
 
 # Load environment variables
 load_dotenv()
+settings = get_settings()
+metrics_registry.multiprocess_dir = metrics_registry.multiprocess_dir or settings.metrics_multiproc_dir or None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    flusher = None
+    if metrics_registry.multiprocess_dir:
+        flusher = asyncio.create_task(metrics_registry.flush_periodically())
+    loop_monitor = start_loop_monitor(threshold=settings.loop_lag_threshold_ms / 1000)
+    yield
+    if get_tenant_pools.cache_info().currsize:  # don't build the vault just to close it
+        await get_tenant_pools().aclose()
+    await loop_monitor.stop()
+    if flusher:
+        flusher.cancel()
+        metrics_registry.write_snapshot()
 
 app = FastAPI(
     title="OmniAI",
     description="AI-Powered XR and Cloud Gaming Platform",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -24,28 +56,47 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=UPLOAD_HEADERS,
 )
 
-# Include API routes
-app.include_router(nvidia_router)
-app.include_router(github_router)
-app.include_router(vercel_router)
+# Compress large responses for clients that reach the backend directly
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_minimum_size)
 
-# Serve frontend static files - REMOVED as frontend is handled by Vite
-# if os.path.exists("frontend/dist"):
-#     app.mount("/static", StaticFiles(directory="frontend/dist"), name="static")
+# Outside compression and CORS, so latency includes them; tracing wraps it
+app.add_middleware(MetricsMiddleware)
 
-#     @app.get("/")
-#     async def serve_frontend():
-#         return FileResponse("frontend/dist/index.html")
-# else:
-@app.get("/")
-async def root():
-    return {"message": "OmniAI Platform - AI-Powered XR and Cloud Gaming"}
+# Outermost (added last), so the request span covers every other middleware
+app.add_middleware(
+    TracingMiddleware,
+    sample_rate=settings.trace_sample_rate,
+    exporter=SpanExporter(settings.trace_export_file, settings.trace_otlp_endpoint),
+)
 
-@app.get("/health")
-async def health_check():
-    return {
+# Include API routes; bearer tokens are verified once and then served from a claims cache
+authenticated = [Depends(authenticate)]
+app.include_router(nvidia_router, dependencies=authenticated)
+app.include_router(github_router, dependencies=authenticated)
+app.include_router(vercel_router, dependencies=authenticated)
+app.include_router(admin_router)
+app.include_router(upload_router, dependencies=authenticated)
+app.include_router(asset_router, dependencies=authenticated)
+
+# Hot endpoints serve pre-encoded bodies; /api/status re-encodes only when
+# the set of configured credentials changes.
+def _configured(env_var: str) -> str:
+    return "available" if os.getenv(env_var) else "not_configured"
+
+STATUS_ENV_VARS = (
+    "GEFORCE_NOW_API_KEY", "CLOUDXR_LICENSE_KEY", "NVIDIA_DEVELOPER_API_KEY",
+    "OPENAI_API_KEY", "PINECONE_API_KEY", "GITHUB_TOKEN", "VERCEL_TOKEN"
+)
+
+root_payload = PreEncodedPayload(
+    lambda: {"message": "OmniAI Platform - AI-Powered XR and Cloud Gaming"}
+)
+
+health_payload = PreEncodedPayload(
+    lambda: {
         "status": "healthy",
         "services": {
             "backend": "running",
@@ -53,28 +104,77 @@ async def health_check():
             "ai_services": "checking"
         }
     }
+)
 
-@app.get("/api/status")
-async def api_status():
-    return {
+status_payload = PreEncodedPayload(
+    lambda: {
         "nvidia_integration": {
-            "geforce_now": "available" if os.getenv("GEFORCE_NOW_API_KEY") else "not_configured",
-            "cloudxr": "available" if os.getenv("CLOUDXR_LICENSE_KEY") else "not_configured",
-            "dlss": "available" if os.getenv("NVIDIA_DEVELOPER_API_KEY") else "not_configured"
+            "geforce_now": _configured("GEFORCE_NOW_API_KEY"),
+            "cloudxr": _configured("CLOUDXR_LICENSE_KEY"),
+            "dlss": _configured("NVIDIA_DEVELOPER_API_KEY")
         },
         "ai_services": {
-            "openai": "available" if os.getenv("OPENAI_API_KEY") else "not_configured",
-            "pinecone": "available" if os.getenv("PINECONE_API_KEY") else "not_configured"
+            "openai": _configured("OPENAI_API_KEY"),
+            "pinecone": _configured("PINECONE_API_KEY")
         },
         "deployment": {
-            "github": "available" if os.getenv("GITHUB_TOKEN") else "not_configured",
-            "vercel": "available" if os.getenv("VERCEL_TOKEN") else "not_configured"
+            "github": _configured("GITHUB_TOKEN"),
+            "vercel": _configured("VERCEL_TOKEN")
         }
-    }
+    },
+    inputs=lambda: tuple(bool(os.getenv(name)) for name in STATUS_ENV_VARS)
+)
+
+# Serve the built frontend when configured; in development Vite serves it
+frontend = None
+if settings.frontend_dist_dir and os.path.isdir(settings.frontend_dist_dir):
+    frontend = StaticFrontend(settings.frontend_dist_dir)
+else:
+    @app.get("/")
+    async def root():
+        return root_payload.response()
+
+@app.get("/health")
+async def health_check():
+    return health_payload.response()
+
+@app.get("/api/status")
+async def api_status():
+    return status_payload.response()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint, aggregated across workers"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/compression/stats")
+async def get_compression_stats():
+    """Compression ratio and CPU cost per route for this worker"""
+    return {"routes": compression_stats.snapshot()}
+
+# Mounted last so every API route above takes precedence
+if frontend is not None:
+    app.mount("/", frontend, name="frontend")
 
 if __name__ == "__main__":
-    import uvicorn
-    print("🐍 Starting Python Backend on port 5000")
+    import argparse
+
+    parser = argparse.ArgumentParser(description="OmniAI Python backend")
+    parser.add_argument("--production", action="store_true",
+                        help="Pre-fork multiple workers sharing the preloaded app")
+    parser.add_argument("--workers", type=int, default=settings.web_concurrency or None,
+                        help="Worker processes in production mode (default: CPU count)")
+    parser.add_argument("--host", default=settings.host)
+    parser.add_argument("--port", type=int, default=settings.port)
+    args = parser.parse_args()
+
+    print(f"🐍 Starting Python Backend on port {args.port}")
     print("🦀 Rust Middleware should be running on port 8080")
     print("🌐 Access the application at: http://localhost:8080")
-    uvicorn.run(app, host="0.0.0.0", port=5000)
\ No newline at end of file
+    if args.production:
+        from backend.core.server import serve
+        serve(app, host=args.host, port=args.port, workers=args.workers,
+              graceful_shutdown_timeout=settings.graceful_shutdown_timeout)
+    else:
+        import uvicorn
+        uvicorn.run(app, host=args.host, port=args.port)
\ No newline at end of file
@@ -4,7 +4,7 @@ use std::convert::Infallible;
 use std::env;
 use std::sync::Arc;
 
-use warp::Filter;
+use warp::{Filter, Reply};
 use serde::{Deserialize, Serialize};
 use tokio::sync::RwLock;
 use uuid::Uuid;
@@ -101,7 +101,8 @@ async fn main() {
     // CORS filter
     let cors = warp::cors()
         .allow_any_origin()
-        .allow_headers(vec!["content-type", "authorization", "x-api-key"])
+        .allow_headers(vec!["content-type", "authorization", "x-api-key", "traceparent"])
+        .expose_headers(vec!["traceparent", "x-request-id"])
         .allow_methods(vec!["GET", "POST", "PUT", "DELETE", "OPTIONS"]);
 
     // Health check endpoint
@@ -119,6 +120,7 @@ async fn main() {
     let api_routes = warp::path("api")
         .and(with_state(state.clone()))
         .and(warp::body::json())
+        .and(warp::header::optional::<String>("traceparent"))
         .and_then(handle_api_request);
 
     // Static file serving for frontend
@@ -151,7 +153,8 @@ fn with_state(state: MiddlewareState) -> impl Filter<Extract = (MiddlewareState,
 async fn handle_api_request(
     state: MiddlewareState,
     body: serde_json::Value,
-) -> Result<impl warp::Reply, Infallible> {
+    traceparent: Option<String>,
+) -> Result<warp::reply::Response, Infallible> {
     let request_id = Uuid::new_v4().to_string();
     
     // Security validation
@@ -160,7 +163,7 @@ async fn handle_api_request(
         return Ok(warp::reply::with_status(
             warp::reply::json(&ApiResponse::<()>::error(format!("Security validation failed: {}", e))),
             warp::http::StatusCode::BAD_REQUEST,
-        ));
+        ).into_response());
     }
 
     // Rate limiting
@@ -169,7 +172,7 @@ async fn handle_api_request(
         return Ok(warp::reply::with_status(
             warp::reply::json(&ApiResponse::<()>::error("Rate limit exceeded".to_string())),
             warp::http::StatusCode::TOO_MANY_REQUESTS,
-        ));
+        ).into_response());
     }
 
     // Input validation
@@ -178,24 +181,31 @@ async fn handle_api_request(
         return Ok(warp::reply::with_status(
             warp::reply::json(&ApiResponse::<()>::error(format!("Validation failed: {}", e))),
             warp::http::StatusCode::BAD_REQUEST,
-        ));
+        ).into_response());
     }
 
-    // Proxy to backend
-    match state.proxy.forward_request(body).await {
-        Ok(response) => {
-            log::info!("Request {} processed successfully", request_id);
-            Ok(warp::reply::with_status(
+    // Proxy to backend, propagating the client's trace context
+    match state.proxy.forward_request(body, traceparent.as_deref()).await {
+        Ok((response, backend_traceparent)) => {
+            let trace = backend_traceparent.or(traceparent).unwrap_or_default();
+            log::info!("Request {} processed successfully (traceparent {})", request_id, trace);
+            let reply = warp::reply::with_status(
                 warp::reply::json(&response),
                 warp::http::StatusCode::OK,
-            ))
+            );
+            let reply = warp::reply::with_header(reply, "x-request-id", request_id);
+            if trace.is_empty() {
+                Ok(reply.into_response())
+            } else {
+                Ok(warp::reply::with_header(reply, "traceparent", trace).into_response())
+            }
         }
         Err(e) => {
             log::error!("Proxy error for request {}: {}", request_id, e);
             Ok(warp::reply::with_status(
                 warp::reply::json(&ApiResponse::<()>::error(format!("Proxy error: {}", e))),
                 warp::http::StatusCode::INTERNAL_SERVER_ERROR,
-            ))
+            ).into_response())
         }
     }
 }
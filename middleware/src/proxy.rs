@@ -16,7 +16,14 @@ impl ProxyManager {
         }
     }
 
-    pub async fn forward_request(&self, body: Value) -> Result<Value, Box<dyn std::error::Error>> {
+    /// Forwards an API request to the backend, propagating the W3C
+    /// `traceparent` header. Returns the backend's own `traceparent` so the
+    /// caller can hand it back to the client.
+    pub async fn forward_request(
+        &self,
+        body: Value,
+        traceparent: Option<&str>,
+    ) -> Result<(Value, Option<String>), Box<dyn std::error::Error>> {
         let endpoint = body.get("endpoint")
             .and_then(|e| e.as_str())
             .unwrap_or("/api/status");
@@ -29,51 +36,37 @@ impl ProxyManager {
 
         let url = format!("{}{}", self.backend_url, endpoint);
 
-        let response = match method.to_uppercase().as_str() {
-            "GET" => {
-                self.client
-                    .get(&url)
-                    .header("Content-Type", "application/json")
-                    .send()
-                    .await?
+        let mut request = match method.to_uppercase().as_str() {
+            "GET" => self.client.get(&url),
+            "POST" => self.client.post(&url),
+            "PUT" => self.client.put(&url),
+            "DELETE" => self.client.delete(&url),
+            _ => {
+                return Err(format!("Unsupported HTTP method: {}", method).into());
             }
-            "POST" => {
-                let mut request = self.client
-                    .post(&url)
-                    .header("Content-Type", "application/json");
-
-                if let Some(data) = data {
-                    request = request.json(data);
-                }
+        };
 
-                request.send().await?
+        request = request.header("Content-Type", "application/json");
+        if let Some(traceparent) = traceparent {
+            request = request.header("traceparent", traceparent);
+        }
+        if matches!(method.to_uppercase().as_str(), "POST" | "PUT") {
+            if let Some(data) = data {
+                request = request.json(data);
             }
-            "PUT" => {
-                let mut request = self.client
-                    .put(&url)
-                    .header("Content-Type", "application/json");
+        }
 
-                if let Some(data) = data {
-                    request = request.json(data);
-                }
+        let response = request.send().await?;
 
-                request.send().await?
-            }
-            "DELETE" => {
-                self.client
-                    .delete(&url)
-                    .header("Content-Type", "application/json")
-                    .send()
-                    .await?
-            }
-            _ => {
-                return Err(format!("Unsupported HTTP method: {}", method).into());
-            }
-        };
+        let backend_traceparent = response
+            .headers()
+            .get("traceparent")
+            .and_then(|v| v.to_str().ok())
+            .map(|v| v.to_string());
 
         if response.status().is_success() {
             let response_body: Value = response.json().await?;
-            Ok(response_body)
+            Ok((response_body, backend_traceparent))
         } else {
             Err(format!("Backend error: {}", response.status()).into())
         }
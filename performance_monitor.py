@@ -11,91 +11,316 @@ import psutil
 import time
 import json
 import logging
+import os
 from datetime import datetime
 import threading
 import queue
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from hdr_histogram import HdrHistogram
+from timeseries_store import TimeSeriesStore
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DEFAULT_TARGETS_FILE = "monitor_targets.json"
+
+SYSTEM_METRICS = [
+    "cpu_percent",
+    "memory_percent",
+    "disk_percent",
+    "net_bytes_sent_per_s",
+    "net_bytes_recv_per_s"
+]
+
+PROCESS_METRICS = [
+    "count",
+    "rss_bytes",
+    "cpu_percent",
+    "threads",
+    "open_fds",
+    "ctx_switches_per_s",
+    "sockets"
+]
+
+DEFAULT_PROCESS_ROLES = {
+    "backend": ["main.py", "uvicorn"],
+    "middleware": ["omni-ai-middleware"]
+}
+
+@dataclass
+class ProbeTarget:
+    name: str
+    url: str
+    method: str = "GET"
+    expected_status: List[int] = field(default_factory=lambda: [200])
+    interval: float = 1.0
+    timeout: float = 5.0
+    headers: Dict[str, str] = field(default_factory=dict)
+    body: Optional[str] = None
+
+def load_monitor_config(path: str = DEFAULT_TARGETS_FILE):
+    """Load probe targets and process roles from a JSON config"""
+    with open(path) as f:
+        config = json.load(f)
+    defaults = {
+        "interval": config.get("interval", 1.0),
+        "timeout": config.get("timeout", 5.0)
+    }
+    targets = [ProbeTarget(**{**defaults, **target}) for target in config["targets"]]
+    return targets, config.get("processes", DEFAULT_PROCESS_ROLES)
+
+class ProcessSampler:
+    """
+    Samples the OmniAI processes themselves (uvicorn workers, Rust middleware).
+
+    ``psutil.Process`` handles are kept across ticks so CPU percentages and
+    context-switch rates are computed from the previous sample, and the
+    process table is only rescanned every ``rediscover_every`` ticks or when a
+    tracked process disappears.
+    """
+
+    def __init__(self, roles: Dict[str, List[str]], rediscover_every: int = 30):
+        self.roles = roles
+        self.rediscover_every = rediscover_every
+        self.processes: Dict[str, Dict[int, psutil.Process]] = {role: {} for role in roles}
+        self._ctx_switches: Dict[int, tuple] = {}
+        self._ticks = 0
+
+    def metric_names(self):
+        return [f"proc.{role}.{metric}" for role in self.roles for metric in PROCESS_METRICS]
+
+    def discover(self):
+        """Scan the process table once and match command lines against each role"""
+        own_pid = os.getpid()
+        found = {role: {} for role in self.roles}
+        for proc in psutil.process_iter(["pid", "name", "cmdline"]):
+            if proc.pid == own_pid:
+                continue
+            cmdline = " ".join(proc.info.get("cmdline") or []) or (proc.info.get("name") or "")
+            for role, patterns in self.roles.items():
+                if any(pattern in cmdline for pattern in patterns):
+                    # Reuse the existing handle so its CPU baseline is kept
+                    found[role][proc.pid] = self.processes[role].get(proc.pid, proc)
+                    break
+        self.processes = found
+
+    def _sample_process(self, proc: psutil.Process, now: float) -> dict:
+        with proc.oneshot():
+            ctx = proc.num_ctx_switches()
+            switches = ctx.voluntary + ctx.involuntary
+            rate = None
+            if proc.pid in self._ctx_switches:
+                last_time, last_switches = self._ctx_switches[proc.pid]
+                rate = (switches - last_switches) / max(now - last_time, 1e-6)
+            self._ctx_switches[proc.pid] = (now, switches)
+
+            connections = getattr(proc, "net_connections", None) or proc.connections  # psutil < 6
+            try:
+                sockets = len(connections(kind="inet"))
+            except psutil.AccessDenied:
+                sockets = None
+
+            return {
+                "rss_bytes": proc.memory_info().rss,
+                "cpu_percent": proc.cpu_percent(),
+                "threads": proc.num_threads(),
+                "open_fds": proc.num_fds() if hasattr(proc, "num_fds") else None,
+                "ctx_switches_per_s": rate,
+                "sockets": sockets
+            }
+
+    def sample(self) -> Dict[str, float]:
+        """Per-role totals across all matching processes, keyed like the store columns"""
+        if self._ticks % self.rediscover_every == 0:
+            self.discover()
+        self._ticks += 1
+
+        now = time.time()
+        sample = {}
+        lost = False
+        for role, processes in self.processes.items():
+            totals = {metric: None for metric in PROCESS_METRICS}
+            totals["count"] = 0
+            for pid, proc in list(processes.items()):
+                try:
+                    values = self._sample_process(proc, now)
+                except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                    del processes[pid]
+                    self._ctx_switches.pop(pid, None)
+                    lost = True
+                    continue
+                except psutil.AccessDenied:
+                    continue
+                totals["count"] += 1
+                for metric, value in values.items():
+                    if value is not None:
+                        totals[metric] = (totals[metric] or 0) + value
+            for metric, value in totals.items():
+                sample[f"proc.{role}.{metric}"] = value
+
+        if lost:
+            # A worker was replaced; pick up its successor on the next tick
+            self._ticks = 0
+        return sample
+
+async def run_fixed_rate(interval: float, tick, should_continue):
+    """
+    Call ``tick`` every ``interval`` seconds against absolute deadlines, so the
+    schedule never drifts. Ticks that are already late are skipped rather than
+    fired in a burst. Returns the number of skipped ticks.
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    ticks = 0
+    skipped = 0
+    while should_continue():
+        tick()
+        ticks += 1
+        now = loop.time()
+        next_time = start + ticks * interval
+        if next_time < now:
+            late = int((now - next_time) // interval) + 1
+            skipped += late
+            ticks += late
+            next_time = start + ticks * interval
+        await asyncio.sleep(next_time - now)
+    return skipped
+
 class PerformanceMonitor:
-    def __init__(self):
-        self.metrics = []
+    def __init__(self, store_path: str = "logs/metrics_store", interval: float = 1.0,
+                 targets_file: str = DEFAULT_TARGETS_FILE):
+        self.interval = interval
+        self.targets, process_roles = load_monitor_config(targets_file)
+        self.process_sampler = ProcessSampler(process_roles)
+        self.store = TimeSeriesStore(
+            store_path,
+            SYSTEM_METRICS + self.service_metric_names() + self.process_sampler.metric_names()
+        )
+        self.latency: Dict[str, HdrHistogram] = {t.name: HdrHistogram() for t in self.targets}
+        self.health_status: Dict[str, dict] = {}
+        self.skipped_probes: Dict[str, int] = {t.name: 0 for t in self.targets}
+        self.latest = None
         self.running = False
         self.metric_queue = queue.Queue()
-        
+        self._last_net_io = None
+        self._probe_tasks = set()
+
+    def service_metric_names(self):
+        names = []
+        for target in self.targets:
+            names += [f"service.{target.name}.up", f"service.{target.name}.response_time"]
+        return names
+
     def collect_system_metrics(self):
         """Collect system resource metrics"""
+        now = time.time()
+        net_io = psutil.net_io_counters()
+        sent_rate = recv_rate = None
+        if self._last_net_io is not None:
+            last_time, last_io = self._last_net_io
+            elapsed = max(now - last_time, 1e-6)
+            sent_rate = (net_io.bytes_sent - last_io.bytes_sent) / elapsed
+            recv_rate = (net_io.bytes_recv - last_io.bytes_recv) / elapsed
+        self._last_net_io = (now, net_io)
+
         return {
             "timestamp": datetime.now().isoformat(),
             "cpu_percent": psutil.cpu_percent(),
             "memory_percent": psutil.virtual_memory().percent,
             "disk_percent": psutil.disk_usage('/').percent,
-            "network_io": psutil.net_io_counters()._asdict(),
-            "process_count": len(psutil.pids())
+            "network_io": net_io._asdict(),
+            "net_bytes_sent_per_s": sent_rate,
+            "net_bytes_recv_per_s": recv_rate,
+            **self.process_sampler.sample()
         }
+
+    def record(self, system_metrics, health_status):
+        """Append one tick to the time-series store"""
+        sample = {name: value for name, value in system_metrics.items() if name in self.store.index}
+        for service, status in health_status.items():
+            sample[f"service.{service}.up"] = 1.0 if status.get("status") == "healthy" else 0.0
+            sample[f"service.{service}.response_time"] = status.get("response_time")
+        self.store.append(sample)
     
-    async def check_service_health(self, session: aiohttp.ClientSession):
-        """Check health of all services"""
-        services = {
-            "backend": "http://0.0.0.0:5000/health",
-            "middleware": "http://0.0.0.0:8080/health"
-        }
-        
-        health_status = {}
-        for name, url in services.items():
-            try:
-                start_time = time.time()
-                async with session.get(url, timeout=5) as response:
-                    response_time = time.time() - start_time
-                    health_status[name] = {
-                        "status": "healthy" if response.status == 200 else "unhealthy",
-                        "response_time": response_time,
-                        "status_code": response.status
-                    }
-            except Exception as e:
-                health_status[name] = {
-                    "status": "error",
-                    "error": str(e),
-                    "response_time": None
+    async def probe(self, session: aiohttp.ClientSession, target: ProbeTarget):
+        """Probe one target and record its latency"""
+        start_time = time.perf_counter()
+        try:
+            async with session.request(
+                target.method, target.url, headers=target.headers, data=target.body,
+                timeout=aiohttp.ClientTimeout(total=target.timeout)
+            ) as response:
+                await response.read()
+                response_time = time.perf_counter() - start_time
+                self.latency[target.name].record(response_time)
+                status = {
+                    "status": "healthy" if response.status in target.expected_status else "unhealthy",
+                    "response_time": response_time,
+                    "status_code": response.status
                 }
-        
-        return health_status
-    
+        except Exception as e:
+            status = {
+                "status": "error",
+                "error": str(e) or type(e).__name__,
+                "response_time": None
+            }
+        self.health_status[target.name] = status
+        return status
+
+    async def check_service_health(self, session: aiohttp.ClientSession):
+        """Check health of all services concurrently"""
+        statuses = await asyncio.gather(*(self.probe(session, t) for t in self.targets))
+        return {target.name: status for target, status in zip(self.targets, statuses)}
+
+    async def probe_loop(self, session: aiohttp.ClientSession, target: ProbeTarget):
+        """Probe a target on its own fixed-rate schedule; slow responses never delay the next probe"""
+        def tick():
+            task = asyncio.create_task(self.probe(session, target))
+            self._probe_tasks.add(task)
+            task.add_done_callback(self._probe_tasks.discard)
+
+        self.skipped_probes[target.name] += await run_fixed_rate(
+            target.interval, tick, lambda: self.running
+        )
+
+    def sample(self):
+        """Collect system metrics and record them with the latest probe results"""
+        try:
+            system_metrics = self.collect_system_metrics()
+            health_status = dict(self.health_status)
+
+            self.latest = {
+                **system_metrics,
+                "services": health_status
+            }
+            self.record(system_metrics, health_status)
+
+            # Log current status
+            services = " | ".join(
+                f"{name}: {status.get('status', 'unknown')}" for name, status in health_status.items()
+            )
+            logger.info(f"CPU: {system_metrics['cpu_percent']:.1f}% | "
+                      f"Memory: {system_metrics['memory_percent']:.1f}% | {services}")
+        except Exception as e:
+            logger.error(f"Monitoring error: {e}")
+
     async def monitor_loop(self):
         """Main monitoring loop"""
-        logger.info("📊 Starting Performance Monitor")
-        
+        logger.info(f"📊 Starting Performance Monitor ({len(self.targets)} probe targets)")
+
         async with aiohttp.ClientSession() as session:
-            while self.running:
-                try:
-                    # Collect metrics
-                    system_metrics = self.collect_system_metrics()
-                    health_status = await self.check_service_health(session)
-                    
-                    combined_metrics = {
-                        **system_metrics,
-                        "services": health_status
-                    }
-                    
-                    self.metrics.append(combined_metrics)
-                    
-                    # Log current status
-                    logger.info(f"CPU: {system_metrics['cpu_percent']:.1f}% | "
-                              f"Memory: {system_metrics['memory_percent']:.1f}% | "
-                              f"Backend: {health_status.get('backend', {}).get('status', 'unknown')} | "
-                              f"Middleware: {health_status.get('middleware', {}).get('status', 'unknown')}")
-                    
-                    # Keep only last 100 metrics
-                    if len(self.metrics) > 100:
-                        self.metrics.pop(0)
-                    
-                    await asyncio.sleep(5)  # Monitor every 5 seconds
-                    
-                except Exception as e:
-                    logger.error(f"Monitoring error: {e}")
-                    await asyncio.sleep(5)
-    
+            probes = [asyncio.create_task(self.probe_loop(session, t)) for t in self.targets]
+            try:
+                await run_fixed_rate(self.interval, self.sample, lambda: self.running)
+            finally:
+                await asyncio.gather(*probes, return_exceptions=True)
+                for task in list(self._probe_tasks):
+                    task.cancel()
+                await asyncio.gather(*self._probe_tasks, return_exceptions=True)
+
+        self.store.flush()
+
     def start_monitoring(self):
         """Start the monitoring process"""
         self.running = True
@@ -105,36 +330,60 @@ class PerformanceMonitor:
         """Stop the monitoring process"""
         self.running = False
     
-    def get_metrics_report(self):
-        """Generate metrics report"""
-        if not self.metrics:
+    def get_metrics_report(self, window_seconds: float = 60):
+        """Generate metrics report over the last ``window_seconds``"""
+        if self.store.last_timestamp is None:
             return "No metrics collected yet"
-        
-        recent_metrics = self.metrics[-10:]  # Last 10 readings
-        
-        avg_cpu = sum(m['cpu_percent'] for m in recent_metrics) / len(recent_metrics)
-        avg_memory = sum(m['memory_percent'] for m in recent_metrics) / len(recent_metrics)
-        
-        service_health = {}
-        for metric in recent_metrics:
-            for service, status in metric.get('services', {}).items():
-                if service not in service_health:
-                    service_health[service] = []
-                service_health[service].append(status.get('status') == 'healthy')
-        
+
+        start = time.time() - window_seconds
+        cpu = self.store.summarize("cpu_percent", start)
+        memory = self.store.summarize("memory_percent", start)
+
         report = {
+            "window_seconds": window_seconds,
             "system_performance": {
-                "avg_cpu_percent": avg_cpu,
-                "avg_memory_percent": avg_memory,
-                "sample_count": len(recent_metrics)
+                "avg_cpu_percent": cpu["avg"],
+                "max_cpu_percent": cpu["max"],
+                "avg_memory_percent": memory["avg"],
+                "max_memory_percent": memory["max"],
+                "sample_count": cpu["count"]
             },
-            "service_availability": {}
+            "service_availability": {},
+            "service_response_time": {}
         }
-        
-        for service, health_checks in service_health.items():
-            uptime = (sum(health_checks) / len(health_checks)) * 100
-            report["service_availability"][service] = f"{uptime:.1f}%"
-        
+
+        for target in self.targets:
+            service = target.name
+            up = self.store.summarize(f"service.{service}.up", start)
+            if up["count"]:
+                report["service_availability"][service] = f"{up['avg'] * 100:.1f}%"
+            report["service_response_time"][service] = self.store.summarize(
+                f"service.{service}.response_time", start
+            )
+
+        # Latency distribution since the monitor started
+        report["service_latency"] = {
+            name: {**histogram.summary(), "skipped_probes": self.skipped_probes[name]}
+            for name, histogram in self.latency.items()
+        }
+
+        report["processes"] = {}
+        for role in self.process_sampler.roles:
+            report["processes"][role] = {
+                metric: self.store.summarize(f"proc.{role}.{metric}", start)["avg"]
+                for metric in PROCESS_METRICS
+            }
+
+        # How each service's latency moves with the resources of each process role
+        report["latency_correlation"] = {}
+        for target in self.targets:
+            latency_metric = f"service.{target.name}.response_time"
+            report["latency_correlation"][target.name] = {
+                f"{role}.{metric}": self.store.correlate(latency_metric, f"proc.{role}.{metric}", start)
+                for role in self.process_sampler.roles
+                for metric in ("cpu_percent", "rss_bytes", "ctx_switches_per_s")
+            }
+
         return json.dumps(report, indent=2)
 
 async def run_performance_monitor():
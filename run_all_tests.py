@@ -2,23 +2,62 @@
 """
 Comprehensive Test Runner for OmniAI Platform
 Runs all stress tests, performance monitoring, and load testing
+
+Steps form a dependency graph and run concurrently as soon as their
+dependencies pass. Install and build steps are skipped when the hash of
+their inputs (lockfiles, sources) matches the last successful run.
 """
 
+import argparse
 import asyncio
+import glob
+import hashlib
+import os
 import subprocess
 import sys
 import time
 import logging
 import json
+from collections import deque
+from dataclasses import dataclass, field
 from datetime import datetime
+from typing import Dict, List, Optional
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CACHE_FILE = os.path.join(ROOT, ".test_cache.json")
+OUTPUT_TAIL_LINES = 50
+
+@dataclass
+class Step:
+    name: str
+    command: List[str]
+    cwd: Optional[str] = None
+    depends_on: List[str] = field(default_factory=list)
+    timeout: float = 300
+    inputs: List[str] = field(default_factory=list)    # globs hashed to decide whether the step can be skipped
+    outputs: List[str] = field(default_factory=list)   # must still exist for a cached skip
+    timeout_ok: bool = False                           # for steps that run until they are stopped
+
+@dataclass
+class StepResult:
+    status: str                 # passed, failed, cached, skipped
+    success: bool
+    duration: float = 0.0
+    started_at: float = 0.0     # seconds after the run started
+    returncode: Optional[int] = None
+    output_tail: List[str] = field(default_factory=list)
+    reason: str = ""
+
 class TestOrchestrator:
-    def __init__(self):
-        self.test_results = {}
+    def __init__(self, use_cache: bool = True, max_parallel: int = 4):
+        self.test_results: Dict[str, StepResult] = {}
         self.start_time = None
+        self.use_cache = use_cache
+        self.semaphore = asyncio.Semaphore(max_parallel)
+        self.cache = self.load_cache() if use_cache else {}
 
     def run_command(self, command, cwd=None):
         """Run a command safely and return result"""
@@ -28,9 +67,9 @@ class TestOrchestrator:
                 command = command.split()
 
             result = subprocess.run(
-                command, 
-                capture_output=True, 
-                text=True, 
+                command,
+                capture_output=True,
+                text=True,
                 timeout=30,
                 cwd=cwd,
                 shell=False  # Never use shell=True for security
@@ -61,17 +100,20 @@ class TestOrchestrator:
         logger.info("🔍 Checking Prerequisites")
 
         prerequisites = [
-            ("python", "python --version"),
-            ("pip", "pip --version"),
+            ("python", [sys.executable, "--version"]),
+            ("pip", [sys.executable, "-m", "pip", "--version"]),
             ("node", "node --version"),
             ("npm", "npm --version"),
             ("cargo", "cargo --version"),
             ("curl", "curl --version")
         ]
 
+        results = await asyncio.gather(*[
+            asyncio.to_thread(self.run_command, command) for _, command in prerequisites
+        ])
+
         missing = []
-        for tool, command in prerequisites:
-            result = self.run_command(command)
+        for (tool, _), result in zip(prerequisites, results):
             if result["success"]:
                 logger.info(f"✅ {tool} is available")
             else:
@@ -84,105 +126,189 @@ class TestOrchestrator:
 
         return True
 
-    async def start_services(self):
-        """Start all required services"""
-        logger.info("🚀 Starting Services")
-
-        # Install dependencies
-        logger.info("📦 Installing dependencies")
-
-        # Python dependencies
-        result = self.run_command(["pip", "install", "-r", "requirements.txt"])
-        if not result["success"]:
-            logger.error("❌ Failed to install Python dependencies")
-            return False
-
-        # Frontend dependencies
-        result = self.run_command(["npm", "install"], cwd="frontend")
-        if not result["success"]:
-            logger.error("❌ Failed to install frontend dependencies")
-            return False
-
-        # Build middleware
-        result = self.run_command(["cargo", "build", "--release"], cwd="middleware")
-        if not result["success"]:
-            logger.error("❌ Failed to build middleware")
-            return False
-
-        logger.info("✅ All services prepared")
-        return True
-
-    async def run_stress_tests(self):
-        """Run comprehensive stress tests"""
-        logger.info("🧪 Running Stress Tests")
-
-        # Run the main stress test
-        result = self.run_command(["python", "stress_test.py"])
-        self.test_results["stress_test"] = result
-
-        if result["success"]:
-            logger.info("✅ Stress tests completed successfully")
-        else:
-            logger.error("❌ Stress tests failed")
-            logger.error(result.get("stderr", "No error details"))
-
-        return result["success"]
-
-    async def run_performance_monitoring(self):
-        """Run performance monitoring"""
-        logger.info("📊 Running Performance Monitoring")
+    def build_steps(self) -> List[Step]:
+        """The test pipeline; steps without a path between them run concurrently"""
+        python = sys.executable
+        installs = ["pip_install", "npm_install", "cargo_build"]
 
-        # Run performance monitor for 30 seconds
-        result = self.run_command(["timeout", "30", "python", "performance_monitor.py"])
-        self.test_results["performance_monitor"] = result
-
-        if result["success"]:
-            logger.info("✅ Performance monitoring completed")
-        else:
-            logger.info("ℹ️ Performance monitoring finished (expected timeout)")
-
-        return True
-
-    async def run_component_tests(self):
-        """Run individual component tests"""
-        logger.info("🔧 Running Component Tests")
+        def health_check(url: str) -> List[str]:
+            # Retry instead of a fixed sleep while the services come up
+            return ["curl", "-fsS", "--retry", "10", "--retry-connrefused", "--retry-delay", "1", url]
 
         components = [
-            ("Backend Health", "curl -f http://0.0.0.0:5000/health"),
-            ("Middleware Health", "curl -f http://0.0.0.0:8080/health"),
-            ("API Status", "curl -f http://0.0.0.0:5000/api/status"),
-            ("GitHub Integration", "curl -f http://0.0.0.0:8080/api/github/status"),
-            ("NVIDIA Integration", "curl -f http://0.0.0.0:8080/api/nvidia/status"),
-            ("Vercel Integration", "curl -f http://0.0.0.0:8080/api/vercel/status")
+            ("backend_health", "http://0.0.0.0:5000/health"),
+            ("middleware_health", "http://0.0.0.0:8080/health"),
+            ("api_status", "http://0.0.0.0:5000/api/status"),
+            ("github_integration", "http://0.0.0.0:8080/api/github/status"),
+            ("nvidia_integration", "http://0.0.0.0:8080/api/nvidia/status"),
+            ("vercel_integration", "http://0.0.0.0:8080/api/vercel/status"),
         ]
 
-        component_results = {}
-        for name, command in components:
-            result = self.run_command(command)
-            component_results[name] = result["success"]
+        steps = [
+            Step("pip_install", [python, "-m", "pip", "install", "-r", "requirements.txt"],
+                 timeout=600, inputs=["requirements.txt"]),
+            Step("npm_install", ["npm", "install"], cwd="frontend", timeout=600,
+                 inputs=["frontend/package.json", "frontend/package-lock.json"],
+                 outputs=["frontend/node_modules"]),
+            Step("cargo_build", ["cargo", "build", "--release"], cwd="middleware", timeout=1800,
+                 inputs=["middleware/Cargo.toml", "middleware/Cargo.lock", "middleware/src/**/*.rs"],
+                 outputs=["middleware/target/release"]),
+        ]
+        steps += [Step(name, health_check(url), depends_on=installs, timeout=60) for name, url in components]
+        steps += [
+            # The monitor samples while the stress test generates load
+            Step("performance_monitor", [python, "performance_monitor.py"],
+                 depends_on=["backend_health"], timeout=30, timeout_ok=True),
+            Step("stress_test", [python, "stress_test.py"],
+                 depends_on=["backend_health", "middleware_health"], timeout=900),
+        ]
+        return steps
 
-            if result["success"]:
-                logger.info(f"✅ {name}: OK")
-            else:
-                logger.warning(f"⚠️ {name}: Failed")
+    # Input hashing
 
-        self.test_results["component_tests"] = component_results
-        return component_results
+    def load_cache(self) -> Dict[str, str]:
+        try:
+            with open(CACHE_FILE) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_cache(self):
+        with open(CACHE_FILE, "w") as f:
+            json.dump(self.cache, f, indent=2, sort_keys=True)
+
+    def input_hash(self, step: Step) -> str:
+        digest = hashlib.sha256(json.dumps([step.command, step.cwd]).encode())
+        for pattern in step.inputs:
+            for path in sorted(glob.glob(os.path.join(ROOT, pattern), recursive=True)):
+                digest.update(os.path.relpath(path, ROOT).encode())
+                with open(path, "rb") as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b""):
+                        digest.update(chunk)
+        return digest.hexdigest()
+
+    def is_cached(self, step: Step, input_hash: str) -> bool:
+        if not self.use_cache or not step.inputs or self.cache.get(step.name) != input_hash:
+            return False
+        return all(os.path.exists(os.path.join(ROOT, path)) for path in step.outputs)
+
+    # Execution
+
+    async def stream_output(self, step: Step, stream: asyncio.StreamReader, tail: deque):
+        async for raw in stream:
+            line = raw.decode(errors="replace").rstrip()
+            tail.append(line)
+            logger.info(f"[{step.name}] {line}")
+
+    async def execute(self, step: Step) -> StepResult:
+        input_hash = self.input_hash(step) if step.inputs else ""
+        if self.is_cached(step, input_hash):
+            logger.info(f"⏭️ {step.name}: inputs unchanged, skipping")
+            return StepResult(status="cached", success=True, reason="inputs unchanged")
+
+        async with self.semaphore:
+            started_at = time.time() - self.start_time
+            logger.info(f"▶️ {step.name}: {' '.join(step.command)}")
+            start = time.perf_counter()
+            tail = deque(maxlen=OUTPUT_TAIL_LINES)
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *step.command,
+                    cwd=os.path.join(ROOT, step.cwd) if step.cwd else ROOT,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.STDOUT,
+                )
+            except OSError as e:
+                return StepResult(status="failed", success=False, started_at=started_at, reason=str(e))
+
+            reader = asyncio.create_task(self.stream_output(step, process.stdout, tail))
+            timed_out = False
+            try:
+                await asyncio.wait_for(process.wait(), step.timeout)
+            except asyncio.TimeoutError:
+                timed_out = True
+                process.kill()
+                await process.wait()
+            await reader
+            duration = time.perf_counter() - start
+
+        success = process.returncode == 0 or (timed_out and step.timeout_ok)
+        reason = f"timed out after {step.timeout:g}s" if timed_out else ""
+        if success and step.inputs:
+            self.cache[step.name] = input_hash
+            self.save_cache()
+        return StepResult(status="passed" if success else "failed", success=success, duration=duration,
+                          started_at=started_at, returncode=process.returncode, output_tail=list(tail),
+                          reason=reason)
+
+    async def run_graph(self, steps: List[Step]):
+        """Start every step as soon as all of its dependencies have passed"""
+        by_name = {step.name: step for step in steps}
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_step(step: Step) -> StepResult:
+            dependencies = [await tasks[name] for name in step.depends_on]
+            failed = [name for name, result in zip(step.depends_on, dependencies) if not result.success]
+            if failed:
+                result = StepResult(status="skipped", success=False, reason=f"dependency failed: {', '.join(failed)}")
+                logger.warning(f"⏭️ {step.name}: {result.reason}")
+            else:
+                result = await self.execute(step)
+                if result.status == "passed":
+                    logger.info(f"✅ {step.name} passed in {result.duration:.1f}s")
+                elif result.status == "failed":
+                    logger.error(f"❌ {step.name} failed after {result.duration:.1f}s {result.reason}".rstrip())
+            self.test_results[step.name] = result
+            return result
+
+        for step in steps:
+            unknown = [name for name in step.depends_on if name not in by_name]
+            if unknown:
+                raise ValueError(f"{step.name} depends on unknown steps: {', '.join(unknown)}")
+        for step in self.ordered(steps):
+            tasks[step.name] = asyncio.create_task(run_step(step))
+        await asyncio.gather(*tasks.values())
+
+    @staticmethod
+    def ordered(steps: List[Step]) -> List[Step]:
+        """Topological order; raises on a dependency cycle"""
+        by_name = {step.name: step for step in steps}
+        done, visiting, order = set(), set(), []
+
+        def visit(step: Step):
+            if step.name in done:
+                return
+            if step.name in visiting:
+                raise ValueError(f"Dependency cycle through {step.name}")
+            visiting.add(step.name)
+            for name in step.depends_on:
+                visit(by_name[name])
+            visiting.discard(step.name)
+            done.add(step.name)
+            order.append(step)
+
+        for step in steps:
+            visit(step)
+        return order
 
     def generate_final_report(self):
         """Generate comprehensive test report"""
         end_time = time.time()
         duration = end_time - self.start_time if self.start_time else 0
+        step_time = sum(r.duration for r in self.test_results.values())
 
         report = {
             "test_suite": "OmniAI Platform Comprehensive Testing",
             "timestamp": datetime.now().isoformat(),
             "duration_seconds": duration,
-            "results": self.test_results,
+            "step_seconds": step_time,
+            "results": {name: result.__dict__ for name, result in self.test_results.items()},
             "summary": {
                 "total_tests": len(self.test_results),
-                "passed": sum(1 for r in self.test_results.values() if isinstance(r, dict) and r.get("success", False)),
-                "failed": sum(1 for r in self.test_results.values() if isinstance(r, dict) and not r.get("success", False))
+                "passed": sum(1 for r in self.test_results.values() if r.status == "passed"),
+                "cached": sum(1 for r in self.test_results.values() if r.status == "cached"),
+                "failed": sum(1 for r in self.test_results.values() if r.status == "failed"),
+                "skipped": sum(1 for r in self.test_results.values() if r.status == "skipped")
             }
         }
 
@@ -193,25 +319,24 @@ class TestOrchestrator:
         # Print summary
         logger.info("📋 COMPREHENSIVE TEST REPORT")
         logger.info("=" * 60)
-        logger.info(f"Test Duration: {duration:.2f} seconds")
+        logger.info(f"Test Duration: {duration:.2f} seconds ({step_time:.2f}s of step time)")
         logger.info(f"Total Tests: {report['summary']['total_tests']}")
-        logger.info(f"Passed: {report['summary']['passed']}")
+        logger.info(f"Passed: {report['summary']['passed']} (+{report['summary']['cached']} cached)")
         logger.info(f"Failed: {report['summary']['failed']}")
+        logger.info(f"Skipped: {report['summary']['skipped']}")
         logger.info("=" * 60)
 
-        # Component test details
-        if "component_tests" in self.test_results:
-            logger.info("Component Test Results:")
-            for component, success in self.test_results["component_tests"].items():
-                status = "✅ PASS" if success else "❌ FAIL"
-                logger.info(f"  {component}: {status}")
+        icons = {"passed": "✅ PASS", "cached": "⏭️ CACHED", "failed": "❌ FAIL", "skipped": "⏭️ SKIP"}
+        for name, result in sorted(self.test_results.items(), key=lambda item: item[1].started_at):
+            timing = f"{result.duration:7.2f}s (start +{result.started_at:.1f}s)" if result.duration else ""
+            logger.info(f"  {name:22s} {icons[result.status]:10s} {timing} {result.reason}".rstrip())
 
         logger.info(f"📄 Full report saved to: comprehensive_test_report.json")
 
         return report
 
     async def run_all_tests(self):
-        """Run all tests in sequence"""
+        """Run the test graph, independent steps in parallel"""
         self.start_time = time.time()
 
         logger.info("🧪 Starting OmniAI Platform Comprehensive Testing")
@@ -222,23 +347,7 @@ class TestOrchestrator:
             logger.error("❌ Prerequisites check failed")
             return False
 
-        # Start services
-        if not await self.start_services():
-            logger.error("❌ Service startup failed")
-            return False
-
-        # Wait for services to be ready
-        logger.info("⏳ Waiting for services to be ready...")
-        await asyncio.sleep(5)
-
-        # Run component tests
-        await self.run_component_tests()
-
-        # Run performance monitoring
-        await self.run_performance_monitoring()
-
-        # Run stress tests
-        await self.run_stress_tests()
+        await self.run_graph(self.build_steps())
 
         # Generate final report
         report = self.generate_final_report()
@@ -248,8 +357,13 @@ class TestOrchestrator:
 
 async def main():
     """Main test orchestrator"""
-    orchestrator = TestOrchestrator()
+    parser = argparse.ArgumentParser(description="OmniAI Platform comprehensive test runner")
+    parser.add_argument("--no-cache", action="store_true", help="Rerun installs and builds even if inputs are unchanged")
+    parser.add_argument("--max-parallel", type=int, default=4, help="Steps allowed to run at the same time")
+    args = parser.parse_args()
+
+    orchestrator = TestOrchestrator(use_cache=not args.no_cache, max_parallel=args.max_parallel)
     await orchestrator.run_all_tests()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+OmniAI Scenario Engine
+Runs multi-step user journeys as virtual users: think times between steps,
+values extracted from one response feeding the next request, a weighted mix
+of scenarios and staged ramp-up/down of the virtual-user count. Metrics are
+kept per step and per scenario.
+
+    python scenario_engine.py --stages 30s:20,2m:20,30s:0
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from hdr_histogram import HdrHistogram
+from stress_test import RequestStats, ResultLog, StressTestRunner, TestResult, format_percentiles
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+_MISSING = object()
+
+
+class ExtractionError(Exception):
+    pass
+
+
+def extract_path(document: Any, path: str) -> Any:
+    """Follow a dotted path such as ``projects.0.id`` through parsed JSON"""
+    value = document
+    for part in path.split("."):
+        if isinstance(value, list) and part.lstrip("-").isdigit():
+            index = int(part)
+            value = value[index] if -len(value) <= index < len(value) else _MISSING
+        elif isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        else:
+            value = _MISSING
+        if value is _MISSING:
+            raise ExtractionError(f"{path!r} not found in response")
+    return value
+
+
+def render(template: Any, context: Dict[str, Any]) -> Any:
+    """Fill ``{name}`` placeholders in strings, recursing into dicts and lists"""
+    if isinstance(template, str):
+        whole = _PLACEHOLDER.fullmatch(template)
+        if whole and whole.group(1) in context:
+            return context[whole.group(1)]  # keep the extracted value's type
+        return _PLACEHOLDER.sub(lambda m: str(context.get(m.group(1), m.group(0))), template)
+    if isinstance(template, dict):
+        return {key: render(value, context) for key, value in template.items()}
+    if isinstance(template, list):
+        return [render(value, context) for value in template]
+    return template
+
+
+@dataclass
+class Step:
+    endpoint: str
+    method: str = "GET"
+    data: Optional[dict] = None
+    extract: Dict[str, str] = field(default_factory=dict)
+    think_time: Tuple[float, float] = (0.0, 0.0)
+    name: str = ""
+
+    def __post_init__(self):
+        self.name = self.name or f"{self.method} {self.endpoint}"
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Step":
+        think_time = data.get("think_time", 0)
+        if not isinstance(think_time, (list, tuple)):
+            think_time = (think_time, think_time)
+        return cls(endpoint=data["endpoint"], method=data.get("method", "GET"), data=data.get("data"),
+                   extract=data.get("extract", {}), think_time=tuple(think_time), name=data.get("name", ""))
+
+
+@dataclass
+class Scenario:
+    name: str
+    steps: List[Step]
+    weight: float = 1.0
+
+    @classmethod
+    def from_workflow(cls, workflow: dict) -> "Scenario":
+        return cls(name=workflow["name"], steps=[Step.from_dict(s) for s in workflow["steps"]],
+                   weight=workflow.get("weight", 1.0))
+
+
+@dataclass
+class Stage:
+    """Move linearly from the previous stage's user count to ``users`` over ``duration`` seconds"""
+    duration: float
+    users: int
+
+    @classmethod
+    def parse(cls, spec: str) -> "Stage":
+        duration, users = spec.split(":")
+        units = {"s": 1, "m": 60, "h": 3600}
+        scale = units.get(duration[-1], 1)
+        return cls(duration=float(duration.rstrip("smh")) * scale, users=int(users))
+
+
+class ScenarioStats:
+    """Iteration counts and active time (think time excluded) of one scenario"""
+
+    def __init__(self):
+        self.completed = 0
+        self.failed = 0
+        self.failures: Dict[str, int] = {}
+        self.histogram = HdrHistogram()
+
+    def add(self, active_time: float, failed_step: Optional[str]):
+        if failed_step is None:
+            self.completed += 1
+            self.histogram.record(active_time)
+        else:
+            self.failed += 1
+            self.failures[failed_step] = self.failures.get(failed_step, 0) + 1
+
+
+class ScenarioEngine:
+    def __init__(self, base_url: str, scenarios: List[Scenario], stages: List[Stage],
+                 think_scale: float = 1.0, results_log: str = "", timeout: float = 30.0):
+        self.base_url = base_url
+        self.scenarios = scenarios
+        self.stages = stages
+        self.think_scale = think_scale
+        self.timeout = timeout
+        self.result_log = ResultLog(results_log) if results_log else None
+        self.step_stats: Dict[str, Dict[str, RequestStats]] = {s.name: {} for s in scenarios}
+        self.scenario_stats: Dict[str, ScenarioStats] = {s.name: ScenarioStats() for s in scenarios}
+        self.peak_users = 0
+        self._weights = [s.weight for s in scenarios]
+
+    def target_users(self, elapsed: float) -> Optional[int]:
+        """Virtual users wanted ``elapsed`` seconds in, or None once all stages are done"""
+        previous = 0
+        for stage in self.stages:
+            if elapsed < stage.duration:
+                return round(previous + (stage.users - previous) * elapsed / stage.duration)
+            elapsed -= stage.duration
+            previous = stage.users
+        return None
+
+    async def _think(self, step: Step):
+        low, high = step.think_time
+        if high > 0 and self.think_scale > 0:
+            await asyncio.sleep(random.uniform(low, high) * self.think_scale)
+
+    async def run_step(self, session: aiohttp.ClientSession, scenario: Scenario, step: Step,
+                       context: Dict[str, Any]) -> bool:
+        endpoint = render(step.endpoint, context)
+        data = render(step.data, context) if step.data is not None else None
+        start = time.perf_counter()
+        error = None
+        status = 0
+        try:
+            async with session.request(step.method, f"{self.base_url}{endpoint}", json=data) as response:
+                status = response.status
+                body = await response.read()
+            if status < 400 and step.extract:
+                document = json.loads(body)
+                for name, path in step.extract.items():
+                    context[name] = extract_path(document, path)
+        except (ExtractionError, ValueError) as e:
+            error = f"extract: {e}"
+        except Exception as e:
+            error = str(e)
+        elapsed = time.perf_counter() - start
+
+        result = TestResult(endpoint=step.name, method=step.method, status_code=status, response_time=elapsed,
+                            success=error is None and 0 < status < 400, error=error)
+        self.step_stats[scenario.name].setdefault(step.name, RequestStats()).add(result)
+        if self.result_log:
+            self.result_log.write(result, time.time())
+        context["_active"] += elapsed
+        return result.success
+
+    async def run_iteration(self, session: aiohttp.ClientSession, scenario: Scenario, vu: int, iteration: int):
+        context: Dict[str, Any] = {"vu": vu, "iteration": iteration, "rand": random.randint(1000, 9999),
+                                   "_active": 0.0}
+        failed_step = None
+        for i, step in enumerate(scenario.steps):
+            if not await self.run_step(session, scenario, step, context):
+                failed_step = step.name  # later steps may depend on this one's output
+                break
+            if i < len(scenario.steps) - 1:
+                await self._think(step)
+        self.scenario_stats[scenario.name].add(context["_active"], failed_step)
+
+    async def virtual_user(self, session: aiohttp.ClientSession, vu: int, stop: asyncio.Event):
+        iteration = 0
+        while not stop.is_set():
+            scenario = random.choices(self.scenarios, weights=self._weights)[0]
+            await self.run_iteration(session, scenario, vu, iteration)
+            iteration += 1
+            await self._think(scenario.steps[-1])
+
+    async def run(self) -> Dict[str, Any]:
+        total = sum(stage.duration for stage in self.stages)
+        logger.info(f"🎬 Running {len(self.scenarios)} scenarios for {total:g}s, "
+                    f"peak {max(s.users for s in self.stages)} virtual users")
+
+        users: List[Tuple[asyncio.Task, asyncio.Event]] = []
+        spawned: List[asyncio.Task] = []
+        connector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(connector=connector,
+                                         timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
+            start = time.perf_counter()
+            next_log = start
+            vu_id = 0
+            while True:
+                target = self.target_users(time.perf_counter() - start)
+                if target is None:
+                    break
+                while len(users) < target:
+                    stop = asyncio.Event()
+                    task = asyncio.create_task(self.virtual_user(session, vu_id, stop))
+                    users.append((task, stop))
+                    spawned.append(task)
+                    vu_id += 1
+                while len(users) > target:
+                    # Ramping down: the user finishes its current iteration, then exits
+                    _, stop = users.pop()
+                    stop.set()
+                self.peak_users = max(self.peak_users, len(users))
+                if time.perf_counter() >= next_log:
+                    logger.info(f"👥 {len(users)} virtual users active")
+                    next_log += 10
+                await asyncio.sleep(0.5)
+
+            for _, stop in users:
+                stop.set()
+            # Let in-flight iterations finish, but not past the request timeout
+            pending = [task for task in spawned if not task.done()]
+            if pending:
+                _, pending = await asyncio.wait(pending, timeout=self.timeout)
+            self.elapsed = time.perf_counter() - start
+            if pending:
+                # Stragglers must not outlive the session they are using
+                logger.warning(f"⚠️ Cancelling {len(pending)} virtual users still running after {self.timeout}s")
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        if self.result_log:
+            self.result_log.close()
+        return self.build_report()
+
+    def build_report(self) -> Dict[str, Any]:
+        report = {"duration": getattr(self, "elapsed", 0), "peak_users": self.peak_users, "scenarios": {}}
+        for scenario in self.scenarios:
+            stats = self.scenario_stats[scenario.name]
+            iterations = stats.completed + stats.failed
+            report["scenarios"][scenario.name] = {
+                "weight": scenario.weight,
+                "iterations": iterations,
+                "completed": stats.completed,
+                "failed": stats.failed,
+                "success_rate": stats.completed / iterations * 100 if iterations else 0,
+                "failed_at": stats.failures,
+                "active_time": stats.histogram.summary(),
+                "steps": {
+                    name: {
+                        "requests": step.total,
+                        "failed": step.failed,
+                        "status_codes": step.status_codes,
+                        "errors": step.errors,
+                        "latency": step.histogram.summary(),
+                    }
+                    for name, step in self.step_stats[scenario.name].items()
+                },
+            }
+        return report
+
+    def log_report(self, report: Dict[str, Any]):
+        logger.info("📊 SCENARIO REPORT")
+        logger.info("=" * 50)
+        logger.info(f"Duration: {report['duration']:.1f}s, peak virtual users: {report['peak_users']}")
+        for name, details in report["scenarios"].items():
+            logger.info(f"{name}: {details['completed']}/{details['iterations']} iterations completed, "
+                        f"{format_percentiles(self.scenario_stats[name].histogram)}")
+            for step_name, step in self.step_stats[name].items():
+                logger.info(f"   {step_name}: {step.success}/{step.total} ok, {format_percentiles(step.histogram)}")
+            for step_name, count in details["failed_at"].items():
+                logger.warning(f"   ❌ {count} iterations stopped at {step_name}")
+        logger.info("=" * 50)
+
+
+def default_scenarios() -> List[Scenario]:
+    """The journeys described by ``StressTestRunner.simulate_complex_workflow``"""
+    return [Scenario.from_workflow(w) for w in StressTestRunner(results_log="").simulate_complex_workflow()]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Run OmniAI user journeys as virtual users")
+    parser.add_argument("--base-url", default="http://0.0.0.0:8080")
+    parser.add_argument("--stages", default="30s:10,1m:10,15s:0",
+                        help="Comma-separated duration:users ramp stages, e.g. 30s:20,2m:20,30s:0")
+    parser.add_argument("--scenarios", help="JSON file with a list of workflows (default: built-in journeys)")
+    parser.add_argument("--think-scale", type=float, default=1.0, help="Multiply think times (0 disables them)")
+    parser.add_argument("--results-log", default="", help="Append per-step results to this NDJSON log")
+    parser.add_argument("--report", default="scenario_report.json")
+    args = parser.parse_args()
+
+    if args.scenarios:
+        with open(args.scenarios) as f:
+            scenarios = [Scenario.from_workflow(w) for w in json.load(f)]
+    else:
+        scenarios = default_scenarios()
+    stages = [Stage.parse(spec) for spec in args.stages.split(",")]
+
+    engine = ScenarioEngine(args.base_url, scenarios, stages, think_scale=args.think_scale,
+                            results_log=args.results_log)
+    report = await engine.run()
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    engine.log_report(report)
+    logger.info(f"📝 Report saved to {args.report}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
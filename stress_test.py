@@ -13,9 +13,9 @@ import concurrent.futures
 from typing import List, Dict, Any
 import logging
 from dataclasses import dataclass
-import statistics
 import sys
 import os
+from hdr_histogram import HdrHistogram
 
 # Configure logging
 logging.basicConfig(
@@ -36,47 +36,190 @@ class TestResult:
     response_time: float
     success: bool
     error: str = None
+    service_time: float = None  # from the actual send, excluding client-side queueing
+
+    def to_record(self, timestamp: float) -> dict:
+        record = {"t": round(timestamp, 3), "e": self.endpoint, "m": self.method, "s": self.status_code,
+                  "rt": round(self.response_time, 6)}
+        if self.service_time is not None:
+            record["st"] = round(self.service_time, 6)
+        if self.error:
+            record["err"] = self.error
+        return record
+
+    @classmethod
+    def from_record(cls, record: dict) -> "TestResult":
+        status = record["s"]
+        return cls(endpoint=record["e"], method=record["m"], status_code=status, response_time=record["rt"],
+                   success=0 < status < 400, error=record.get("err"), service_time=record.get("st"))
+
+class ResultLog:
+    """Append-only NDJSON log with one compact line per request"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = open(path, "a", buffering=1 << 16)
+
+    def write(self, result: TestResult, timestamp: float):
+        self.file.write(json.dumps(result.to_record(timestamp), separators=(",", ":")) + "\n")
+
+    def close(self):
+        self.file.close()
+
+class RequestStats:
+    """Streaming counters and latency histogram for a group of requests"""
+
+    MAX_DISTINCT_ERRORS = 20
+
+    def __init__(self):
+        self.success = 0
+        self.failed = 0
+        self.status_codes: Dict[int, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.histogram = HdrHistogram()
+
+    @property
+    def total(self) -> int:
+        return self.success + self.failed
+
+    def add(self, result: TestResult):
+        self.status_codes[result.status_code] = self.status_codes.get(result.status_code, 0) + 1
+        if result.success:
+            self.success += 1
+            self.histogram.record(result.response_time)
+            return
+        self.failed += 1
+        error = result.error or f"HTTP {result.status_code}"
+        if error in self.errors or len(self.errors) < self.MAX_DISTINCT_ERRORS:
+            self.errors[error] = self.errors.get(error, 0) + 1
+        else:
+            self.errors["other"] = self.errors.get("other", 0) + 1
+
+    def merge(self, other: "RequestStats") -> "RequestStats":
+        self.success += other.success
+        self.failed += other.failed
+        for status, count in other.status_codes.items():
+            self.status_codes[status] = self.status_codes.get(status, 0) + count
+        for error, count in other.errors.items():
+            key = error if error in self.errors or len(self.errors) < self.MAX_DISTINCT_ERRORS else "other"
+            self.errors[key] = self.errors.get(key, 0) + count
+        self.histogram.merge(other.histogram)
+        return self
+
+    def to_dict(self) -> dict:
+        return {"success": self.success, "failed": self.failed, "status_codes": self.status_codes,
+                "errors": self.errors, "histogram": self.histogram.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RequestStats":
+        stats = cls()
+        stats.success = data["success"]
+        stats.failed = data["failed"]
+        stats.status_codes = {int(status): count for status, count in data["status_codes"].items()}
+        stats.errors = dict(data["errors"])
+        stats.histogram = HdrHistogram.from_dict(data["histogram"])
+        return stats
+
+class ResultAggregator:
+    """Per-endpoint and per-time-window stats; memory does not grow with the request count"""
+
+    def __init__(self, window_seconds: int = 60):
+        self.window_seconds = window_seconds
+        self.overall = RequestStats()
+        self.endpoints: Dict[str, RequestStats] = {}
+        self.windows: Dict[int, RequestStats] = {}
+
+    def add(self, result: TestResult, timestamp: float):
+        window = int(timestamp) - int(timestamp) % self.window_seconds
+        self.overall.add(result)
+        self.endpoints.setdefault(result.endpoint, RequestStats()).add(result)
+        self.windows.setdefault(window, RequestStats()).add(result)
+
+    def merge(self, other: "ResultAggregator") -> "ResultAggregator":
+        """Fold in aggregates from another runner, e.g. a distributed load worker"""
+        self.overall.merge(other.overall)
+        for endpoint, stats in other.endpoints.items():
+            self.endpoints.setdefault(endpoint, RequestStats()).merge(stats)
+        for window, stats in other.windows.items():
+            self.windows.setdefault(window, RequestStats()).merge(stats)
+        return self
+
+    def to_dict(self) -> dict:
+        return {
+            "window_seconds": self.window_seconds,
+            "overall": self.overall.to_dict(),
+            "endpoints": {endpoint: stats.to_dict() for endpoint, stats in self.endpoints.items()},
+            "windows": {str(window): stats.to_dict() for window, stats in self.windows.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ResultAggregator":
+        aggregator = cls(data["window_seconds"])
+        aggregator.overall = RequestStats.from_dict(data["overall"])
+        aggregator.endpoints = {endpoint: RequestStats.from_dict(stats) for endpoint, stats in data["endpoints"].items()}
+        aggregator.windows = {int(window): RequestStats.from_dict(stats) for window, stats in data["windows"].items()}
+        return aggregator
+
+    @classmethod
+    def from_log(cls, path: str, window_seconds: int = 60) -> "ResultAggregator":
+        """Rebuild aggregates from a result log, e.g. to re-analyse an old soak test"""
+        aggregator = cls(window_seconds)
+        with open(path) as f:
+            for line in f:
+                record = json.loads(line)
+                aggregator.add(TestResult.from_record(record), record["t"])
+        return aggregator
 
 class StressTestRunner:
-    def __init__(self, base_url: str = "http://0.0.0.0:8080"):
+    def __init__(self, base_url: str = "http://0.0.0.0:8080", results_log: str = "logs/stress_test_results.ndjson",
+                 window_seconds: int = 60):
         self.base_url = base_url
         self.backend_url = "http://0.0.0.0:5000"
-        self.results: List[TestResult] = []
-
-    async def test_endpoint(self, session: aiohttp.ClientSession, endpoint: str, method: str = "GET", data: dict = None) -> TestResult:
-        """Test a single endpoint and measure response time"""
-        start_time = time.time()
+        self.aggregates = ResultAggregator(window_seconds)
+        self.result_log = ResultLog(results_log) if results_log else None
+
+    async def test_endpoint(self, session: aiohttp.ClientSession, endpoint: str, method: str = "GET", data: dict = None,
+                            scheduled_at: float = None) -> TestResult:
+        """Test a single endpoint and measure response time
+
+        When ``scheduled_at`` (a ``time.perf_counter()`` value) is given, the
+        response time is measured from that intended send time, so any delay
+        before the request actually went out counts against the server.
+        """
+        sent_at = time.perf_counter()
+        start_time = scheduled_at if scheduled_at is not None else sent_at
         try:
-            if method.upper() == "GET":
-                async with session.get(f"{self.base_url}{endpoint}") as response:
-                    await response.text()
-                    return TestResult(
-                        endpoint=endpoint,
-                        method=method,
-                        status_code=response.status,
-                        response_time=time.time() - start_time,
-                        success=response.status < 400
-                    )
-            elif method.upper() == "POST":
-                async with session.post(f"{self.base_url}{endpoint}", json=data) as response:
-                    await response.text()
-                    return TestResult(
-                        endpoint=endpoint,
-                        method=method,
-                        status_code=response.status,
-                        response_time=time.time() - start_time,
-                        success=response.status < 400
-                    )
+            async with session.request(method.upper(), f"{self.base_url}{endpoint}", json=data) as response:
+                await response.read()
+                finished = time.perf_counter()
+                return TestResult(
+                    endpoint=endpoint,
+                    method=method,
+                    status_code=response.status,
+                    response_time=finished - start_time,
+                    success=response.status < 400,
+                    service_time=finished - sent_at
+                )
         except Exception as e:
+            finished = time.perf_counter()
             return TestResult(
                 endpoint=endpoint,
                 method=method,
                 status_code=0,
-                response_time=time.time() - start_time,
+                response_time=finished - start_time,
                 success=False,
-                error=str(e)
+                error=str(e),
+                service_time=finished - sent_at
             )
 
+    def record(self, result: TestResult):
+        """Append a result to the on-disk log and fold it into the aggregates"""
+        timestamp = time.time()
+        if self.result_log:
+            self.result_log.write(result, timestamp)
+        self.aggregates.add(result, timestamp)
+
     async def load_test_concurrent(self, endpoint: str, concurrent_users: int = 10, requests_per_user: int = 5):
         """Simulate concurrent users hitting an endpoint"""
         logger.info(f"🚀 Load testing {endpoint} with {concurrent_users} concurrent users, {requests_per_user} requests each")
@@ -89,26 +232,104 @@ class StressTestRunner:
                     tasks.append(task)
 
             results = await asyncio.gather(*tasks)
-            self.results.extend(results)
+            histogram = HdrHistogram()
+            for result in results:
+                self.record(result)
+                if result.success:
+                    histogram.record(result.response_time)
 
             # Analyze results
             successful = [r for r in results if r.success]
             failed = [r for r in results if not r.success]
 
             if successful:
-                avg_response_time = statistics.mean([r.response_time for r in successful])
-                max_response_time = max([r.response_time for r in successful])
-                min_response_time = min([r.response_time for r in successful])
-
                 logger.info(f"✅ {endpoint} - Success: {len(successful)}/{len(results)}")
-                logger.info(f"   Avg Response Time: {avg_response_time:.3f}s")
-                logger.info(f"   Min/Max Response Time: {min_response_time:.3f}s / {max_response_time:.3f}s")
+                logger.info(f"   Avg Response Time: {histogram.mean:.3f}s")
+                logger.info(f"   Min/Max Response Time: {histogram.min:.3f}s / {histogram.max:.3f}s")
+                logger.info(f"   {format_percentiles(histogram)}")
 
             if failed:
                 logger.warning(f"❌ {endpoint} - Failed: {len(failed)}/{len(results)}")
                 for failure in failed[:3]:  # Show first 3 failures
                     logger.warning(f"   Error: {failure.error}")
 
+    async def open_loop_test(self, endpoint: str, rate: float, duration_seconds: float = 30,
+                             schedule: str = "poisson", method: str = "GET", data: dict = None,
+                             max_connections: int = 100, timeout: float = 30) -> Dict[str, Any]:
+        """Issue requests at ``rate`` per second regardless of how fast the server answers
+
+        Arrivals follow a fixed interval or a Poisson process and every request
+        is fired on its own task at its scheduled time. Latency is measured from
+        that intended time, so a server (or connection pool) that falls behind
+        shows up in the percentiles instead of silently slowing the test down.
+        """
+        if schedule not in ("poisson", "fixed"):
+            raise ValueError(f"Unknown schedule: {schedule}")
+        logger.info(f"🚀 Open-loop test of {endpoint} at {rate:g} req/s ({schedule}) for {duration_seconds:g}s")
+
+        latency = HdrHistogram()
+        service = HdrHistogram()
+        counts = {"sent": 0, "success": 0, "failed": 0}
+        errors: Dict[str, int] = {}
+        pending = set()
+
+        async def fire(session, scheduled_at):
+            result = await self.test_endpoint(session, endpoint, method, data, scheduled_at=scheduled_at)
+            self.record(result)
+            if result.success:
+                counts["success"] += 1
+                latency.record(result.response_time)
+                service.record(result.service_time)
+            else:
+                counts["failed"] += 1
+                key = result.error or f"HTTP {result.status_code}"
+                errors[key] = errors.get(key, 0) + 1
+
+        connector = aiohttp.TCPConnector(limit=max_connections)
+        async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+            start = time.perf_counter()
+            deadline = start + duration_seconds
+            next_send = start
+            max_send_lag = 0.0
+            while next_send < deadline:
+                delay = next_send - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    # Generator is behind schedule; send now but keep the intended time
+                    max_send_lag = max(max_send_lag, -delay)
+                task = asyncio.create_task(fire(session, next_send))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                counts["sent"] += 1
+                next_send += random.expovariate(rate) if schedule == "poisson" else 1.0 / rate
+            if pending:
+                await asyncio.gather(*pending)
+            elapsed = time.perf_counter() - start
+
+        result = {
+            "endpoint": endpoint,
+            "schedule": schedule,
+            "target_rate": rate,
+            "achieved_rate": counts["sent"] / duration_seconds,
+            "throughput": counts["success"] / elapsed if elapsed else 0,
+            "requests": counts,
+            "errors": errors,
+            "max_send_lag": max_send_lag,
+            "latency": latency.summary(),
+            "service_time": service.summary(),
+        }
+
+        logger.info(f"✅ {endpoint} - Success: {counts['success']}/{counts['sent']} "
+                    f"({result['throughput']:.1f} req/s completed)")
+        logger.info(f"   Latency (from intended send): {format_percentiles(latency)}")
+        logger.info(f"   Service time (from actual send): {format_percentiles(service)}")
+        if max_send_lag > 0.01:
+            logger.warning(f"⚠️ Load generator fell up to {max_send_lag * 1000:.0f}ms behind schedule")
+        for error, count in list(errors.items())[:3]:
+            logger.warning(f"   Error ({count}x): {error}")
+        return result
+
     async def stress_test_api_endpoints(self):
         """Test all API endpoints under load"""
         endpoints = [
@@ -145,32 +366,42 @@ class StressTestRunner:
                 logger.error(f"❌ Backend {endpoint}: {e}")
 
     def simulate_complex_workflow(self):
-        """Simulate complex user workflows"""
+        """Simulate complex user workflows
+
+        Run them as virtual users with ``scenario_engine.py``. Step values can
+        use ``{placeholders}`` filled from earlier ``extract`` results or the
+        per-iteration context (``rand``, ``vu``, ``iteration``).
+        """
         logger.info("🎯 Simulating Complex User Workflows")
 
         workflows = [
             {
                 "name": "GitHub Repository Creation",
+                "weight": 2,
                 "steps": [
-                    {"endpoint": "/api/github/status", "method": "GET"},
-                    {"endpoint": "/api/github/repositories", "method": "GET"},
+                    {"endpoint": "/api/github/status", "method": "GET", "think_time": [1, 3]},
+                    {"endpoint": "/api/github/repositories", "method": "GET", "think_time": [2, 5]},
                     {"endpoint": "/api/github/repositories", "method": "POST", 
-                     "data": {"name": f"test-repo-{random.randint(1000, 9999)}", "description": "Test repository", "private": False, "framework": "nextjs"}}
+                     "data": {"name": "test-repo-{rand}", "description": "Test repository", "private": False, "framework": "nextjs"}}
                 ]
             },
             {
                 "name": "NVIDIA Integration Check",
+                "weight": 1,
                 "steps": [
-                    {"endpoint": "/api/nvidia/status", "method": "GET"},
-                    {"endpoint": "/api/nvidia/geforce-now/status", "method": "GET"},
+                    {"endpoint": "/api/nvidia/status", "method": "GET", "think_time": [0.5, 1]},
+                    {"endpoint": "/api/nvidia/geforce-now/status", "method": "GET", "think_time": [0.5, 1]},
                     {"endpoint": "/api/nvidia/dlss/status", "method": "GET"}
                 ]
             },
             {
                 "name": "Vercel Deployment",
+                "weight": 3,
                 "steps": [
-                    {"endpoint": "/api/vercel/status", "method": "GET"},
-                    {"endpoint": "/api/vercel/projects", "method": "GET"}
+                    {"endpoint": "/api/vercel/status", "method": "GET", "think_time": [1, 2]},
+                    {"endpoint": "/api/vercel/projects", "method": "GET", "think_time": [2, 4],
+                     "extract": {"project_id": "projects.0.id"}},
+                    {"endpoint": "/api/vercel/projects/{project_id}/deploy", "method": "POST"}
                 ]
             }
         ]
@@ -205,57 +436,66 @@ class StressTestRunner:
                     tasks.append(task)
 
                 results = await asyncio.gather(*tasks)
-                self.results.extend(results)
+                for result in results:
+                    self.record(result)
                 request_count += len(results)
 
                 await asyncio.sleep(0.1)  # Small delay between batches
 
         logger.info(f"✅ Sustained load test completed. {request_count} requests in {duration_minutes} minutes")
 
-    def generate_report(self):
-        """Generate comprehensive test report"""
-        if not self.results:
-            logger.warning("No test results to report")
-            return
-
-        successful = [r for r in self.results if r.success]
-        failed = [r for r in self.results if not r.success]
-
-        # Group by endpoint
-        endpoint_stats = {}
-        for result in self.results:
-            if result.endpoint not in endpoint_stats:
-                endpoint_stats[result.endpoint] = {"success": 0, "failed": 0, "response_times": []}
-
-            if result.success:
-                endpoint_stats[result.endpoint]["success"] += 1
-                endpoint_stats[result.endpoint]["response_times"].append(result.response_time)
-            else:
-                endpoint_stats[result.endpoint]["failed"] += 1
-
-        # Generate report
+    def build_report(self) -> Dict[str, Any]:
+        """Report dict built from the streaming aggregates"""
+        overall = self.aggregates.overall
         report = {
             "summary": {
-                "total_requests": len(self.results),
-                "successful_requests": len(successful),
-                "failed_requests": len(failed),
-                "success_rate": len(successful) / len(self.results) * 100 if self.results else 0,
-                "average_response_time": statistics.mean([r.response_time for r in successful]) if successful else 0,
-                "test_duration": time.time() - self.start_time if hasattr(self, 'start_time') else 0
+                "total_requests": overall.total,
+                "successful_requests": overall.success,
+                "failed_requests": overall.failed,
+                "success_rate": overall.success / overall.total * 100 if overall.total else 0,
+                "average_response_time": overall.histogram.mean,
+                "percentiles": overall.histogram.percentiles(),
+                "test_duration": time.time() - self.start_time if hasattr(self, 'start_time') else 0,
+                "results_log": self.result_log.path if self.result_log else None
             },
-            "endpoint_details": {}
+            "endpoint_details": {},
+            "windows": []
         }
 
-        for endpoint, stats in endpoint_stats.items():
-            if stats["response_times"]:
+        for endpoint, stats in self.aggregates.endpoints.items():
+            if stats.success:
                 report["endpoint_details"][endpoint] = {
-                    "total_requests": stats["success"] + stats["failed"],
-                    "success_rate": stats["success"] / (stats["success"] + stats["failed"]) * 100,
-                    "avg_response_time": statistics.mean(stats["response_times"]),
-                    "min_response_time": min(stats["response_times"]),
-                    "max_response_time": max(stats["response_times"])
+                    "total_requests": stats.total,
+                    "success_rate": stats.success / stats.total * 100,
+                    "avg_response_time": stats.histogram.mean,
+                    "min_response_time": stats.histogram.min,
+                    "max_response_time": stats.histogram.max,
+                    "percentiles": stats.histogram.percentiles(),
+                    "status_codes": stats.status_codes,
+                    "errors": stats.errors
                 }
 
+        for window, stats in sorted(self.aggregates.windows.items()):
+            report["windows"].append({
+                "start": window,
+                "requests": stats.total,
+                "failed": stats.failed,
+                "throughput": stats.total / self.aggregates.window_seconds,
+                **stats.histogram.percentiles()
+            })
+        return report
+
+    def generate_report(self):
+        """Generate comprehensive test report"""
+        if self.result_log:
+            self.result_log.file.flush()
+        overall = self.aggregates.overall
+        if not overall.total:
+            logger.warning("No test results to report")
+            return
+
+        report = self.build_report()
+
         # Save report
         with open("stress_test_report.json", "w") as f:
             json.dump(report, f, indent=2)
@@ -266,11 +506,13 @@ class StressTestRunner:
         logger.info(f"Total Requests: {report['summary']['total_requests']}")
         logger.info(f"Success Rate: {report['summary']['success_rate']:.2f}%")
         logger.info(f"Average Response Time: {report['summary']['average_response_time']:.3f}s")
+        logger.info(f"Latency: {format_percentiles(overall.histogram)}")
         logger.info(f"Failed Requests: {report['summary']['failed_requests']}")
         logger.info("=" * 50)
 
         for endpoint, details in report["endpoint_details"].items():
-            logger.info(f"{endpoint}: {details['success_rate']:.1f}% success, {details['avg_response_time']:.3f}s avg")
+            logger.info(f"{endpoint}: {details['success_rate']:.1f}% success, {details['avg_response_time']:.3f}s avg, "
+                        f"{format_percentiles(self.aggregates.endpoints[endpoint].histogram)}")
 
     async def run_full_stress_test(self):
         """Run comprehensive stress test suite"""
@@ -284,8 +526,13 @@ class StressTestRunner:
         await self.sustained_load_test(duration_minutes=1)  # 1 minute for demo
 
         self.generate_report()
+        if self.result_log:
+            self.result_log.close()
         logger.info("✅ Stress test completed!")
 
+def format_percentiles(histogram: HdrHistogram) -> str:
+    return ", ".join(f"{name}={value * 1000:.1f}ms" for name, value in histogram.percentiles().items())
+
 def check_services():
     """Check if services are running"""
     logger.info("🔍 Checking service availability...")
@@ -308,6 +555,26 @@ def check_services():
 
 async def main():
     """Main stress test execution"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="OmniAI Platform Stress Testing Suite")
+    parser.add_argument("--base-url", default="http://0.0.0.0:8080")
+    parser.add_argument("--open-loop", action="store_true", help="Constant arrival rate instead of the full suite")
+    parser.add_argument("--endpoint", default="/health")
+    parser.add_argument("--rate", type=float, default=100.0, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to generate load for")
+    parser.add_argument("--schedule", choices=["poisson", "fixed"], default="poisson")
+    parser.add_argument("--results-log", default="logs/stress_test_results.ndjson",
+                        help="Append-only per-request log ('' to disable)")
+    parser.add_argument("--report-from-log", help="Rebuild the report from an existing results log and exit")
+    args = parser.parse_args()
+
+    if args.report_from_log:
+        runner = StressTestRunner(base_url=args.base_url, results_log="")
+        runner.aggregates = ResultAggregator.from_log(args.report_from_log)
+        runner.generate_report()
+        return
+
     logger.info("🧪 OmniAI Platform Stress Testing Suite")
     logger.info("=" * 50)
 
@@ -315,8 +582,15 @@ async def main():
     check_services()
 
     # Run stress tests
-    runner = StressTestRunner()
-    await runner.run_full_stress_test()
+    runner = StressTestRunner(base_url=args.base_url, results_log=args.results_log)
+    if args.open_loop:
+        runner.start_time = time.time()
+        await runner.open_loop_test(args.endpoint, args.rate, args.duration, args.schedule)
+        runner.generate_report()
+        if runner.result_log:
+            runner.result_log.close()
+    else:
+        await runner.run_full_stress_test()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Columnar time-series store for the OmniAI Performance Monitor
+Fixed-size NumPy ring buffers per retention tier, persisted as memory-mapped
+.npy files so history survives restarts and memory use is known up front
+"""
+
+import json
+import logging
+import os
+import time
+import warnings
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STATS = ("min", "avg", "max", "last")
+
+
+@dataclass(frozen=True)
+class Tier:
+    name: str
+    resolution: int   # seconds per slot
+    retention: int    # seconds of history kept
+
+    @property
+    def capacity(self) -> int:
+        return self.retention // self.resolution
+
+
+# A week of 1 s samples, 90 days of minutes, two years of hours
+DEFAULT_TIERS = (
+    Tier("1s", 1, 7 * 24 * 3600),
+    Tier("1m", 60, 90 * 24 * 3600),
+    Tier("1h", 3600, 2 * 365 * 24 * 3600),
+)
+
+
+class TimeSeriesStore:
+    """
+    The finest tier stores one float32 per metric per second. Coarser tiers
+    store min/avg/max/last per metric and are filled by rolling up the tier
+    below whenever one of their buckets closes, so they can always be rebuilt
+    from what is already on disk.
+    """
+
+    def __init__(self, path: str, metrics: Iterable[str], tiers: Tuple[Tier, ...] = DEFAULT_TIERS):
+        self.path = path
+        self.metrics: List[str] = list(metrics)
+        self.index: Dict[str, int] = {name: i for i, name in enumerate(self.metrics)}
+        self.tiers = tiers
+        self.timestamps: Dict[str, np.ndarray] = {}
+        self.values: Dict[str, np.ndarray] = {}
+        self._open()
+        self.last_timestamp = self._latest(self.tiers[0])
+
+    # Storage
+
+    def _schema(self) -> dict:
+        return {
+            "metrics": self.metrics,
+            "tiers": [[t.name, t.resolution, t.retention] for t in self.tiers],
+        }
+
+    def _file(self, tier: Tier, column: str) -> str:
+        return os.path.join(self.path, f"{tier.name}.{column}.npy")
+
+    def _open(self):
+        os.makedirs(self.path, exist_ok=True)
+        schema_path = os.path.join(self.path, "schema.json")
+        schema = self._schema()
+
+        existing = None
+        if os.path.exists(schema_path):
+            with open(schema_path) as f:
+                existing = json.load(f)
+        if existing is not None and existing != schema:
+            # Column layout changed: keep the old files aside and start fresh
+            backup = f"{self.path}.{int(time.time())}"
+            logger.warning(f"Metric schema changed, moving old store to {backup}")
+            os.rename(self.path, backup)
+            os.makedirs(self.path)
+            existing = None
+
+        for i, tier in enumerate(self.tiers):
+            value_shape = (tier.capacity, len(self.metrics)) if i == 0 else \
+                (tier.capacity, len(self.metrics), len(STATS))
+            if existing is None:
+                ts = np.lib.format.open_memmap(self._file(tier, "ts"), mode="w+",
+                                               dtype=np.int64, shape=(tier.capacity,))
+                ts[:] = -1
+                values = np.lib.format.open_memmap(self._file(tier, "values"), mode="w+",
+                                                   dtype=np.float32, shape=value_shape)
+                values[:] = np.nan
+            else:
+                ts = np.load(self._file(tier, "ts"), mmap_mode="r+")
+                values = np.load(self._file(tier, "values"), mmap_mode="r+")
+            self.timestamps[tier.name] = ts
+            self.values[tier.name] = values
+
+        if existing is None:
+            with open(schema_path, "w") as f:
+                json.dump(schema, f)
+
+    def flush(self):
+        for tier in self.tiers:
+            self.timestamps[tier.name].flush()
+            self.values[tier.name].flush()
+
+    def close(self):
+        self.flush()
+
+    def memory_footprint(self) -> int:
+        """Bytes occupied by all tiers, fixed at creation time"""
+        return sum(self.timestamps[t.name].nbytes + self.values[t.name].nbytes for t in self.tiers)
+
+    def _latest(self, tier: Tier) -> Optional[int]:
+        ts = self.timestamps[tier.name]
+        latest = int(ts.max())
+        return latest if latest >= 0 else None
+
+    # Writes
+
+    def append(self, sample: Dict[str, float], timestamp: Optional[float] = None):
+        """Record one sample; keys missing from the schema are ignored"""
+        now = int(timestamp if timestamp is not None else time.time())
+        finest = self.tiers[0]
+        bucket = now - now % finest.resolution
+        slot = (bucket // finest.resolution) % finest.capacity
+
+        previous = self.last_timestamp
+        if previous is not None and bucket < previous:
+            return  # clock went backwards; keep the ring monotonic
+
+        row = np.full(len(self.metrics), np.nan, dtype=np.float32)
+        for name, value in sample.items():
+            i = self.index.get(name)
+            if i is not None and value is not None:
+                row[i] = value
+        self.timestamps[finest.name][slot] = bucket
+        self.values[finest.name][slot] = row
+        self.last_timestamp = bucket
+
+        if previous is not None:
+            for lower, upper in zip(self.tiers, self.tiers[1:]):
+                closed = previous - previous % upper.resolution
+                if bucket - bucket % upper.resolution == closed:
+                    break
+                self._rollup(lower, upper, closed)
+
+    def _rollup(self, lower: Tier, upper: Tier, start: int):
+        """Downsample ``[start, start + upper.resolution)`` of ``lower`` into one slot of ``upper``"""
+        ts, values = self._range(lower, start, start + upper.resolution)
+        if len(ts) == 0:
+            return
+        if values.ndim == 2:
+            mins = maxs = avgs = values
+            lasts = values
+        else:
+            mins, avgs, maxs, lasts = (values[..., i] for i in range(len(STATS)))
+
+        # Metrics with no samples in the bucket stay NaN
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            row = np.stack([
+                np.nanmin(mins, axis=0),
+                np.nanmean(avgs, axis=0),
+                np.nanmax(maxs, axis=0),
+                _last_valid(lasts),
+            ], axis=-1).astype(np.float32)
+
+        slot = (start // upper.resolution) % upper.capacity
+        self.timestamps[upper.name][slot] = start
+        self.values[upper.name][slot] = row
+
+    # Reads
+
+    def _range(self, tier: Tier, start: float, end: float) -> Tuple[np.ndarray, np.ndarray]:
+        ts = self.timestamps[tier.name]
+        mask = (ts >= start) & (ts < end)
+        idx = np.flatnonzero(mask)
+        order = np.argsort(ts[idx], kind="stable")
+        idx = idx[order]
+        return ts[idx], self.values[tier.name][idx]
+
+    def tier_for(self, start: float) -> Tier:
+        """Finest tier whose retention still covers ``start``"""
+        age = time.time() - start
+        for tier in self.tiers:
+            if age <= tier.retention:
+                return tier
+        return self.tiers[-1]
+
+    def query(self, metric: str, start: float, end: Optional[float] = None,
+              tier: Optional[str] = None, stat: str = "avg") -> Tuple[np.ndarray, np.ndarray]:
+        """Return ``(timestamps, values)`` arrays for ``metric`` in ``[start, end)``"""
+        end = end if end is not None else time.time() + 1
+        selected = next(t for t in self.tiers if t.name == tier) if tier else self.tier_for(start)
+        ts, values = self._range(selected, start, end)
+        column = values[:, self.index[metric]]
+        if column.ndim == 2:
+            column = column[:, STATS.index(stat)]
+        return ts, column
+
+    def summarize(self, metric: str, start: float, end: Optional[float] = None,
+                  tier: Optional[str] = None) -> Dict[str, float]:
+        """min/avg/max/last and sample count of ``metric`` over a range"""
+        _, values = self.query(metric, start, end, tier)
+        valid = values[~np.isnan(values)]
+        if valid.size == 0:
+            return {"count": 0, "min": None, "avg": None, "max": None, "last": None}
+        return {
+            "count": int(valid.size),
+            "min": float(valid.min()),
+            "avg": float(valid.mean()),
+            "max": float(valid.max()),
+            "last": float(valid[-1]),
+        }
+
+    def correlate(self, metric_a: str, metric_b: str, start: float, end: Optional[float] = None,
+                  tier: Optional[str] = None) -> Optional[float]:
+        """Pearson correlation of two metrics over the timestamps where both have values"""
+        _, a = self.query(metric_a, start, end, tier)
+        _, b = self.query(metric_b, start, end, tier)
+        both = ~(np.isnan(a) | np.isnan(b))
+        if both.sum() < 3 or a[both].std() == 0 or b[both].std() == 0:
+            return None
+        return float(np.corrcoef(a[both], b[both])[0, 1])
+
+
+def _last_valid(values: np.ndarray) -> np.ndarray:
+    """Last non-NaN value per column of a (rows, columns) array"""
+    valid = ~np.isnan(values)
+    last_index = values.shape[0] - 1 - np.argmax(valid[::-1], axis=0)
+    result = values[last_index, np.arange(values.shape[1])]
+    result[~valid.any(axis=0)] = np.nan
+    return result
+